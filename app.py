@@ -8,17 +8,140 @@ Routes are organized in separate blueprint modules in the routes package.
 from flask import Flask
 from database import init_database, add_sample_data
 from routes import register_blueprints
+from routes.rate_limit import init_rate_limiting
+from routes.query_count import init_query_counting
+from routes.profiling import init_profiling
+from routes.tracing import init_tracing
+from routes.json_provider import RecordJSONProvider
+from cli import register_commands
+from services.autocomplete_service import build_autocomplete_index
+from services.fuzzy_search_service import build_fuzzy_index
+from services.overdue_scheduler import OverdueScheduler, SINKS
+from services.maintenance_scheduler import MaintenanceScheduler
+from services.payment_queue import PaymentQueue
+from services.payment_service import PaymentGateway
+from services.availability_broadcaster import AvailabilityBroadcaster
+from services.catalog_snapshot import enable_catalog_snapshot
+from services.sharded_search import enable_sharded_search
 
 
-def create_app():
+def create_app(config=None):
     """
     Application factory function to create and configure Flask app.
     
+    Args:
+        config: Optional dict of settings that override the defaults
+    
     Returns:
         Flask: Configured Flask application instance
     """
     app = Flask(__name__)
     app.secret_key = "super secret key"
+    app.json = RecordJSONProvider(app)
+    
+    # Cache-Control sent with catalog and search responses. The default makes
+    # clients revalidate with ETags; e.g. 'public, max-age=30' lets a reverse
+    # proxy serve cached copies.
+    app.config['CATALOG_CACHE_CONTROL'] = 'no-cache'
+    
+    # Stream /catalog and /search by default (otherwise only with ?stream=1)
+    app.config['STREAM_TEMPLATES'] = False
+    
+    # Maximum number of pairs plus patron IDs accepted by POST /api/late_fees
+    app.config['LATE_FEE_BATCH_LIMIT'] = 1000
+    
+    # Background overdue detection; sink is one of 'log', 'outbox', 'smtp'
+    app.config['OVERDUE_SCHEDULER_ENABLED'] = False
+    app.config['OVERDUE_SINK'] = 'log'
+    app.config['OVERDUE_BATCH_SIZE'] = 100
+    
+    # Worker threads for queued payments/refunds (concurrent gateway calls)
+    # and the queue depth at which POST /api/payments answers 503
+    app.config['PAYMENT_WORKERS'] = 4
+    app.config['PAYMENT_QUEUE_MAX'] = 1000
+    # Seconds a claimed job stays reserved for its worker process; after
+    # that it is presumed abandoned and marked interrupted
+    app.config['PAYMENT_JOB_LEASE'] = 300.0
+    
+    # Gateway URL for real HTTP payment calls, e.g. a local stub started with
+    # `python -m services.stub_gateway`; None keeps the simulated gateway
+    app.config['PAYMENT_GATEWAY_URL'] = None
+    app.config['PAYMENT_GATEWAY_TIMEOUT'] = 5.0
+    
+    # /api/availability/stream: keep-alive interval and how often changes
+    # made by other processes are picked up (seconds)
+    app.config['AVAILABILITY_HEARTBEAT'] = 15.0
+    app.config['AVAILABILITY_POLL_INTERVAL'] = 1.0
+    
+    # Token buckets per client IP and patron ID: endpoint -> (requests per
+    # second, burst). Requests are shed with 503 when too many are in flight
+    # or too many transaction() callers wait for the SQLite write lock.
+    # Off by default; enable it in deployments that need it.
+    app.config['RATE_LIMIT_ENABLED'] = False
+    app.config['RATE_LIMITS'] = {
+        'default': (20.0, 40),
+        'search.search_books': (5.0, 20),
+        'api.search_books_api': (5.0, 20),
+        'borrowing.borrow_book': (1.0, 10),
+        'borrowing.hold_book': (1.0, 10),
+        'borrowing.return_book': (1.0, 10),
+        'api.borrow_batch': (0.5, 5),
+        'api.return_batch': (0.5, 5),
+        'api.branch_borrow_api': (1.0, 10),
+        'api.branch_return_api': (1.0, 10),
+    }
+    app.config['MAX_IN_FLIGHT_REQUESTS'] = 64
+    app.config['MAX_WRITE_WAITERS'] = 8
+    
+    # File for the mmap catalog snapshot used by catalog listing and search
+    # (None reads the database). It is rebuilt at most every
+    # CATALOG_SNAPSHOT_MIN_INTERVAL seconds after a change. Run exactly one
+    # process per path with CATALOG_SNAPSHOT_BUILDER; the others only map
+    # the newest file, checking for one every CATALOG_SNAPSHOT_MIN_INTERVAL.
+    app.config['CATALOG_SNAPSHOT_PATH'] = None
+    app.config['CATALOG_SNAPSHOT_MIN_INTERVAL'] = 0.5
+    app.config['CATALOG_SNAPSHOT_BUILDER'] = True
+    
+    # Worker processes for title/author/fuzzy search, one per book ID range
+    # (0 searches in the web process)
+    app.config['SEARCH_SHARDS'] = 0
+    
+    # Count SQL statements per request (X-Query-Count / X-DB-Connections
+    # headers) and log requests that run more than the threshold
+    app.config['QUERY_COUNT_ENABLED'] = False
+    app.config['QUERY_COUNT_WARN_THRESHOLD'] = 25
+    
+    # Per-request profiling: requests with X-Profile: cprofile|sample and
+    # X-Profile-Token: <PROFILING_TOKEN> are profiled, plus a random
+    # PROFILING_SAMPLE_RATE share sampled every PROFILING_SAMPLE_INTERVAL
+    # seconds. The last PROFILING_MAX_PROFILES are listed at /admin/profiles.
+    app.config['PROFILING_ENABLED'] = False
+    app.config['PROFILING_TOKEN'] = None
+    app.config['PROFILING_SAMPLE_RATE'] = 0.0
+    app.config['PROFILING_SAMPLE_INTERVAL'] = 0.005
+    app.config['PROFILING_MAX_PROFILES'] = 50
+    
+    # Span tracing of requests, service calls, queries and gateway calls.
+    # Traces are appended to TRACING_EXPORT_PATH as Zipkin v2 JSON (one
+    # trace per line) or, without a path, the last TRACING_MAX_SPANS spans
+    # are kept in memory.
+    app.config['TRACING_ENABLED'] = False
+    app.config['TRACING_EXPORT_PATH'] = None
+    app.config['TRACING_MAX_SPANS'] = 10000
+    
+    # Background online backups of library.db and branch databases into
+    # BACKUP_DIR (None disables them) and daily ANALYZE/optimize/checkpoint,
+    # run only inside MAINTENANCE_WINDOW (start hour, end hour; local time)
+    app.config['MAINTENANCE_ENABLED'] = False
+    app.config['MAINTENANCE_WINDOW'] = (2, 5)
+    app.config['BACKUP_DIR'] = None
+    app.config['BACKUP_INTERVAL'] = 86400.0
+    app.config['BACKUP_KEEP'] = 7
+    app.config['BACKUP_PAGES'] = 256
+    app.config['BACKUP_PAUSE'] = 0.005
+    
+    if config:
+        app.config.update(config)
     
     # Initialize the database
     init_database()
@@ -26,8 +149,59 @@ def create_app():
     # Add sample data for testing and demonstration
     add_sample_data()
     
+    # Build the in-memory indexes used by autocomplete and fuzzy search
+    build_autocomplete_index()
+    build_fuzzy_index()
+    
+    if app.config['CATALOG_SNAPSHOT_PATH']:
+        app.extensions['catalog_snapshot'] = enable_catalog_snapshot(
+            app.config['CATALOG_SNAPSHOT_PATH'], app.config['CATALOG_SNAPSHOT_MIN_INTERVAL'],
+            builder=app.config['CATALOG_SNAPSHOT_BUILDER'])
+    
+    if app.config['SEARCH_SHARDS']:
+        app.extensions['sharded_search'] = enable_sharded_search(app.config['SEARCH_SHARDS'])
+    
     # Register all route blueprints
     register_blueprints(app)
+    register_commands(app)
+    init_tracing(app)
+    init_rate_limiting(app)
+    init_query_counting(app)
+    init_profiling(app)
+    
+    if app.config['OVERDUE_SCHEDULER_ENABLED']:
+        scheduler = OverdueScheduler(SINKS[app.config['OVERDUE_SINK']](),
+                                     batch_size=app.config['OVERDUE_BATCH_SIZE'])
+        scheduler.start()
+        app.extensions['overdue_scheduler'] = scheduler
+    
+    if app.config['MAINTENANCE_ENABLED']:
+        maintenance = MaintenanceScheduler(backup_dir=app.config['BACKUP_DIR'],
+                                           backup_interval=app.config['BACKUP_INTERVAL'],
+                                           backup_keep=app.config['BACKUP_KEEP'],
+                                           backup_pages=app.config['BACKUP_PAGES'],
+                                           backup_pause=app.config['BACKUP_PAUSE'],
+                                           window=app.config['MAINTENANCE_WINDOW'])
+        maintenance.start()
+        app.extensions['maintenance_scheduler'] = maintenance
+    
+    payment_gateway = None
+    if app.config['PAYMENT_GATEWAY_URL']:
+        payment_gateway = PaymentGateway(base_url=app.config['PAYMENT_GATEWAY_URL'],
+                                         timeout=app.config['PAYMENT_GATEWAY_TIMEOUT'],
+                                         pool_size=max(1, app.config['PAYMENT_WORKERS']))
+    app.extensions['payment_gateway'] = payment_gateway
+    
+    # Workers start with the first queued request
+    app.extensions['payment_queue'] = PaymentQueue(workers=app.config['PAYMENT_WORKERS'],
+                                                   payment_gateway=payment_gateway,
+                                                   max_queued=app.config['PAYMENT_QUEUE_MAX'],
+                                                   lease_seconds=app.config['PAYMENT_JOB_LEASE'])
+    
+    
+    # Starts with the first availability stream subscriber
+    app.extensions['availability_broadcaster'] = AvailabilityBroadcaster(
+        poll_interval=app.config['AVAILABILITY_POLL_INTERVAL'])
     
     return app
 
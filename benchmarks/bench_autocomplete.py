@@ -0,0 +1,68 @@
+"""
+Benchmark for the autocomplete prefix index.
+
+Builds a synthetic catalog in a temporary database, then reports build time,
+per-query latency and the index memory footprint.
+
+Usage: python benchmarks/bench_autocomplete.py [number_of_books]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database
+from services.autocomplete_service import (
+    build_autocomplete_index, autocomplete, get_autocomplete_memory_report
+)
+
+WORDS = ['river', 'shadow', 'garden', 'silent', 'empire', 'winter', 'glass', 'stone',
+         'night', 'ocean', 'paper', 'crown', 'forest', 'engine', 'letter', 'mirror']
+
+
+def populate(count):
+    conn = database.get_db_connection()
+    rows = []
+    for i in range(count):
+        title = ' '.join(random.choice(WORDS).title() for _ in range(3)) + ' ' + str(i)
+        author = random.choice(WORDS).title() + ' ' + random.choice(WORDS).title()
+        rows.append((title, author, str(9000000000000 + i), 1, 1))
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    random.seed(327)
+    workdir = tempfile.mkdtemp()
+    database.DATABASE = os.path.join(workdir, 'bench.db')
+    database.init_database()
+    populate(count)
+
+    start = time.perf_counter()
+    build_autocomplete_index()
+    print(f"books={count} build={time.perf_counter() - start:.3f}s")
+
+    queries = [random.choice(WORDS)[:random.randint(1, 4)] for _ in range(2000)]
+    start = time.perf_counter()
+    for query in queries:
+        autocomplete(query, 'all', 10)
+    per_query = (time.perf_counter() - start) / len(queries)
+    print(f"autocomplete top-10: {per_query * 1e6:.1f} us/query")
+
+    report = get_autocomplete_memory_report()
+    for field, info in report['fields'].items():
+        print(f"{field}: keys={info['keys']} bytes={info['bytes']['total']}")
+    print(f"total index memory: {report['total_bytes'] / 1024 / 1024:.2f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark for typo-tolerant search.
+
+Compares the trigram candidate index against a brute-force edit-distance
+scan over get_all_books() for growing catalog sizes. The index time should
+grow much more slowly than the catalog; the brute-force time grows linearly.
+
+Usage: python benchmarks/bench_fuzzy_search.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database
+from services.fuzzy_search_service import (
+    build_fuzzy_index, fuzzy_search_book_ids, get_last_candidate_count,
+    bounded_levenshtein, max_edit_distance, tokenize
+)
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ren', 'dra', 'vol', 'tis', 'bar', 'nel', 'quo', 'pex', 'sul']
+
+
+def make_word():
+    return ''.join(random.choice(SYLLABLES) for _ in range(random.randint(2, 4)))
+
+
+def populate(start, count):
+    conn = database.get_db_connection()
+    rows = []
+    for i in range(start, start + count):
+        title = ' '.join(make_word().title() for _ in range(3))
+        author = make_word().title() + ' ' + make_word().title()
+        rows.append((title, author, str(9000000000000 + i), 1, 1))
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+
+def brute_force(query, books):
+    words = tokenize(query)
+    results = []
+    for book in books:
+        for field in ('title', 'author'):
+            tokens = tokenize(book[field])
+            if all(any(bounded_levenshtein(w, t, max_edit_distance(w)) <= max_edit_distance(w)
+                       for t in tokens) for w in words):
+                results.append(book['id'])
+                break
+    return results
+
+
+def time_queries(function, queries):
+    start = time.perf_counter()
+    for query in queries:
+        function(query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    random.seed(327)
+    workdir = tempfile.mkdtemp()
+    database.DATABASE = os.path.join(workdir, 'bench.db')
+    database.init_database()
+
+    total = 0
+    for size in (1000, 10000, 50000):
+        populate(total, size - total)
+        total = size
+        build_fuzzy_index()
+        books = database.get_all_books()
+        # Misspell a real catalog word by dropping one character
+        queries = []
+        for _ in range(50):
+            word = tokenize(random.choice(books)['title'])[0]
+            cut = random.randrange(len(word))
+            queries.append(word[:cut] + word[cut + 1:])
+
+        indexed = time_queries(fuzzy_search_book_ids, queries)
+        candidates = get_last_candidate_count()
+        brute = time_queries(lambda q: brute_force(q, books), queries[:5])
+        print(f"books={size:6d} index={indexed * 1000:8.2f} ms/query "
+              f"(last query: {candidates} distance checks) brute_force={brute * 1000:9.2f} ms/query")
+
+
+if __name__ == '__main__':
+    main()
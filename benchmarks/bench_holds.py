@@ -0,0 +1,72 @@
+"""
+Benchmark for hold queue dispatch with deep queues.
+
+For each queue depth, fills one book's hold queue and times
+return_book_by_patron, which hands the copy to the head of the queue in
+the same transaction. The time should stay flat as the queue grows.
+
+Usage: python benchmarks/bench_holds.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database
+from services.library_service import return_book_by_patron
+
+
+def setup_book(depth):
+    conn = database.get_db_connection()
+    cursor = conn.execute('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, ?, ?, ?, ?)
+    ''', ('Deep Queue ' + str(depth), 'Author', str(9000000000000 + depth), 1, 0))
+    book_id = cursor.lastrowid
+    now = datetime.now()
+    conn.execute('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+        VALUES (?, ?, ?, ?)
+    ''', ('100000', book_id, now.isoformat(), (now + timedelta(days=14)).isoformat()))
+    conn.executemany('''
+        INSERT INTO holds (patron_id, book_id, created_at) VALUES (?, ?, ?)
+    ''', [(str(200000 + i % 700000), book_id, (now + timedelta(microseconds=i)).isoformat())
+          for i in range(depth)])
+    conn.commit()
+    conn.close()
+    return book_id
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    database.DATABASE = os.path.join(workdir, 'bench.db')
+    database.init_database()
+
+    conn = database.get_db_connection()
+    plan = conn.execute('''
+        EXPLAIN QUERY PLAN
+        SELECT * FROM holds WHERE book_id = ? ORDER BY created_at, id LIMIT 1
+    ''', (1,)).fetchall()
+    conn.close()
+    print('head-of-queue plan:', '; '.join(row['detail'] for row in plan))
+
+    for depth in (100, 10000, 200000):
+        book_id = setup_book(depth)
+        rounds = 50
+        patron_id = '100000'
+        start = time.perf_counter()
+        for i in range(rounds):
+            success, _ = return_book_by_patron(patron_id, book_id)
+            assert success
+            # The copy went to the head of the queue; return it again from there
+            patron_id = str(200000 + i % 700000)
+        per_return = (time.perf_counter() - start) / rounds
+        print(f"queue depth={depth:7d} return+dispatch={per_return * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
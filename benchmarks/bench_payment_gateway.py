@@ -0,0 +1,77 @@
+"""
+Benchmark for the HTTP payment path against the local stub gateway.
+
+Compares a pooled requests.Session with a new connection per call, runs
+concurrent charges through the pool, and shows how the client timeout
+bounds the time lost to a slow gateway.
+
+Usage: python benchmarks/bench_payment_gateway.py
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import requests
+
+from services.payment_service import PaymentGateway
+from services.stub_gateway import StubGatewayServer
+
+CALLS = 300
+
+
+def charge(gateway):
+    try:
+        return gateway.process_payment('123456', 2.5, 'Late fees')[0]
+    except requests.RequestException:
+        return False
+
+
+def run_sequential(url, pooled):
+    gateway = PaymentGateway(base_url=url)
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        if not pooled:
+            gateway.close()
+            gateway = PaymentGateway(base_url=url)
+        charge(gateway)
+    elapsed = time.perf_counter() - start
+    gateway.close()
+    return elapsed
+
+
+def run_concurrent(url, workers, timeout=5.0, calls=CALLS):
+    gateway = PaymentGateway(base_url=url, timeout=timeout, pool_size=workers)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda _: charge(gateway), range(calls)))
+    elapsed = time.perf_counter() - start
+    gateway.close()
+    return elapsed, results.count(False)
+
+
+def main():
+    with StubGatewayServer(latency_ms=2.0) as server:
+        for pooled in (False, True):
+            before = server.connection_count
+            elapsed = run_sequential(server.url, pooled)
+            print(f"sequential pooled={str(pooled):5s} {elapsed / CALLS * 1000:.2f} ms/call "
+                  f"connections={server.connection_count - before}")
+
+    with StubGatewayServer(latency_ms=20.0, latency_jitter_ms=10.0, latency_distribution='uniform',
+                           seed=1) as server:
+        for workers in (1, 4, 16):
+            elapsed, failed = run_concurrent(server.url, workers)
+            print(f"concurrent workers={workers:2d} {CALLS / elapsed:7.1f} calls/s failed={failed}")
+
+    with StubGatewayServer.from_profile('slow', seed=1) as server:
+        for timeout in (0.25, 2.0):
+            elapsed, failed = run_concurrent(server.url, 8, timeout=timeout, calls=40)
+            print(f"slow profile timeout={timeout:.2f}s total={elapsed:.2f}s failed={failed}/40")
+
+
+if __name__ == '__main__':
+    main()
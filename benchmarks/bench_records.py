@@ -0,0 +1,70 @@
+"""
+Benchmark for reading the catalog as records instead of dicts.
+
+Loads 100k books and compares the old conversion (sqlite3.Row -> dict per
+row) with get_all_books(), which builds Book records directly in the row
+factory. Reports the best of several runs and the memory allocated for the
+result list (tracemalloc).
+
+Usage: python benchmarks/bench_records.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database
+
+ROWS = 100000
+RUNS = 5
+
+
+def populate():
+    conn = database.get_db_connection()
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [('Title ' + str(i), 'Author ' + str(i % 5000), str(9100000000000 + i), 3, 2)
+          for i in range(ROWS)])
+    conn.commit()
+    conn.close()
+
+
+def read_as_dicts():
+    conn = database.get_db_connection()
+    books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
+    conn.close()
+    return [dict(book) for book in books]
+
+
+def measure(name, read):
+    best = float('inf')
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        read()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    rows = read()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(rows) >= ROWS
+    print(f"{name:8s} {best * 1000:8.1f} ms  retained={current / 1e6:6.1f} MB  peak={peak / 1e6:6.1f} MB")
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    database.DATABASE = os.path.join(workdir, 'bench.db')
+    database.init_database()
+    populate()
+
+    measure('dicts', read_as_dicts)
+    measure('records', database.get_all_books)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark for sharded multi-process search.
+
+Loads a large catalog, then times title and fuzzy queries in a single
+process (search_books_in_catalog) and through ShardedSearch with 1, 2, 4
+... shards up to the number of CPUs. With enough cores the sharded time
+should fall roughly in proportion to the shard count until merge and IPC
+overhead dominate.
+
+Usage: python benchmarks/bench_sharded_search.py [rows]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database
+from services.fuzzy_search_service import build_fuzzy_index
+from services.library_service import search_books_in_catalog
+from services.sharded_search import ShardedSearch
+
+WORDS = ['river', 'shadow', 'garden', 'winter', 'silver', 'empire', 'stone', 'harbor',
+         'forest', 'letters', 'island', 'machine', 'memory', 'orchard', 'thunder', 'voyage']
+QUERIES = [('title', 'garden'), ('author', 'smith'), ('fuzzy', 'shadw harbr')]
+ROUNDS = 5
+
+
+def populate(rows):
+    rng = random.Random(7)
+    conn = database.get_db_connection()
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(' '.join(rng.choice(WORDS) for _ in range(3)) + ' ' + str(i),
+           rng.choice(['Smith', 'Jones', 'Garcia', 'Chen', 'Okafor']) + ' ' + str(i % 997),
+           str(9200000000000 + i), 3, 3) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def time_queries(search):
+    timings = []
+    for search_type, term in QUERIES:
+        search(term, search_type)
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            search(term, search_type)
+        timings.append((time.perf_counter() - start) / ROUNDS)
+    return timings
+
+
+def report(name, timings):
+    print(f"{name:16s}" + ''.join(f"{search_type}={elapsed * 1000:8.1f} ms  "
+                                  for (search_type, _), elapsed in zip(QUERIES, timings)))
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    workdir = tempfile.mkdtemp()
+    database.DATABASE = os.path.join(workdir, 'bench.db')
+    database.init_database()
+    populate(rows)
+    build_fuzzy_index()
+    print(f"{rows} books, {os.cpu_count()} CPUs")
+
+    report('single process', time_queries(search_books_in_catalog))
+
+    shards = 1
+    while shards <= max(2, os.cpu_count() or 1):
+        backend = ShardedSearch(shards)
+        backend.start()
+        report(f"{shards} shards", time_queries(backend.search))
+        backend.close()
+        shards *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark for streamed catalog rendering.
+
+Measures time to first byte, total time and peak Python memory (tracemalloc)
+for /catalog rendered in full versus streamed with ?stream=1.
+
+Usage: python benchmarks/bench_streaming.py [number_of_books]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database
+
+
+def populate(count):
+    conn = database.get_db_connection()
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [('Book ' + str(i), 'Author ' + str(i % 500), str(9000000000000 + i), 2, 1) for i in range(count)])
+    conn.commit()
+    conn.close()
+
+
+def measure(client, url):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    chunks = iter(response.response)
+    first = next(chunks)
+    first_byte = time.perf_counter() - start
+    size = len(first) + sum(len(chunk) for chunk in chunks)
+    total = time.perf_counter() - start
+    response.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first_byte, total, peak, size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    workdir = tempfile.mkdtemp()
+    database.DATABASE = os.path.join(workdir, 'bench.db')
+    database.init_database()
+    populate(count)
+
+    from app import create_app
+    client = create_app().test_client()
+    for label, url in (('full', '/catalog'), ('streamed', '/catalog?stream=1')):
+        first_byte, total, peak, size = measure(client, url)
+        print(f"{label:9s} books={count} ttfb={first_byte * 1000:8.1f} ms total={total * 1000:8.1f} ms "
+              f"peak={peak / 1024 / 1024:7.1f} MiB bytes={size}")
+
+
+if __name__ == '__main__':
+    main()
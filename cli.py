@@ -0,0 +1,119 @@
+"""
+CLI Commands - Maintenance commands registered on the Flask app
+
+Run with `flask --app app <command>`.
+"""
+
+import click
+from flask import current_app
+from database import verify_patron_summary, rebuild_circulation_stats
+from services.recommendation_service import build_related_index
+from services.reconciliation_service import reconcile_payments
+from services.catalog_snapshot import build_catalog_snapshot, latest_snapshot_file
+from services.branch_service import add_branch, set_branch_copies
+from services.maintenance_scheduler import run_backup, run_maintenance
+
+def register_commands(app):
+    """Register all maintenance commands with the Flask app."""
+    app.cli.add_command(check_patron_summary)
+    app.cli.add_command(rebuild_stats)
+    app.cli.add_command(build_related)
+    app.cli.add_command(reconcile_payments_command)
+    app.cli.add_command(build_catalog_snapshot_command)
+    app.cli.add_command(add_branch_command)
+    app.cli.add_command(set_branch_copies_command)
+    app.cli.add_command(backup_db_command)
+    app.cli.add_command(maintain_db_command)
+
+@click.command('check-patron-summary')
+@click.option('--repair', is_flag=True, help='Rebuild the summary table if it is out of date.')
+def check_patron_summary(repair):
+    """Verify patron_summary against borrow_records and holds."""
+    mismatches = verify_patron_summary(repair=repair)
+    for mismatch in mismatches:
+        click.echo('patron ' + mismatch['patron_id'] + ': expected ' + str(mismatch['expected'])
+                   + ', found ' + str(mismatch['actual']))
+    if not mismatches:
+        click.echo('patron_summary is consistent.')
+    elif repair:
+        click.echo('Rebuilt patron_summary (' + str(len(mismatches)) + ' patrons were out of date).')
+    else:
+        raise SystemExit(1)
+
+@click.command('rebuild-stats')
+def rebuild_stats():
+    """Backfill the circulation counters from the full borrow history."""
+    result = rebuild_circulation_stats()
+    click.echo('Rebuilt ' + str(result['book_buckets']) + ' book/day buckets over '
+               + str(result['days']) + ' days.')
+
+@click.command('build-related')
+@click.option('--top-k', default=10, show_default=True, help='Neighbours kept per book.')
+def build_related(top_k):
+    """Rebuild the "also borrowed" recommendations from borrow history."""
+    result = build_related_index(top_k=top_k)
+    click.echo('Read ' + str(result['patrons']) + ' patrons, ' + str(result['pairs'])
+               + ' book pairs; wrote ' + str(result['rows']) + ' recommendations.')
+
+@click.command('reconcile-payments')
+@click.option('--workers', default=8, show_default=True, help='Concurrent gateway status calls.')
+@click.option('--batch-size', default=100, show_default=True, help='Ledger entries per batch.')
+def reconcile_payments_command(workers, batch_size):
+    """Check unreconciled ledger entries and settle stale pending ones with the payment gateway."""
+    result = reconcile_payments(current_app.extensions.get('payment_gateway'),
+                                batch_size=batch_size, max_workers=workers)
+    click.echo('Checked ' + str(result['checked']) + ' payments, updated ' + str(result['updated'])
+               + ', ' + str(result['errors']) + ' status calls failed.')
+    click.echo('Settled ' + str(result['settled']) + ' charges with an unknown outcome; '
+               + str(result['unsettled']) + ' still unknown.')
+
+@click.command('build-catalog-snapshot')
+@click.option('--path', default='catalog.snapshot', show_default=True, help='Snapshot path; files are written as <path>.<generation>.')
+def build_catalog_snapshot_command(path):
+    """Export the books table to an mmap snapshot file for read-only workers."""
+    version = build_catalog_snapshot(path)
+    click.echo('Wrote catalog snapshot ' + version + ' to ' + latest_snapshot_file(path) + '.')
+
+@click.command('add-branch')
+@click.argument('branch_id')
+@click.argument('name')
+@click.option('--database', default=None, help='Keep this branch\'s inventory and loans in its own SQLite file.')
+def add_branch_command(branch_id, name, database):
+    """Register a library branch."""
+    success, message = add_branch(branch_id, name, database)
+    click.echo(message)
+    if not success:
+        raise SystemExit(1)
+
+@click.command('set-branch-copies')
+@click.argument('branch_id')
+@click.argument('book_id', type=int)
+@click.argument('total_copies', type=int)
+def set_branch_copies_command(branch_id, book_id, total_copies):
+    """Set how many copies of a book a branch owns."""
+    success, message = set_branch_copies(branch_id, book_id, total_copies)
+    click.echo(message)
+    if not success:
+        raise SystemExit(1)
+
+@click.command('backup-db')
+@click.argument('backup_dir')
+@click.option('--pages', default=256, show_default=True, help='Pages copied per step.')
+@click.option('--pause', default=0.005, show_default=True, help='Seconds between steps, when writers can run.')
+@click.option('--keep', default=7, show_default=True, help='Backups kept per database.')
+def backup_db_command(backup_dir, pages, pause, keep):
+    """Back up library.db and branch databases while the app is running."""
+    for backup in run_backup(backup_dir, pages=pages, pause=pause, keep=keep):
+        click.echo(backup['database'] + ' -> ' + backup['path'] + ': ' + str(backup['pages']) + ' pages in '
+                   + str(backup['steps']) + ' steps, ' + str(backup['duration_ms']) + ' ms, '
+                   + str(backup['restarts']) + ' restarts.')
+
+@click.command('maintain-db')
+@click.option('--vacuum', is_flag=True, help='Also VACUUM (blocks writers while it runs).')
+@click.option('--no-analyze', is_flag=True, help='Skip ANALYZE; only PRAGMA optimize and checkpoint.')
+def maintain_db_command(vacuum, no_analyze):
+    """Refresh planner statistics and checkpoint WAL files."""
+    for result in run_maintenance(analyze=not no_analyze, vacuum=vacuum):
+        steps = ', '.join(name + ' ' + str(ms) + ' ms' for name, ms in result['steps'].items())
+        click.echo(result['database'] + ': ' + steps + '; ' + str(result['page_count']) + ' pages, '
+                   + str(result['pages_reclaimed']) + ' reclaimed.')
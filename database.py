@@ -3,19 +3,190 @@ Database module for Library Management System
 Handles all database operations and connections
 """
 
+import json
+import os
 import sqlite3
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from records import Book, BorrowedBook, ActiveLoan, BOOK_FIELDS
+from tracing import current_span, start_child_span
 
 # Database configuration
 DATABASE = 'library.db'
 
-def get_db_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
+# In-process listeners for catalog changes (the version itself is kept in
+# the catalog_state table, so every process sees the same one)
+_catalog_lock = threading.Lock()
+_catalog_listeners = []
+
+# Number of threads waiting for the SQLite write lock in transaction()
+_write_waiters = 0
+_write_waiters_lock = threading.Lock()
+
+# Query counters active in the current thread/request (see count_queries)
+_query_counters: ContextVar[Tuple['QueryCounter', ...]] = ContextVar('query_counters', default=())
+
+class QueryCounter:
+    """SQL statements run and connections opened inside a count_queries() block."""
+    
+    def __init__(self):
+        self.connections = 0
+        self.statements: List[str] = []
+    
+    @property
+    def queries(self) -> int:
+        """Statements other than explicit transaction control (BEGIN/COMMIT/ROLLBACK)."""
+        return sum(1 for sql in self.statements
+                   if not sql.lstrip()[:8].upper().startswith(('BEGIN', 'COMMIT', 'ROLLBACK')))
+
+class _InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        with self.connection._observe(sql):
+            return super().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        with self.connection._observe(sql):
+            return super().executemany(sql, seq_of_parameters)
+
+class _InstrumentedConnection(sqlite3.Connection):
+    """
+    Connection used only while counting or tracing, so normal requests pay
+    nothing for it. Each statement is counted and timed in a tracing span.
+    """
+    
+    counters: Tuple[QueryCounter, ...] = ()
+    
+    def _observe(self, sql: str):
+        for counter in self.counters:
+            counter.statements.append(sql)
+        return start_child_span('sqlite ' + sql.split(None, 1)[0].upper(), 'CLIENT',
+                                **{'db.system': 'sqlite', 'db.statement': ' '.join(sql.split())})
+    
+    def cursor(self, factory=_InstrumentedCursor):
+        return super().cursor(factory)
+    
+    # Only the cursor observes statements. Before Python 3.11 the built-in
+    # Connection.execute already went through cursor(); from 3.11 it does
+    # not, so these shortcuts make it explicit on every version.
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """
+    Count statements and connections opened by get_db_connection in this block.
+    
+    Counting follows the current context, so it covers one thread or one
+    request; blocks may be nested.
+    """
+    counter = QueryCounter()
+    token = _query_counters.set(_query_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _query_counters.reset(token)
+
+def get_db_connection(database_path: Optional[str] = None):
+    """Get a database connection (to the main database unless a path is given)."""
+    counters = _query_counters.get()
+    if counters or current_span() is not None:
+        conn = sqlite3.connect(database_path or DATABASE, factory=_InstrumentedConnection)
+        conn.counters = counters
+        for counter in counters:
+            counter.connections += 1
+    else:
+        conn = sqlite3.connect(database_path or DATABASE)
     conn.row_factory = sqlite3.Row  # This enables column access by name
     return conn
 
+# Explicit column list so rows map onto Book records positionally
+BOOK_COLUMNS = ', '.join(BOOK_FIELDS)
+
+def query_records(conn, record_cls, sql: str, params=()):
+    """Execute a query whose rows are built directly as record_cls instances."""
+    cursor = conn.cursor()
+    cursor.row_factory = record_cls.row_factory
+    return cursor.execute(sql, params)
+
+@contextmanager
+def transaction(database_path: Optional[str] = None):
+    """
+    Open a connection and run the enclosed statements as one write transaction.
+    
+    The write lock is taken up front (BEGIN IMMEDIATE) so checks made inside
+    the block still hold when it commits. Rolls back if the block raises.
+    database_path selects a branch database; only commits to the main
+    database notify catalog listeners.
+    """
+    global _write_waiters
+    conn = get_db_connection(database_path)
+    try:
+        with _write_waiters_lock:
+            _write_waiters += 1
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+        finally:
+            with _write_waiters_lock:
+                _write_waiters -= 1
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    if database_path is None:
+        notify_catalog_listeners()
+
+def get_write_waiters() -> int:
+    """
+    Number of transaction() callers in this process waiting for the write lock (for load shedding).
+    
+    Writes that commit on their own connection (insert_book, update_payment
+    and the like) are not counted, so this is a lower bound on contention.
+    """
+    with _write_waiters_lock:
+        return _write_waiters
+
+def get_catalog_version() -> Tuple[str, datetime]:
+    """
+    Get the current catalog version tag and the time it last changed (UTC, millisecond precision).
+    
+    Triggers on books keep the version in the database, so it covers
+    changes made by any process.
+    """
+    conn = get_db_connection()
+    row = conn.execute('SELECT epoch, version, last_modified FROM catalog_state WHERE id = 1').fetchone()
+    conn.close()
+    last_modified = datetime.fromisoformat(row['last_modified']).replace(tzinfo=timezone.utc)
+    return row['epoch'] + '-' + str(row['version']), last_modified
+
+def notify_catalog_listeners() -> None:
+    """Tell this process's catalog listeners that the books table may have changed."""
+    with _catalog_lock:
+        listeners = list(_catalog_listeners)
+    for listener in listeners:
+        listener()
+
+def add_catalog_listener(listener) -> None:
+    """Call listener() after every committed catalog change. It must not block."""
+    with _catalog_lock:
+        _catalog_listeners.append(listener)
+
+def remove_catalog_listener(listener) -> None:
+    """Stop calling a listener added with add_catalog_listener."""
+    with _catalog_lock:
+        if listener in _catalog_listeners:
+            _catalog_listeners.remove(listener)
+
 def init_database():
     """Initialize the database with required tables."""
     conn = get_db_connection()
@@ -41,13 +212,633 @@ def init_database():
             borrow_date TEXT NOT NULL,
             due_date TEXT NOT NULL,
             return_date TEXT,
+            late_fee REAL NOT NULL DEFAULT 0,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''')
+    # Databases created before late fees were recorded on return
+    columns = [row['name'] for row in conn.execute('PRAGMA table_info(borrow_records)')]
+    if 'late_fee' not in columns:
+        conn.execute('ALTER TABLE borrow_records ADD COLUMN late_fee REAL NOT NULL DEFAULT 0')
+    
+    # Create holds table (queue of patrons waiting for an unavailable book)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS holds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
             FOREIGN KEY (book_id) REFERENCES books (id)
         )
     ''')
+    # Head of a book's queue is the first entry of this index
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_holds_book_created
+        ON holds (book_id, created_at, id)
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_holds_patron ON holds (patron_id)')
+    
+    # Active loans ordered by due date, for the overdue scheduler
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_active_due
+        ON borrow_records (due_date) WHERE return_date IS NULL
+    ''')
+    
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_patron_active
+        ON borrow_records (patron_id, due_date) WHERE return_date IS NULL
+    ''')
+    
+    _create_patron_summary(conn)
+    _create_circulation_stats(conn)
+    
+    _create_event_outbox(conn)
+    _create_catalog_state(conn)
+    
+    # Library branches; a branch with a database_path keeps its inventory
+    # and loans in that file instead of this one
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS branches (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            database_path TEXT
+        )
+    ''')
+    _create_branch_tables(conn)
+    # Databases from before branch loans were counted in patron_summary
+    columns = [row['name'] for row in conn.execute('PRAGMA table_info(patron_summary)')]
+    if 'branch_loans' not in columns:
+        conn.execute('ALTER TABLE patron_summary ADD COLUMN branch_loans INTEGER NOT NULL DEFAULT 0')
+        _set_branch_loan_counts(conn)
+    
+    # Local ledger of late-fee charges and refunds
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER,
+            amount REAL NOT NULL,
+            transaction_id TEXT,
+            status TEXT NOT NULL,
+            refunded_amount REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            gateway_status TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            reconciled_at TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_payments_patron ON payments (patron_id, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_payments_transaction ON payments (transaction_id)')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_payments_unreconciled
+        ON payments (id) WHERE reconciled_at IS NULL AND transaction_id IS NOT NULL
+    ''')
+    # Charges whose outcome is unknown (worker stopped mid-call, timeout, 5xx)
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_payments_unsettled
+        ON payments (id) WHERE transaction_id IS NULL AND status IN ('pending', 'error')
+    ''')
+    
+    # Durable queue of payment/refund requests handled by background workers
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS payment_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            message TEXT,
+            transaction_id TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            owner TEXT,
+            lease_expires_at TEXT,
+            job_key TEXT
+        )
+    ''')
+    # Databases created before running jobs recorded their worker and lease
+    columns = [row['name'] for row in conn.execute('PRAGMA table_info(payment_jobs)')]
+    if 'owner' not in columns:
+        conn.execute('ALTER TABLE payment_jobs ADD COLUMN owner TEXT')
+        conn.execute('ALTER TABLE payment_jobs ADD COLUMN lease_expires_at TEXT')
+    if 'job_key' not in columns:
+        conn.execute('ALTER TABLE payment_jobs ADD COLUMN job_key TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_payment_jobs_status ON payment_jobs (status, id)')
+    # At most one queued or running job per key (e.g. one charge per late fee)
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_payment_jobs_active_key
+        ON payment_jobs (job_key) WHERE status IN ('queued', 'running')
+    ''')
+    
+    # Precomputed "patrons who borrowed this also borrowed" neighbours
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS book_related (
+            book_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            related_book_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            co_borrowers INTEGER NOT NULL,
+            PRIMARY KEY (book_id, rank)
+        )
+    ''')
+    
+    # Small key/value store for background job cursors
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scheduler_state (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    ''')
+    
+    # Outbox of overdue notifications for downstream delivery
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS overdue_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            borrow_record_id INTEGER NOT NULL UNIQUE,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            due_date TEXT NOT NULL,
+            detected_at TEXT NOT NULL
+        )
+    ''')
     
     conn.commit()
     conn.close()
 
+def _create_patron_summary(conn):
+    """
+    Create the patron_summary table and the triggers that keep it current.
+    
+    Every insert/return of a borrow record and every insert/delete of a
+    hold adjusts the patron's row, so limit checks and status headers are
+    a single primary-key lookup instead of COUNT(*) queries.
+    
+    assessed_fees is the lifetime total of late fees assessed at return.
+    Payments and refunds are tracked in the payments ledger, not here.
+    
+    branch_loans counts active loans at branches. Branch loans may live in
+    other database files, so there is no trigger: a branch checkout first
+    reserves a slot here (reserve_branch_loan) and a return releases it.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS patron_summary (
+            patron_id TEXT PRIMARY KEY,
+            active_loans INTEGER NOT NULL DEFAULT 0,
+            active_holds INTEGER NOT NULL DEFAULT 0,
+            earliest_due_date TEXT,
+            lifetime_loans INTEGER NOT NULL DEFAULT 0,
+            assessed_fees REAL NOT NULL DEFAULT 0,
+            branch_loans INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    # Databases from when the column was (misleadingly) called outstanding_fees;
+    # renaming also rewrites the trigger that references it
+    columns = [row['name'] for row in conn.execute('PRAGMA table_info(patron_summary)')]
+    if 'outstanding_fees' in columns:
+        conn.execute('ALTER TABLE patron_summary RENAME COLUMN outstanding_fees TO assessed_fees')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_patron_summary_borrow
+        AFTER INSERT ON borrow_records
+        BEGIN
+            INSERT OR IGNORE INTO patron_summary (patron_id) VALUES (NEW.patron_id);
+            UPDATE patron_summary SET
+                lifetime_loans = lifetime_loans + 1,
+                active_loans = active_loans + (NEW.return_date IS NULL),
+                earliest_due_date = CASE
+                    WHEN NEW.return_date IS NOT NULL THEN earliest_due_date
+                    WHEN earliest_due_date IS NULL OR NEW.due_date < earliest_due_date THEN NEW.due_date
+                    ELSE earliest_due_date END
+            WHERE patron_id = NEW.patron_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_patron_summary_return
+        AFTER UPDATE OF return_date ON borrow_records
+        WHEN OLD.return_date IS NULL AND NEW.return_date IS NOT NULL
+        BEGIN
+            UPDATE patron_summary SET
+                active_loans = active_loans - 1,
+                assessed_fees = assessed_fees + NEW.late_fee,
+                earliest_due_date = (
+                    SELECT MIN(due_date) FROM borrow_records
+                    WHERE patron_id = NEW.patron_id AND return_date IS NULL)
+            WHERE patron_id = NEW.patron_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_patron_summary_hold_insert
+        AFTER INSERT ON holds
+        BEGIN
+            INSERT OR IGNORE INTO patron_summary (patron_id) VALUES (NEW.patron_id);
+            UPDATE patron_summary SET active_holds = active_holds + 1
+            WHERE patron_id = NEW.patron_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_patron_summary_hold_delete
+        AFTER DELETE ON holds
+        BEGIN
+            UPDATE patron_summary SET active_holds = active_holds - 1
+            WHERE patron_id = OLD.patron_id;
+        END
+    ''')
+    
+    # Backfill databases that had loans before the summary existed
+    summary_rows = conn.execute('SELECT COUNT(*) AS count FROM patron_summary').fetchone()['count']
+    if summary_rows == 0:
+        _rebuild_patron_summary(conn)
+
+_PATRON_SUMMARY_EXPECTED = '''
+    SELECT patron_id,
+           SUM(active_loans) AS active_loans,
+           SUM(active_holds) AS active_holds,
+           MIN(earliest_due_date) AS earliest_due_date,
+           SUM(lifetime_loans) AS lifetime_loans,
+           SUM(assessed_fees) AS assessed_fees
+    FROM (
+        SELECT patron_id,
+               SUM(return_date IS NULL) AS active_loans,
+               0 AS active_holds,
+               MIN(CASE WHEN return_date IS NULL THEN due_date END) AS earliest_due_date,
+               COUNT(*) AS lifetime_loans,
+               SUM(CASE WHEN return_date IS NOT NULL THEN late_fee ELSE 0 END) AS assessed_fees
+        FROM borrow_records GROUP BY patron_id
+        UNION ALL
+        SELECT patron_id, 0, COUNT(*), NULL, 0, 0 FROM holds GROUP BY patron_id
+    )
+    GROUP BY patron_id
+'''
+
+def _rebuild_patron_summary(conn):
+    conn.execute('DELETE FROM patron_summary')
+    conn.execute('''
+        INSERT INTO patron_summary (patron_id, active_loans, active_holds, earliest_due_date,
+                                    lifetime_loans, assessed_fees)
+    ''' + _PATRON_SUMMARY_EXPECTED)
+    _set_branch_loan_counts(conn)
+
+def _count_branch_loans(conn) -> Dict[str, int]:
+    """Active branch loans per patron, read from every branch store."""
+    counts: Dict[str, int] = {}
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'branches'").fetchone():
+        return counts
+    for row in conn.execute('SELECT DISTINCT database_path FROM branches').fetchall():
+        database_path = row['database_path']
+        store_conn = conn if database_path is None else get_db_connection(database_path)
+        try:
+            for loan in store_conn.execute('''
+                SELECT patron_id, COUNT(*) AS count FROM branch_borrow_records
+                WHERE return_date IS NULL GROUP BY patron_id
+            '''):
+                counts[loan['patron_id']] = counts.get(loan['patron_id'], 0) + loan['count']
+        finally:
+            if database_path is not None:
+                store_conn.close()
+    return counts
+
+def _set_branch_loan_counts(conn):
+    conn.execute('UPDATE patron_summary SET branch_loans = 0')
+    for patron_id, count in _count_branch_loans(conn).items():
+        conn.execute('INSERT OR IGNORE INTO patron_summary (patron_id) VALUES (?)', (patron_id,))
+        conn.execute('UPDATE patron_summary SET branch_loans = ? WHERE patron_id = ?', (count, patron_id))
+
+def verify_patron_summary(repair: bool = False) -> List[Dict]:
+    """
+    Compare patron_summary with totals recomputed from the base tables.
+    
+    branch_loans is compared with the loans in every branch store; a
+    branch checkout in progress shows up as a (transient) mismatch.
+    
+    Args:
+        repair: Rebuild the summary table when mismatches are found
+        
+    Returns:
+        list: One dict per mismatching patron with 'expected' and 'actual' rows
+    """
+    conn = get_db_connection()
+    expected = {row['patron_id']: dict(row) for row in conn.execute(_PATRON_SUMMARY_EXPECTED)}
+    for patron_id, count in _count_branch_loans(conn).items():
+        expected.setdefault(patron_id, {})['branch_loans'] = count
+    actual = {row['patron_id']: dict(row) for row in conn.execute('SELECT * FROM patron_summary')}
+    
+    empty = {'active_loans': 0, 'active_holds': 0, 'earliest_due_date': None,
+             'lifetime_loans': 0, 'assessed_fees': 0, 'branch_loans': 0}
+    mismatches = []
+    for patron_id in sorted(set(expected) | set(actual)):
+        want = dict(empty, patron_id=patron_id)
+        want.update(expected.get(patron_id, {}))
+        have = dict(empty, patron_id=patron_id)
+        have.update(actual.get(patron_id, {}))
+        if abs(want['assessed_fees'] - have['assessed_fees']) < 0.005:
+            have['assessed_fees'] = want['assessed_fees']
+        if want != have:
+            mismatches.append({'patron_id': patron_id, 'expected': want, 'actual': have})
+    
+    if mismatches and repair:
+        _rebuild_patron_summary(conn)
+        conn.commit()
+    conn.close()
+    return mismatches
+
+def get_patron_summary(patron_id: str, conn=None) -> Dict:
+    """Get a patron's materialized loan/hold counters (zeros if they have none)."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    record = conn.execute('SELECT * FROM patron_summary WHERE patron_id = ?', (patron_id,)).fetchone()
+    if own_conn:
+        conn.close()
+    if record:
+        return dict(record)
+    return {'patron_id': patron_id, 'active_loans': 0, 'active_holds': 0, 'earliest_due_date': None,
+            'lifetime_loans': 0, 'assessed_fees': 0.0, 'branch_loans': 0}
+
+def count_toward_borrow_limit(summary: Dict) -> int:
+    """Loans (main collection and branches) plus holds; each hold becomes a loan when fulfilled."""
+    return summary['active_loans'] + summary['active_holds'] + summary['branch_loans']
+
+def reserve_branch_loan(patron_id: str, limit: int = 5) -> bool:
+    """
+    Take one of a patron's borrowing slots for a branch checkout.
+    
+    The limit check and the increment are one statement on the main
+    database, the same row every main-collection borrow and hold checks,
+    so concurrent checkouts anywhere cannot take the patron past the limit.
+    Only this short write touches library.db; the branch's own
+    transaction runs afterwards. Returns False if no slot is free (or on
+    a database error).
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('INSERT OR IGNORE INTO patron_summary (patron_id) VALUES (?)', (patron_id,))
+        cursor = conn.execute('''
+            UPDATE patron_summary SET branch_loans = branch_loans + 1
+            WHERE patron_id = ? AND active_loans + active_holds + branch_loans < ?
+        ''', (patron_id, limit))
+        conn.commit()
+        conn.close()
+        return cursor.rowcount == 1
+    except Exception as e:
+        conn.close()
+        return False
+
+def release_branch_loan(patron_id: str) -> bool:
+    """Give back a slot taken by reserve_branch_loan (branch return, or a checkout that did not happen)."""
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            UPDATE patron_summary SET branch_loans = MAX(0, branch_loans - 1) WHERE patron_id = ?
+        ''', (patron_id,))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+def _create_circulation_stats(conn):
+    """
+    Create per-day circulation counters and the triggers that fill them.
+    
+    book_loan_buckets counts loans per (day, book) and circulation_daily
+    counts loans and returns per day, so popularity and circulation reports
+    read small bucket tables instead of scanning borrow_records.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS book_loan_buckets (
+            day TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            loans INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, book_id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS circulation_daily (
+            day TEXT PRIMARY KEY,
+            loans INTEGER NOT NULL DEFAULT 0,
+            returns INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_circulation_borrow
+        AFTER INSERT ON borrow_records
+        BEGIN
+            INSERT OR IGNORE INTO book_loan_buckets (day, book_id) VALUES (date(NEW.borrow_date), NEW.book_id);
+            UPDATE book_loan_buckets SET loans = loans + 1
+            WHERE day = date(NEW.borrow_date) AND book_id = NEW.book_id;
+            INSERT OR IGNORE INTO circulation_daily (day) VALUES (date(NEW.borrow_date));
+            UPDATE circulation_daily SET loans = loans + 1 WHERE day = date(NEW.borrow_date);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_circulation_return
+        AFTER UPDATE OF return_date ON borrow_records
+        WHEN OLD.return_date IS NULL AND NEW.return_date IS NOT NULL
+        BEGIN
+            INSERT OR IGNORE INTO circulation_daily (day) VALUES (date(NEW.return_date));
+            UPDATE circulation_daily SET returns = returns + 1 WHERE day = date(NEW.return_date);
+        END
+    ''')
+
+def _create_event_outbox(conn):
+    """
+    Create the append-only events table and the triggers that feed it.
+    
+    Triggers write the event in the same transaction as the change, so
+    consumers never see an event for a change that was rolled back.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_events_book_created
+        AFTER INSERT ON books
+        BEGIN
+            INSERT INTO events (event_type, entity_id, payload) VALUES ('book.created', NEW.id,
+                json_object('book_id', NEW.id, 'title', NEW.title, 'author', NEW.author,
+                            'isbn', NEW.isbn, 'total_copies', NEW.total_copies,
+                            'available_copies', NEW.available_copies));
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_events_book_availability
+        AFTER UPDATE OF available_copies ON books
+        WHEN OLD.available_copies != NEW.available_copies
+        BEGIN
+            INSERT INTO events (event_type, entity_id, payload) VALUES ('book.availability_changed', NEW.id,
+                json_object('book_id', NEW.id, 'available_copies', NEW.available_copies,
+                            'total_copies', NEW.total_copies,
+                            'change', NEW.available_copies - OLD.available_copies));
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_events_loan_created
+        AFTER INSERT ON borrow_records
+        BEGIN
+            INSERT INTO events (event_type, entity_id, payload) VALUES ('loan.created', NEW.id,
+                json_object('record_id', NEW.id, 'patron_id', NEW.patron_id, 'book_id', NEW.book_id,
+                            'borrow_date', NEW.borrow_date, 'due_date', NEW.due_date));
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_events_loan_returned
+        AFTER UPDATE OF return_date ON borrow_records
+        WHEN OLD.return_date IS NULL AND NEW.return_date IS NOT NULL
+        BEGIN
+            INSERT INTO events (event_type, entity_id, payload) VALUES ('loan.returned', NEW.id,
+                json_object('record_id', NEW.id, 'patron_id', NEW.patron_id, 'book_id', NEW.book_id,
+                            'return_date', NEW.return_date, 'late_fee', NEW.late_fee));
+        END
+    ''')
+
+def _create_catalog_state(conn):
+    """
+    Create the catalog version row and the triggers that bump it.
+    
+    The epoch is set when the row is created, so a recreated database
+    never reuses an older database's version tags.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            epoch TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            last_modified TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO catalog_state (id, epoch) VALUES (1, ?)',
+                 (format(time.time_ns() // 1000, 'x'),))
+    for name, event in (('insert', 'INSERT'), ('update', 'UPDATE'), ('delete', 'DELETE')):
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_catalog_version_''' + name + '''
+            AFTER ''' + event + ''' ON books
+            BEGIN
+                UPDATE catalog_state SET version = version + 1,
+                    last_modified = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE id = 1;
+            END
+        ''')
+
+def _create_branch_tables(conn):
+    """
+    Create the per-branch inventory and loan tables.
+    
+    They live in the main database for unsharded branches and in each
+    sharded branch's own file.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS branch_inventory (
+            branch_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            total_copies INTEGER NOT NULL,
+            available_copies INTEGER NOT NULL,
+            PRIMARY KEY (branch_id, book_id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS branch_borrow_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            branch_id TEXT NOT NULL,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            return_date TEXT,
+            late_fee REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_branch_borrow_records_patron_active
+        ON branch_borrow_records (patron_id, book_id) WHERE return_date IS NULL
+    ''')
+
+def get_events_after(after_seq: int, limit: int = 100, event_types: List[str] = None) -> List[Dict]:
+    """
+    Get outbox events with seq greater than after_seq, oldest first.
+    
+    Reads only the new rows (a range scan on the primary key).
+    """
+    conn = get_db_connection()
+    query = 'SELECT * FROM events WHERE seq > ?'
+    params = [after_seq]
+    if event_types:
+        query += ' AND event_type IN (' + ','.join('?' for _ in event_types) + ')'
+        params += list(event_types)
+    query += ' ORDER BY seq LIMIT ?'
+    params.append(limit)
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+    
+    events = []
+    for row in rows:
+        event = dict(row)
+        event['payload'] = json.loads(event['payload'])
+        events.append(event)
+    return events
+
+def get_latest_event_seq() -> int:
+    """Get the sequence number of the newest event (0 if there are none)."""
+    conn = get_db_connection()
+    seq = conn.execute('SELECT MAX(seq) AS seq FROM events').fetchone()['seq']
+    conn.close()
+    return seq or 0
+
+def rebuild_circulation_stats() -> Dict:
+    """
+    Recompute the circulation buckets from the full borrow history.
+    
+    Returns:
+        dict: Number of book/day buckets and days written
+    """
+    conn = get_db_connection()
+    conn.execute('DELETE FROM book_loan_buckets')
+    conn.execute('DELETE FROM circulation_daily')
+    conn.execute('''
+        INSERT INTO book_loan_buckets (day, book_id, loans)
+        SELECT date(borrow_date), book_id, COUNT(*) FROM borrow_records
+        GROUP BY date(borrow_date), book_id
+    ''')
+    conn.execute('''
+        INSERT INTO circulation_daily (day, loans, returns)
+        SELECT day, SUM(loans), SUM(returns) FROM (
+            SELECT date(borrow_date) AS day, COUNT(*) AS loans, 0 AS returns
+            FROM borrow_records GROUP BY date(borrow_date)
+            UNION ALL
+            SELECT date(return_date), 0, COUNT(*)
+            FROM borrow_records WHERE return_date IS NOT NULL GROUP BY date(return_date)
+        ) GROUP BY day
+    ''')
+    buckets = conn.execute('SELECT COUNT(*) AS count FROM book_loan_buckets').fetchone()['count']
+    days = conn.execute('SELECT COUNT(*) AS count FROM circulation_daily').fetchone()['count']
+    conn.commit()
+    conn.close()
+    return {'book_buckets': buckets, 'days': days}
+
+def get_book_loan_counts_since(first_day: str) -> List[Tuple[int, int]]:
+    """Get (book_id, loans) totals from the daily buckets on or after first_day."""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT book_id, SUM(loans) AS loans FROM book_loan_buckets
+        WHERE day >= ? GROUP BY book_id
+    ''', (first_day,)).fetchall()
+    conn.close()
+    return [(row['book_id'], row['loans']) for row in rows]
+
+def get_circulation_daily_since(first_day: str) -> List[Dict]:
+    """Get per-day loan and return totals on or after first_day."""
+    conn = get_db_connection()
+    rows = conn.execute(
+        'SELECT * FROM circulation_daily WHERE day >= ? ORDER BY day', (first_day,)
+    ).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
 def add_sample_data():
     """Add sample data to the database if it's empty."""
     conn = get_db_connection()
@@ -79,37 +870,100 @@ def add_sample_data():
         conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
         
         conn.commit()
+        notify_catalog_listeners()
     
     conn.close()
 
 # Helper Functions for Database Operations
 
-def get_all_books() -> List[Dict]:
+def get_all_books() -> List[Book]:
     """Get all books from the database."""
     conn = get_db_connection()
-    books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
+    books = query_records(conn, Book, 'SELECT ' + BOOK_COLUMNS + ' FROM books ORDER BY title').fetchall()
     conn.close()
-    return [dict(book) for book in books]
+    return books
+
+def iter_all_books(batch_size: int = 500) -> Iterator[Book]:
+    """
+    Yield all books ordered by title without building the full list.
+    
+    Rows are pulled from the cursor batch_size at a time; the connection
+    stays open until the generator is exhausted or closed.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = query_records(conn, Book, 'SELECT ' + BOOK_COLUMNS + ' FROM books ORDER BY title')
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
 
-def get_book_by_id(book_id: int) -> Optional[Dict]:
+def get_book_by_id(book_id: int) -> Optional[Book]:
     """Get a specific book by ID."""
     conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
+    book = query_records(conn, Book, 'SELECT ' + BOOK_COLUMNS + ' FROM books WHERE id = ?', (book_id,)).fetchone()
     conn.close()
-    return dict(book) if book else None
+    return book
 
-def get_book_by_isbn(isbn: str) -> Optional[Dict]:
+def get_book_by_isbn(isbn: str) -> Optional[Book]:
     """Get a specific book by ISBN."""
     conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
+    book = query_records(conn, Book, 'SELECT ' + BOOK_COLUMNS + ' FROM books WHERE isbn = ?', (isbn,)).fetchone()
     conn.close()
-    return dict(book) if book else None
+    return book
+
+def get_books_by_ids(book_ids: List[int], conn=None) -> List[Book]:
+    """Get several books by ID in one query (order is not preserved)."""
+    if not book_ids:
+        return []
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    placeholders = ','.join('?' for _ in book_ids)
+    books = query_records(
+        conn, Book, 'SELECT ' + BOOK_COLUMNS + ' FROM books WHERE id IN (' + placeholders + ')', list(book_ids)
+    ).fetchall()
+    if own_conn:
+        conn.close()
+    return books
 
-def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
+def get_book_id_boundaries(parts: int) -> List[int]:
+    """
+    First book ID of each of `parts` equally sized ID ranges.
+    
+    The first boundary is always 0 so every ID falls into some range.
+    """
+    conn = get_db_connection()
+    count = conn.execute('SELECT COUNT(*) AS count FROM books').fetchone()['count']
+    boundaries = [0]
+    for part in range(1, parts):
+        record = conn.execute('SELECT id FROM books ORDER BY id LIMIT 1 OFFSET ?',
+                              (count * part // parts,)).fetchone()
+        if record and record['id'] > boundaries[-1]:
+            boundaries.append(record['id'])
+    conn.close()
+    return boundaries
+
+def get_books_in_id_range(low: int, high: Optional[int], after_id: int = 0) -> List[Book]:
+    """Books with low <= id < high (no upper bound if high is None) and id > after_id."""
+    conn = get_db_connection()
+    query = 'SELECT ' + BOOK_COLUMNS + ' FROM books WHERE id >= ? AND id > ?'
+    params = [low, after_id]
+    if high is not None:
+        query += ' AND id < ?'
+        params.append(high)
+    books = query_records(conn, Book, query + ' ORDER BY id', params).fetchall()
+    conn.close()
+    return books
+
+def get_patron_borrowed_books(patron_id: str) -> List[BorrowedBook]:
     """Get currently borrowed books for a patron."""
     conn = get_db_connection()
     records = conn.execute('''
-        SELECT br.*, b.title, b.author 
+        SELECT br.book_id, b.title, b.author, br.borrow_date, br.due_date
         FROM borrow_records br 
         JOIN books b ON br.book_id = b.id 
         WHERE br.patron_id = ? AND br.return_date IS NULL
@@ -117,28 +971,46 @@ def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
     ''', (patron_id,)).fetchall()
     conn.close()
     
+    now = datetime.now()
     borrowed_books = []
-    for record in records:
-        borrowed_books.append({
-            'book_id': record['book_id'],
-            'title': record['title'],
-            'author': record['author'],
-            'borrow_date': datetime.fromisoformat(record['borrow_date']),
-            'due_date': datetime.fromisoformat(record['due_date']),
-            'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
-        })
+    for book_id, title, author, borrow_date, due_date in records:
+        due_date = datetime.fromisoformat(due_date)
+        borrowed_books.append(BorrowedBook((
+            book_id, title, author, datetime.fromisoformat(borrow_date), due_date, now > due_date
+        )))
     
     return borrowed_books
 
+def get_active_loans_for_patrons(patron_ids: List[str], conn=None) -> List[ActiveLoan]:
+    """Get the active borrow records of many patrons with set-based queries."""
+    patron_ids = list(dict.fromkeys(patron_ids))
+    if not patron_ids:
+        return []
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    loans = []
+    # Stay well below SQLite's limit on bound parameters per statement
+    for start in range(0, len(patron_ids), 500):
+        chunk = patron_ids[start:start + 500]
+        placeholders = ','.join('?' for _ in chunk)
+        records = conn.execute('''
+            SELECT patron_id, book_id, borrow_date, due_date
+            FROM borrow_records
+            WHERE return_date IS NULL AND patron_id IN (''' + placeholders + ''')
+            ORDER BY patron_id, borrow_date
+        ''', chunk).fetchall()
+        for patron_id, book_id, borrow_date, due_date in records:
+            loans.append(ActiveLoan((
+                patron_id, book_id, datetime.fromisoformat(borrow_date), datetime.fromisoformat(due_date)
+            )))
+    if own_conn:
+        conn.close()
+    return loans
+
 def get_patron_borrow_count(patron_id: str) -> int:
     """Get the number of books currently borrowed by a patron."""
-    conn = get_db_connection()
-    count = conn.execute('''
-        SELECT COUNT(*) as count FROM borrow_records 
-        WHERE patron_id = ? AND return_date IS NULL
-    ''', (patron_id,)).fetchone()['count']
-    conn.close()
-    return count
+    return get_patron_summary(patron_id)['active_loans']
 
 def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
     """Insert a new book into the database."""
@@ -150,19 +1022,237 @@ def insert_book(title: str, author: str, isbn: str, total_copies: int, available
         ''', (title, author, isbn, total_copies, available_copies))
         conn.commit()
         conn.close()
+        notify_catalog_listeners()
         return True
     except Exception as e:
         conn.close()
         return False
 
-def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
-    """Insert a new borrow record into the database."""
-    conn = get_db_connection()
+def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime, conn=None) -> bool:
+    """
+    Insert a new borrow record into the database.
+    
+    When conn is given the insert joins the caller's transaction and is
+    not committed here.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
     try:
         conn.execute('''
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
         ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
+        if own_conn:
+            conn.commit()
+            conn.close()
+        return True
+    except Exception as e:
+        if own_conn:
+            conn.close()
+        return False
+
+def update_book_availability(book_id: int, change: int, conn=None) -> bool:
+    """
+    Update the available copies of a book by a given amount (+1 for return, -1 for borrow).
+    
+    When conn is given the update joins the caller's transaction and is
+    not committed here.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    try:
+        conn.execute('''
+            UPDATE books SET available_copies = available_copies + ? WHERE id = ?
+        ''', (change, book_id))
+        if own_conn:
+            conn.commit()
+            conn.close()
+            notify_catalog_listeners()
+        return True
+    except Exception as e:
+        if own_conn:
+            conn.close()
+        return False
+
+def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime, conn=None,
+                                     late_fee: float = 0.0) -> bool:
+    """
+    Update the return date for a borrow record.
+    
+    When conn is given the update joins the caller's transaction and is
+    not committed here. late_fee is the fee assessed at return, which is
+    added to the patron's assessed fees.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    try:
+        conn.execute('''
+            UPDATE borrow_records 
+            SET return_date = ?, late_fee = ?
+            WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+        ''', (return_date.isoformat(), late_fee, patron_id, book_id))
+        if own_conn:
+            conn.commit()
+            conn.close()
+        return True
+    except Exception as e:
+        if own_conn:
+            conn.close()
+        return False
+
+def insert_hold(patron_id: str, book_id: int, created_at: datetime, conn=None) -> bool:
+    """Add a patron to the end of a book's hold queue."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    try:
+        conn.execute('''
+            INSERT INTO holds (patron_id, book_id, created_at)
+            VALUES (?, ?, ?)
+        ''', (patron_id, book_id, created_at.isoformat()))
+        if own_conn:
+            conn.commit()
+            conn.close()
+        return True
+    except Exception as e:
+        if own_conn:
+            conn.close()
+        return False
+
+def delete_hold(hold_id: int, conn=None) -> bool:
+    """Remove a hold from its queue (cancelled or fulfilled)."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    try:
+        conn.execute('DELETE FROM holds WHERE id = ?', (hold_id,))
+        if own_conn:
+            conn.commit()
+            conn.close()
+        return True
+    except Exception as e:
+        if own_conn:
+            conn.close()
+        return False
+
+def get_next_hold(book_id: int, conn=None) -> Optional[Dict]:
+    """Get the oldest hold for a book (an index lookup, no scan of the queue)."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    hold = conn.execute('''
+        SELECT * FROM holds WHERE book_id = ?
+        ORDER BY created_at, id LIMIT 1
+    ''', (book_id,)).fetchone()
+    if own_conn:
+        conn.close()
+    return dict(hold) if hold else None
+
+def get_patron_holds(patron_id: str, conn=None) -> List[Dict]:
+    """Get a patron's holds with their position in each book's queue."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    records = conn.execute('''
+        SELECT h.*, b.title, b.author,
+               (SELECT COUNT(*) FROM holds ahead
+                WHERE ahead.book_id = h.book_id
+                  AND (ahead.created_at < h.created_at
+                       OR (ahead.created_at = h.created_at AND ahead.id < h.id))) + 1 AS position
+        FROM holds h
+        JOIN books b ON h.book_id = b.id
+        WHERE h.patron_id = ?
+        ORDER BY h.created_at, h.id
+    ''', (patron_id,)).fetchall()
+    if own_conn:
+        conn.close()
+    return [dict(record) for record in records]
+
+def get_patron_hold_count(patron_id: str, conn=None) -> int:
+    """Get the number of holds a patron has placed."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    count = conn.execute(
+        'SELECT COUNT(*) as count FROM holds WHERE patron_id = ?', (patron_id,)
+    ).fetchone()['count']
+    if own_conn:
+        conn.close()
+    return count
+
+def get_overdue_loans_after(after_due_date: str, after_id: int, now: datetime, limit: int) -> List[Dict]:
+    """
+    Get active loans that are past due, in (due_date, id) order after a cursor.
+    
+    Uses the partial due-date index, so only loans after the cursor are read.
+    """
+    conn = get_db_connection()
+    records = conn.execute('''
+        SELECT id, patron_id, book_id, due_date
+        FROM borrow_records
+        WHERE return_date IS NULL AND (due_date, id) > (?, ?) AND due_date <= ?
+        ORDER BY due_date, id
+        LIMIT ?
+    ''', (after_due_date, after_id, now.isoformat(), limit)).fetchall()
+    conn.close()
+    return [dict(record) for record in records]
+
+def get_overdue_loans_added_after(after_id: int, through_due_date: str, through_id: int,
+                                  limit: int) -> List[Dict]:
+    """
+    Get active loans with an ID above after_id that sort at or before a (due_date, id) cursor.
+    
+    These are loans recorded after the cursor had already passed their due
+    date (e.g. entered with a past due date). Read in ID order by primary key.
+    """
+    conn = get_db_connection()
+    records = conn.execute('''
+        SELECT id, patron_id, book_id, due_date
+        FROM borrow_records
+        WHERE id > ? AND return_date IS NULL AND (due_date, id) <= (?, ?)
+        ORDER BY id
+        LIMIT ?
+    ''', (after_id, through_due_date, through_id, limit)).fetchall()
+    conn.close()
+    return [dict(record) for record in records]
+
+def get_max_borrow_record_id() -> int:
+    """Get the highest borrow record ID (0 if there are none)."""
+    conn = get_db_connection()
+    record = conn.execute('SELECT COALESCE(MAX(id), 0) AS max_id FROM borrow_records').fetchone()
+    conn.close()
+    return record['max_id']
+
+def get_next_due_date_after(after_due_date: str, after_id: int) -> Optional[datetime]:
+    """Get the due date of the next active loan after a cursor, if any."""
+    conn = get_db_connection()
+    record = conn.execute('''
+        SELECT due_date FROM borrow_records
+        WHERE return_date IS NULL AND (due_date, id) > (?, ?)
+        ORDER BY due_date, id
+        LIMIT 1
+    ''', (after_due_date, after_id)).fetchone()
+    conn.close()
+    return datetime.fromisoformat(record['due_date']) if record else None
+
+def get_scheduler_state(name: str) -> Optional[str]:
+    """Get a stored background job cursor."""
+    conn = get_db_connection()
+    record = conn.execute('SELECT value FROM scheduler_state WHERE name = ?', (name,)).fetchone()
+    conn.close()
+    return record['value'] if record else None
+
+def set_scheduler_state(name: str, value: str) -> bool:
+    """Store a background job cursor."""
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            INSERT INTO scheduler_state (name, value) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET value = excluded.value
+        ''', (name, value))
         conn.commit()
         conn.close()
         return True
@@ -170,32 +1260,636 @@ def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, du
         conn.close()
         return False
 
-def update_book_availability(book_id: int, change: int) -> bool:
-    """Update the available copies of a book by a given amount (+1 for return, -1 for borrow)."""
+def insert_overdue_events(events: List[Dict]) -> bool:
+    """Append overdue notifications to the outbox (duplicates are ignored)."""
+    conn = get_db_connection()
+    try:
+        conn.executemany('''
+            INSERT OR IGNORE INTO overdue_events (borrow_record_id, patron_id, book_id, due_date, detected_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(event['borrow_record_id'], event['patron_id'], event['book_id'],
+               event['due_date'], event['detected_at']) for event in events])
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+def iter_patron_histories(chunk_size: int = 5000) -> Iterator[Tuple[str, List[int]]]:
+    """
+    Yield (patron_id, distinct book IDs) for every patron with loans.
+    
+    Each patron's books are most recently borrowed first, so callers can
+    cap a long history by slicing. Records are read chunk_size rows at a
+    time in patron order, so the whole table is never held in memory.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            SELECT patron_id, book_id, MAX(borrow_date) AS last_borrowed FROM borrow_records
+            GROUP BY patron_id, book_id
+            ORDER BY patron_id, last_borrowed DESC, book_id
+        ''')
+        current_patron = None
+        books = []
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                if row['patron_id'] != current_patron:
+                    if books:
+                        yield current_patron, books
+                    current_patron, books = row['patron_id'], []
+                books.append(row['book_id'])
+        if books:
+            yield current_patron, books
+    finally:
+        conn.close()
+
+def replace_book_related(rows: List[Tuple[int, int, int, float, int]]) -> bool:
+    """
+    Swap in a new set of (book_id, rank, related_book_id, score, co_borrowers) rows.
+    
+    Catalog and search pages show related books, so the catalog version is
+    bumped in the same transaction and cached copies stop validating.
+    """
     conn = get_db_connection()
     try:
+        conn.execute('DELETE FROM book_related')
+        conn.executemany('''
+            INSERT INTO book_related (book_id, rank, related_book_id, score, co_borrowers)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
         conn.execute('''
-            UPDATE books SET available_copies = available_copies + ? WHERE id = ?
-        ''', (change, book_id))
+            UPDATE catalog_state SET version = version + 1,
+                last_modified = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE id = 1
+        ''')
         conn.commit()
         conn.close()
+        notify_catalog_listeners()
         return True
     except Exception as e:
+        conn.rollback()
         conn.close()
         return False
 
-def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime) -> bool:
-    """Update the return date for a borrow record."""
+def get_related_for_books(book_ids: List[int], limit: int) -> Dict[int, List[Dict]]:
+    """Get up to `limit` precomputed neighbours for each book, best first."""
+    if not book_ids:
+        return {}
+    conn = get_db_connection()
+    placeholders = ','.join('?' for _ in book_ids)
+    rows = conn.execute('''
+        SELECT r.book_id, r.rank, r.related_book_id, r.score, r.co_borrowers, b.title, b.author
+        FROM book_related r
+        JOIN books b ON b.id = r.related_book_id
+        WHERE r.book_id IN (''' + placeholders + ''') AND r.rank < ?
+        ORDER BY r.book_id, r.rank
+    ''', list(book_ids) + [limit]).fetchall()
+    conn.close()
+    related = {}
+    for row in rows:
+        related.setdefault(row['book_id'], []).append({
+            'book_id': row['related_book_id'],
+            'title': row['title'],
+            'author': row['author'],
+            'score': row['score'],
+            'co_borrowers': row['co_borrowers']
+        })
+    return related
+
+def insert_payment(patron_id: str, book_id: Optional[int], amount: float, status: str = 'pending') -> Optional[int]:
+    """Record a charge in the payments ledger before it is sent. Returns the ledger ID."""
+    conn = get_db_connection()
+    try:
+        now = datetime.now().isoformat()
+        cursor = conn.execute('''
+            INSERT INTO payments (patron_id, book_id, amount, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (patron_id, book_id, amount, status, now, now))
+        conn.commit()
+        conn.close()
+        return cursor.lastrowid
+    except Exception as e:
+        conn.close()
+        return None
+
+def update_payment(payment_id: int, status: str, transaction_id: Optional[str] = None,
+                   message: Optional[str] = None) -> bool:
+    """Record the gateway's answer for a ledger entry."""
     conn = get_db_connection()
     try:
         conn.execute('''
-            UPDATE borrow_records 
-            SET return_date = ? 
-            WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
-        ''', (return_date.isoformat(), patron_id, book_id))
+            UPDATE payments
+            SET status = ?, transaction_id = COALESCE(?, transaction_id), message = ?, updated_at = ?
+            WHERE id = ?
+        ''', (status, transaction_id, message, datetime.now().isoformat(), payment_id))
         conn.commit()
         conn.close()
         return True
     except Exception as e:
         conn.close()
         return False
+
+def get_payment_by_transaction(transaction_id: str) -> Optional[Dict]:
+    """Get the most recent ledger entry for a gateway transaction ID."""
+    conn = get_db_connection()
+    payment = conn.execute('''
+        SELECT * FROM payments WHERE transaction_id = ? ORDER BY id DESC LIMIT 1
+    ''', (transaction_id,)).fetchone()
+    conn.close()
+    return dict(payment) if payment else None
+
+def reserve_payment_refund(payment_id: int, amount: float) -> bool:
+    """
+    Count a refund against a ledger entry before it is sent to the gateway.
+    
+    The check and the update are one statement, so concurrent refunds can
+    never reserve more than was paid. Returns False if the amount does not
+    fit (or on a database error).
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            UPDATE payments SET refunded_amount = refunded_amount + ?
+            WHERE id = ? AND refunded_amount + ? <= amount + 0.005
+        ''', (amount, payment_id, amount))
+        conn.commit()
+        conn.close()
+        return cursor.rowcount == 1
+    except Exception as e:
+        conn.close()
+        return False
+
+def release_payment_refund(payment_id: int, amount: float) -> bool:
+    """Undo reserve_payment_refund after the gateway did not refund."""
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            UPDATE payments SET refunded_amount = MAX(0, refunded_amount - ?) WHERE id = ?
+        ''', (amount, payment_id))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+def record_payment_refund(payment_id: int, message: str) -> bool:
+    """Update a ledger entry's status after a reserved refund went through."""
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            UPDATE payments
+            SET status = CASE WHEN refunded_amount >= amount - 0.005
+                              THEN 'refunded' ELSE 'partially_refunded' END,
+                message = ?, updated_at = ?, reconciled_at = NULL
+            WHERE id = ?
+        ''', (message, datetime.now().isoformat(), payment_id))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+def get_patron_payments(patron_id: str) -> List[Dict]:
+    """Get a patron's ledger entries, newest first."""
+    conn = get_db_connection()
+    payments = conn.execute('''
+        SELECT * FROM payments WHERE patron_id = ? ORDER BY created_at DESC, id DESC
+    ''', (patron_id,)).fetchall()
+    conn.close()
+    return [dict(payment) for payment in payments]
+
+def get_unreconciled_payments(after_id: int, limit: int) -> List[Dict]:
+    """Get ledger entries with a transaction ID that were not checked against the gateway yet."""
+    conn = get_db_connection()
+    payments = conn.execute('''
+        SELECT * FROM payments
+        WHERE reconciled_at IS NULL AND transaction_id IS NOT NULL AND id > ?
+        ORDER BY id LIMIT ?
+    ''', (after_id, limit)).fetchall()
+    conn.close()
+    return [dict(payment) for payment in payments]
+
+def get_unsettled_payments(updated_before: str, after_id: int, limit: int) -> List[Dict]:
+    """
+    Get ledger entries whose charge outcome is unknown ('pending' or 'error',
+    no transaction ID) and that have not changed since updated_before.
+    """
+    conn = get_db_connection()
+    payments = conn.execute('''
+        SELECT * FROM payments
+        WHERE transaction_id IS NULL AND status IN ('pending', 'error') AND updated_at < ? AND id > ?
+        ORDER BY id LIMIT ?
+    ''', (updated_before, after_id, limit)).fetchall()
+    conn.close()
+    return [dict(payment) for payment in payments]
+
+def settle_payments(results: List[Tuple[int, str, Optional[str], str]]) -> bool:
+    """Store (payment_id, status, transaction_id, gateway_status) for unsettled entries in one transaction."""
+    conn = get_db_connection()
+    try:
+        now = datetime.now().isoformat()
+        conn.executemany('''
+            UPDATE payments
+            SET status = ?, transaction_id = COALESCE(?, transaction_id), gateway_status = ?,
+                reconciled_at = ?, updated_at = ?
+            WHERE id = ? AND transaction_id IS NULL AND status IN ('pending', 'error')
+        ''', [(status, transaction_id, gateway_status, now, now, payment_id)
+               for payment_id, status, transaction_id, gateway_status in results])
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+def mark_payments_reconciled(results: List[Tuple[int, str, Optional[str]]]) -> bool:
+    """Store (payment_id, gateway_status, new_status or None) for a batch in one transaction."""
+    conn = get_db_connection()
+    try:
+        now = datetime.now().isoformat()
+        conn.executemany('''
+            UPDATE payments
+            SET gateway_status = ?, status = COALESCE(?, status), reconciled_at = ?, updated_at = ?
+            WHERE id = ?
+        ''', [(gateway_status, new_status, now, now, payment_id)
+               for payment_id, gateway_status, new_status in results])
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+def insert_payment_job(kind: str, payload: Dict, job_key: Optional[str] = None) -> Optional[int]:
+    """
+    Queue a payment or refund request. Returns the job ID.
+    
+    Returns None if a queued or running job already has job_key (or on a
+    database error); the unique index makes that check atomic.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            INSERT INTO payment_jobs (kind, payload, created_at, job_key) VALUES (?, ?, ?, ?)
+        ''', (kind, json.dumps(payload), datetime.now().isoformat(), job_key))
+        conn.commit()
+        conn.close()
+        return cursor.lastrowid
+    except Exception as e:
+        conn.close()
+        return None
+
+def claim_payment_job(owner: str = '', lease_seconds: float = 300.0) -> Optional[Dict]:
+    """
+    Mark the oldest queued job as running and return it (None if the queue is empty).
+    
+    The job records its owner (worker process) and a lease; only jobs
+    whose lease has run out are treated as abandoned by
+    fail_expired_payment_jobs. The select and update share one write
+    transaction (UPDATE ... RETURNING would need SQLite 3.35).
+    """
+    now = datetime.now()
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        job = conn.execute('''
+            SELECT * FROM payment_jobs WHERE status = 'queued' ORDER BY id LIMIT 1
+        ''').fetchone()
+        if job:
+            job = dict(job, status='running', started_at=now.isoformat(), owner=owner,
+                       lease_expires_at=(now + timedelta(seconds=lease_seconds)).isoformat())
+            conn.execute('''
+                UPDATE payment_jobs SET status = ?, started_at = ?, owner = ?, lease_expires_at = ?
+                WHERE id = ?
+            ''', (job['status'], job['started_at'], owner, job['lease_expires_at'], job['id']))
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        conn.close()
+        return None
+    if not job:
+        return None
+    job['payload'] = json.loads(job['payload'])
+    return job
+
+def finish_payment_job(job_id: int, status: str, message: str, transaction_id: Optional[str] = None) -> bool:
+    """Store the outcome of a job."""
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            UPDATE payment_jobs SET status = ?, message = ?, transaction_id = ?, finished_at = ?
+            WHERE id = ?
+        ''', (status, message, transaction_id, datetime.now().isoformat(), job_id))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+def fail_expired_payment_jobs(message: str) -> int:
+    """
+    Close out running jobs whose lease has expired (their worker stopped).
+    
+    Jobs still leased by a live worker, in this or another process, are
+    left alone. Returns the number of jobs closed.
+    """
+    now = datetime.now().isoformat()
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            UPDATE payment_jobs SET status = 'interrupted', message = ?, finished_at = ?
+            WHERE status = 'running' AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+        ''', (message, now, now))
+        conn.commit()
+        conn.close()
+        return cursor.rowcount
+    except Exception as e:
+        conn.close()
+        return 0
+
+def get_active_payment_job(job_key: str) -> Optional[Dict]:
+    """Get the queued or running job with a key, if any."""
+    conn = get_db_connection()
+    job = conn.execute('''
+        SELECT id FROM payment_jobs WHERE job_key = ? AND status IN ('queued', 'running')
+    ''', (job_key,)).fetchone()
+    conn.close()
+    return get_payment_job(job['id']) if job else None
+
+def get_payment_job(job_id: int) -> Optional[Dict]:
+    """Get a payment job by ID."""
+    conn = get_db_connection()
+    job = conn.execute('SELECT * FROM payment_jobs WHERE id = ?', (job_id,)).fetchone()
+    conn.close()
+    if not job:
+        return None
+    job = dict(job)
+    job['payload'] = json.loads(job['payload'])
+    return job
+
+def count_queued_payment_jobs() -> int:
+    """Number of jobs waiting for a worker."""
+    conn = get_db_connection()
+    count = conn.execute("SELECT COUNT(*) AS count FROM payment_jobs WHERE status = 'queued'").fetchone()['count']
+    conn.close()
+    return count
+
+def init_branch_store(database_path: str) -> None:
+    """Create a sharded branch database (WAL mode, so readers never block its writers)."""
+    conn = get_db_connection(database_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    _create_branch_tables(conn)
+    conn.commit()
+    conn.close()
+
+def insert_branch(branch_id: str, name: str, database_path: Optional[str] = None) -> bool:
+    """Register a branch; with database_path its inventory and loans go in that file."""
+    try:
+        if database_path:
+            init_branch_store(database_path)
+        conn = get_db_connection()
+    except Exception as e:
+        return False
+    try:
+        conn.execute('INSERT INTO branches (id, name, database_path) VALUES (?, ?, ?)',
+                     (branch_id, name, database_path))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+def get_branches() -> List[Dict]:
+    """Get all branches ordered by ID."""
+    conn = get_db_connection()
+    branches = conn.execute('SELECT * FROM branches ORDER BY id').fetchall()
+    conn.close()
+    return [dict(branch) for branch in branches]
+
+def get_branch(branch_id: str) -> Optional[Dict]:
+    """Get a branch by ID."""
+    conn = get_db_connection()
+    branch = conn.execute('SELECT * FROM branches WHERE id = ?', (branch_id,)).fetchone()
+    conn.close()
+    return dict(branch) if branch else None
+
+def get_branch_stores(conn=None) -> List[Optional[str]]:
+    """Distinct databases holding branch data (None is the main database)."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    rows = conn.execute('SELECT DISTINCT database_path FROM branches').fetchall()
+    if own_conn:
+        conn.close()
+    return [row['database_path'] for row in rows]
+
+def get_branch_inventory(branch_id: str, book_id: int, conn) -> Optional[Dict]:
+    """Get a branch's copy counts for a book, inside the caller's transaction."""
+    row = conn.execute('''
+        SELECT * FROM branch_inventory WHERE branch_id = ? AND book_id = ?
+    ''', (branch_id, book_id)).fetchone()
+    return dict(row) if row else None
+
+def set_branch_inventory(branch_id: str, book_id: int, total_copies: int, available_copies: int, conn) -> bool:
+    """Insert or replace a branch's copy counts for a book, inside the caller's transaction."""
+    try:
+        conn.execute('''
+            INSERT INTO branch_inventory (branch_id, book_id, total_copies, available_copies)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (branch_id, book_id)
+            DO UPDATE SET total_copies = excluded.total_copies, available_copies = excluded.available_copies
+        ''', (branch_id, book_id, total_copies, available_copies))
+        return True
+    except Exception as e:
+        return False
+
+def update_branch_availability(branch_id: str, book_id: int, change: int, conn) -> bool:
+    """Change a branch's available copies of a book, inside the caller's transaction."""
+    try:
+        conn.execute('''
+            UPDATE branch_inventory SET available_copies = available_copies + ?
+            WHERE branch_id = ? AND book_id = ?
+        ''', (change, branch_id, book_id))
+        return True
+    except Exception as e:
+        return False
+
+def insert_branch_borrow_record(branch_id: str, patron_id: str, book_id: int, borrow_date: datetime,
+                                due_date: datetime, conn) -> bool:
+    """Insert a loan made at a branch, inside the caller's transaction."""
+    try:
+        conn.execute('''
+            INSERT INTO branch_borrow_records (branch_id, patron_id, book_id, borrow_date, due_date)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (branch_id, patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
+        return True
+    except Exception as e:
+        return False
+
+def get_active_branch_loan(branch_id: str, patron_id: str, book_id: int, conn) -> Optional[Dict]:
+    """Get the patron's oldest active loan of a book from a branch, with due_date parsed."""
+    row = conn.execute('''
+        SELECT * FROM branch_borrow_records
+        WHERE patron_id = ? AND book_id = ? AND branch_id = ? AND return_date IS NULL
+        ORDER BY id LIMIT 1
+    ''', (patron_id, book_id, branch_id)).fetchone()
+    if not row:
+        return None
+    loan = dict(row)
+    loan['due_date'] = datetime.fromisoformat(loan['due_date'])
+    return loan
+
+def update_branch_borrow_record_return_date(record_id: int, return_date: datetime, late_fee: float, conn) -> bool:
+    """Close a branch loan, inside the caller's transaction."""
+    try:
+        conn.execute('''
+            UPDATE branch_borrow_records SET return_date = ?, late_fee = ?
+            WHERE id = ? AND return_date IS NULL
+        ''', (return_date.isoformat(), late_fee, record_id))
+        return True
+    except Exception as e:
+        return False
+
+def get_branch_store_inventory(database_path: Optional[str], book_ids: Optional[List[int]] = None) -> List[Dict]:
+    """
+    Read every branch inventory row in one database (optionally only some books).
+    
+    A single autocommit read: it sees one consistent state of that
+    database and holds no lock once it returns.
+    """
+    conn = get_db_connection(database_path)
+    query = 'SELECT * FROM branch_inventory'
+    params = []
+    if book_ids is not None:
+        query += ' WHERE book_id IN (' + ','.join('?' for _ in book_ids) + ')'
+        params = list(book_ids)
+    rows = conn.execute(query + ' ORDER BY book_id, branch_id', params).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+class _BackupRestarted(Exception):
+    """Raised from the backup progress callback to abandon a stepped copy."""
+
+def backup_database(dest_path: str, pages: int = 256, pause: float = 0.005,
+                    database_path: Optional[str] = None, max_restarts: int = 3) -> Dict:
+    """
+    Copy a live database to dest_path with the SQLite online backup API.
+    
+    Pages are copied `pages` at a time and the source is left unlocked for
+    `pause` seconds between steps, so writers wait for one small step at
+    most. A write made through another connection restarts the copy from
+    the first page (counted in 'restarts'). After max_restarts the stepped
+    copy is abandoned and the database is copied in one step, so a steady
+    stream of writes cannot keep the backup from finishing ('single_step').
+    The copy is written next to dest_path and renamed into place once
+    complete; a failed copy is removed.
+    
+    Returns:
+        dict: pages copied, steps, restarts, single_step and duration_ms
+    """
+    started = time.perf_counter()
+    temp_path = dest_path + '.tmp'
+    progress = {'steps': 0, 'restarts': 0, 'remaining': None, 'pages': 0}
+    
+    def on_progress(status, remaining, total):
+        # A step that went through (status SQLITE_OK) without reducing the
+        # remaining pages started again from the first page
+        if status == sqlite3.SQLITE_OK and progress['remaining'] is not None \
+                and remaining >= progress['remaining']:
+            progress['restarts'] += 1
+            if progress['restarts'] > max_restarts:
+                raise _BackupRestarted()
+        progress['steps'] += 1
+        progress['remaining'] = remaining
+        progress['pages'] = total
+        if remaining and pause:
+            time.sleep(pause)
+    
+    single_step = False
+    renamed = False
+    try:
+        source = sqlite3.connect(database_path or DATABASE)
+        target = sqlite3.connect(temp_path)
+        try:
+            try:
+                source.backup(target, pages=pages, progress=on_progress)
+            except _BackupRestarted:
+                single_step = True
+                source.backup(target, pages=-1)
+                progress['steps'] += 1
+        finally:
+            target.close()
+            source.close()
+        os.replace(temp_path, dest_path)
+        renamed = True
+    finally:
+        if not renamed and os.path.exists(temp_path):
+            os.remove(temp_path)
+    return {
+        'database': database_path or DATABASE,
+        'path': dest_path,
+        'pages': progress['pages'],
+        'steps': progress['steps'],
+        'restarts': progress['restarts'],
+        'single_step': single_step,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+    }
+
+def optimize_database(database_path: Optional[str] = None, analyze: bool = True, vacuum: bool = False,
+                      analysis_limit: int = 1000) -> Dict:
+    """
+    Refresh planner statistics and checkpoint the WAL of one database.
+    
+    ANALYZE samples at most analysis_limit rows per index so it stays
+    short on a large catalog; PRAGMA optimize then re-analyzes only what
+    the planner flags. VACUUM rewrites the whole file and blocks writers
+    while it runs, so it is off unless asked for. WAL checkpoints are
+    PASSIVE and never wait for readers or writers.
+    
+    Returns:
+        dict: Per-step durations (ms), page counts and the checkpoint result
+    """
+    started = time.perf_counter()
+    conn = get_db_connection(database_path)
+    timings = {}
+    
+    def timed(name, sql):
+        step_started = time.perf_counter()
+        row = conn.execute(sql).fetchone()
+        timings[name] = round((time.perf_counter() - step_started) * 1000, 3)
+        return row
+    
+    try:
+        freelist_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if analyze:
+            conn.execute('PRAGMA analysis_limit = ' + str(int(analysis_limit)))
+            timed('analyze', 'ANALYZE')
+        timed('optimize', 'PRAGMA optimize')
+        if vacuum:
+            timed('vacuum', 'VACUUM')
+        checkpoint = None
+        if conn.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal':
+            busy, log_pages, checkpointed = timed('checkpoint', 'PRAGMA wal_checkpoint(PASSIVE)')
+            checkpoint = {'busy': busy, 'log_pages': log_pages, 'checkpointed_pages': checkpointed}
+        conn.commit()
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        freelist_after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    finally:
+        conn.close()
+    return {
+        'database': database_path or DATABASE,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+        'steps': timings,
+        'page_count': page_count,
+        'freelist_pages': freelist_after,
+        'pages_reclaimed': max(0, freelist_before - freelist_after),
+        'checkpoint': checkpoint,
+    }
@@ -0,0 +1,99 @@
+"""
+Record types for rows read from the database
+Rows are kept as tuple subclasses with no per-instance __dict__, which is
+much smaller and faster to build than a dict per row. Records still support
+the mapping-style access the services and templates use (book['title'],
+book.get('isbn'), book.title, dict(book)), but they are read-only.
+"""
+
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Tuple
+
+
+class Record(tuple):
+    """Base class for tuple-backed rows; create subclasses with record_type()."""
+
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+    _index: Dict[str, int] = {}
+
+    def __new__(cls, values: Iterable = ()):
+        record = tuple.__new__(cls, values)
+        if len(record) != len(cls._fields):
+            raise TypeError(cls.__name__ + ' expects ' + str(len(cls._fields)) + ' values')
+        return record
+
+    @classmethod
+    def row_factory(cls, cursor, row: tuple) -> 'Record':
+        """sqlite3 row factory; the query must select the fields in order."""
+        return tuple.__new__(cls, row)
+
+    def __getitem__(self, key):
+        if key.__class__ is str:
+            try:
+                key = self._index[key]
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._index
+
+    def get(self, key: str, default: Any = None) -> Any:
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._fields
+
+    def values(self) -> Tuple:
+        return tuple(self)
+
+    def items(self):
+        return zip(self._fields, self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(self._fields, self))
+
+    def __repr__(self) -> str:
+        return self.__class__.__name__ + '(' + ', '.join(
+            field + '=' + repr(value) for field, value in zip(self._fields, self)) + ')'
+
+
+def record_type(name: str, fields: Tuple[str, ...]) -> type:
+    """Create a Record subclass with one read-only attribute per field."""
+    namespace = {
+        '__slots__': (),
+        '__module__': __name__,
+        '_fields': tuple(fields),
+        '_index': {field: i for i, field in enumerate(fields)},
+    }
+    for i, field in enumerate(fields):
+        namespace[field] = property(itemgetter(i), doc='Alias for field ' + str(i))
+    return type(name, (Record,), namespace)
+
+
+BOOK_FIELDS = ('id', 'title', 'author', 'isbn', 'total_copies', 'available_copies')
+Book = record_type('Book', BOOK_FIELDS)
+
+# A patron's current loan joined with the book (get_patron_borrowed_books)
+BorrowedBook = record_type('BorrowedBook', ('book_id', 'title', 'author', 'borrow_date', 'due_date', 'is_overdue'))
+
+# An active borrow record (get_active_loans_for_patrons)
+ActiveLoan = record_type('ActiveLoan', ('patron_id', 'book_id', 'borrow_date', 'due_date'))
+
+
+def to_jsonable(value: Any) -> Any:
+    """
+    Replace records with dicts, recursing into dicts, lists and tuples.
+
+    The json module encodes tuple subclasses as arrays before any default()
+    hook runs, so records have to be converted up front.
+    """
+    if isinstance(value, Record):
+        return {field: to_jsonable(item) for field, item in zip(value._fields, value)}
+    if isinstance(value, dict):
+        return {key: to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    return value
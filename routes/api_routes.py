@@ -2,8 +2,25 @@
 API Routes - JSON API endpoints
 """
 
-from flask import Blueprint, jsonify, request
-from services.library_service import calculate_late_fee_for_book, search_books_in_catalog
+from flask import Blueprint, Response, current_app, jsonify, request, url_for
+from routes.conditional import get_cache_validators, not_modified_response, add_cache_headers
+from routes.rate_limit import get_request_guard
+from services.library_service import (
+    calculate_late_fee_for_book, calculate_late_fees_batch, search_books_in_catalog,
+    borrow_books_batch, return_books_batch, place_hold, cancel_hold,
+    borrow_book_by_patron, return_book_by_patron
+)
+from services.branch_service import (
+    list_branches, get_consolidated_availability, borrow_book_at_branch, return_book_at_branch,
+    MAIN_BRANCH_ID
+)
+from services.stats_service import get_popular_books, get_circulation_totals, POPULARITY_WINDOWS
+from services.recommendation_service import get_related_books
+from database import (
+    get_patron_holds, get_book_by_id, get_events_after, get_patron_payments, get_payment_job
+)
+from services.autocomplete_service import autocomplete, get_autocomplete_memory_report
+from services.maintenance_scheduler import get_last_maintenance_report
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -16,6 +33,138 @@ def get_late_fee(patron_id, book_id):
     result = calculate_late_fee_for_book(patron_id, book_id)
     return jsonify(result), 501 if 'not implemented' in result.get('status', '') else 200
 
+@api_bp.route('/late_fees', methods=['POST'])
+def get_late_fees_batch():
+    """
+    Calculate late fees for many patrons/books in one request.
+    
+    Body: {"items": [{"patron_id": "123456", "book_id": 1}, ...],
+           "patron_ids": ["123456", ...]}
+    Items may also be given as [patron_id, book_id] lists.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'JSON body is required'}), 400
+    
+    items = data.get('items', [])
+    patron_ids = data.get('patron_ids', [])
+    if not isinstance(items, list) or not isinstance(patron_ids, list):
+        return jsonify({'error': 'items and patron_ids must be lists'}), 400
+    
+    if not items and not patron_ids:
+        return jsonify({'error': 'items or patron_ids is required'}), 400
+    
+    limit = current_app.config.get('LATE_FEE_BATCH_LIMIT', 1000)
+    if len(items) + len(patron_ids) > limit:
+        return jsonify({'error': 'Batch is limited to ' + str(limit) + ' entries'}), 400
+    
+    pairs = []
+    for item in items:
+        if isinstance(item, dict):
+            patron_id, book_id = item.get('patron_id'), item.get('book_id')
+        elif isinstance(item, list) and len(item) == 2:
+            patron_id, book_id = item
+        else:
+            return jsonify({'error': 'Each item needs a patron_id and a book_id'}), 400
+        if not isinstance(book_id, int):
+            return jsonify({'error': 'book_id must be an integer'}), 400
+        pairs.append((str(patron_id), book_id))
+    
+    results = calculate_late_fees_batch(pairs, [str(pid) for pid in patron_ids])
+    
+    # Pair results come first, then one row per loan of each patron_ids entry.
+    # A loan listed both ways (or as a repeated pair) is charged once.
+    loan_results = results[len(pairs):]
+    counted = {(result['patron_id'], result['book_id']) for result in loan_results}
+    totaled = list(loan_results)
+    for result in results[:len(pairs)]:
+        key = (result['patron_id'], result['book_id'])
+        if key not in counted:
+            counted.add(key)
+            totaled.append(result)
+    
+    patron_totals = {}
+    for result in totaled:
+        patron_totals[result['patron_id']] = patron_totals.get(result['patron_id'], 0.00) + result['fee_amount']
+    
+    return jsonify({
+        'results': results,
+        'count': len(results),
+        'patron_totals': patron_totals,
+        'total_fee_amount': sum(patron_totals.values())
+    })
+
+def _parse_batch_request():
+    """Read {"patron_id": ..., "book_ids": [...]} from the JSON body."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None, None, 'JSON body is required'
+    
+    patron_id = str(data.get('patron_id', '')).strip()
+    book_ids = data.get('book_ids')
+    if not isinstance(book_ids, list) or not book_ids:
+        return None, None, 'book_ids must be a non-empty list'
+    if not all(isinstance(book_id, int) for book_id in book_ids):
+        return None, None, 'book_ids must be integers'
+    return patron_id, book_ids, None
+
+@api_bp.route('/borrow/batch', methods=['POST'])
+def borrow_batch():
+    """
+    Borrow a stack of books for one patron in a single transaction.
+    Kiosk interface for R3: Book Borrowing
+    """
+    patron_id, book_ids, error = _parse_batch_request()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    success, message, results = borrow_books_batch(patron_id, book_ids)
+    if not results:
+        return jsonify({'error': message}), 400
+    
+    return jsonify({'patron_id': patron_id, 'success': success, 'message': message, 'results': results})
+
+@api_bp.route('/return/batch', methods=['POST'])
+def return_batch():
+    """
+    Return a stack of books for one patron in a single transaction.
+    Kiosk interface for R4: Book Return Processing
+    """
+    patron_id, book_ids, error = _parse_batch_request()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    success, message, results = return_books_batch(patron_id, book_ids)
+    if not results:
+        return jsonify({'error': message}), 400
+    
+    return jsonify({'patron_id': patron_id, 'success': success, 'message': message, 'results': results})
+
+@api_bp.route('/holds', methods=['POST', 'DELETE'])
+def holds_api():
+    """
+    Place (POST) or cancel (DELETE) a hold.
+    Body: {"patron_id": "123456", "book_id": 1}
+    """
+    data = request.get_json(silent=True) or {}
+    patron_id = str(data.get('patron_id', '')).strip()
+    book_id = data.get('book_id')
+    if not isinstance(book_id, int):
+        return jsonify({'error': 'book_id must be an integer'}), 400
+    
+    if request.method == 'POST':
+        success, message = place_hold(patron_id, book_id)
+        return jsonify({'success': success, 'message': message}), 201 if success else 400
+    
+    success, message = cancel_hold(patron_id, book_id)
+    return jsonify({'success': success, 'message': message}), 200 if success else 400
+
+@api_bp.route('/holds/<patron_id>')
+def patron_holds_api(patron_id):
+    """List a patron's holds and their queue positions."""
+    holds = get_patron_holds(patron_id)
+    return jsonify({'patron_id': patron_id, 'holds': holds, 'count': len(holds)})
+
 @api_bp.route('/search')
 def search_books_api():
     """
@@ -28,12 +177,260 @@ def search_books_api():
     if not search_term:
         return jsonify({'error': 'Search term is required'}), 400
     
+    validators = get_cache_validators()
+    cached = not_modified_response(validators)
+    if cached:
+        return cached
+    
     # Use business logic function
     books = search_books_in_catalog(search_term, search_type)
     
-    return jsonify({
+    response = jsonify({
         'search_term': search_term,
         'search_type': search_type,
         'results': books,
         'count': len(books)
     })
+    return add_cache_headers(response, validators)
+
+@api_bp.route('/autocomplete')
+def autocomplete_api():
+    """
+    Type-ahead suggestions for titles and authors.
+    Served from the in-memory prefix index, not from the database.
+    """
+    prefix = request.args.get('q', '').strip()
+    field = request.args.get('field', 'all')
+    
+    if not prefix:
+        return jsonify({'error': 'Search term is required'}), 400
+    
+    if field not in ('all', 'title', 'author'):
+        return jsonify({'error': 'Field must be title, author or all'}), 400
+    
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({'error': 'Limit must be an integer'}), 400
+    
+    suggestions = autocomplete(prefix, field, limit)
+    
+    return jsonify({
+        'query': prefix,
+        'field': field,
+        'suggestions': suggestions,
+        'count': len(suggestions)
+    })
+
+@api_bp.route('/autocomplete/stats')
+def autocomplete_stats_api():
+    """Memory footprint report for the autocomplete index."""
+    return jsonify(get_autocomplete_memory_report())
+
+@api_bp.route('/stats/popular')
+def popular_books_api():
+    """Top-N most borrowed books over a 7, 30 or 365 day window."""
+    try:
+        window = int(request.args.get('window', 30))
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({'error': 'window and limit must be integers'}), 400
+    
+    if window not in POPULARITY_WINDOWS:
+        return jsonify({'error': 'window must be one of 7, 30 or 365'}), 400
+    if limit <= 0 or limit > 100:
+        return jsonify({'error': 'limit must be between 1 and 100'}), 400
+    
+    books = get_popular_books(window, limit)
+    return jsonify({'window_days': window, 'results': books, 'count': len(books)})
+
+@api_bp.route('/stats/circulation')
+def circulation_stats_api():
+    """Loans and returns per day."""
+    try:
+        days = int(request.args.get('days', 30))
+    except ValueError:
+        return jsonify({'error': 'days must be an integer'}), 400
+    
+    if days <= 0 or days > 3660:
+        return jsonify({'error': 'days must be between 1 and 3660'}), 400
+    
+    return jsonify(get_circulation_totals(days))
+
+@api_bp.route('/books/<int:book_id>/related')
+def related_books_api(book_id):
+    """Books most often borrowed by the same patrons (precomputed offline)."""
+    try:
+        limit = int(request.args.get('limit', 5))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    if not get_book_by_id(book_id):
+        return jsonify({'error': 'Book not found'}), 404
+    
+    related = get_related_books(book_id, max(1, min(limit, 50)))
+    return jsonify({'book_id': book_id, 'related': related, 'count': len(related)})
+
+@api_bp.route('/events')
+def events_api():
+    """
+    Change events after a sequence number, for downstream consumers.
+    Query: after=<seq>&limit=<n>&type=<event_type> (type may repeat)
+    """
+    try:
+        after = int(request.args.get('after', 0))
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return jsonify({'error': 'after and limit must be integers'}), 400
+    
+    limit = max(1, min(limit, 1000))
+    events = get_events_after(after, limit, request.args.getlist('type') or None)
+    
+    return jsonify({
+        'events': events,
+        'count': len(events),
+        'next_after': events[-1]['seq'] if events else after
+    })
+
+@api_bp.route('/payments/<patron_id>')
+def patron_payments_api(patron_id):
+    """A patron's late-fee charges and refunds, served from the local ledger."""
+    if len(patron_id) != 6 or not patron_id.isdigit():
+        return jsonify({'error': 'Invalid patron ID. Must be exactly 6 digits.'}), 400
+    
+    payments = get_patron_payments(patron_id)
+    paid = [p for p in payments if p['status'] in ('completed', 'refunded', 'partially_refunded')]
+    
+    return jsonify({
+        'patron_id': patron_id,
+        'payments': payments,
+        'count': len(payments),
+        'total_paid': round(sum(p['amount'] for p in paid), 2),
+        'total_refunded': round(sum(p['refunded_amount'] for p in paid), 2)
+    })
+
+def _queued_response(accepted, message, job_id):
+    if not accepted:
+        if job_id is not None:
+            # Another job for the same fee is queued or running
+            return jsonify({'error': message, 'job_id': job_id,
+                            'status_url': url_for('api.payment_job_api', job_id=job_id)}), 409
+        status = 503 if 'queue is full' in message else 400
+        response = jsonify({'error': message})
+        if status == 503:
+            response.headers['Retry-After'] = '5'
+        return response, status
+    response = jsonify({'job_id': job_id, 'status': 'queued',
+                        'status_url': url_for('api.payment_job_api', job_id=job_id)})
+    response.headers['Location'] = url_for('api.payment_job_api', job_id=job_id)
+    return response, 202
+
+@api_bp.route('/payments', methods=['POST'])
+def queue_payment_api():
+    """
+    Queue payment of a late fee; poll the returned status_url for the result.
+    
+    Body: {"patron_id": "123456", "book_id": 1}
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'JSON body is required'}), 400
+    queue = current_app.extensions['payment_queue']
+    return _queued_response(*queue.submit_payment(data.get('patron_id'), data.get('book_id')))
+
+@api_bp.route('/refunds', methods=['POST'])
+def queue_refund_api():
+    """
+    Queue a refund of a late fee payment.
+    
+    Body: {"transaction_id": "txn_123456_1700000000", "amount": 2.5}
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'JSON body is required'}), 400
+    queue = current_app.extensions['payment_queue']
+    return _queued_response(*queue.submit_refund(data.get('transaction_id'), data.get('amount')))
+
+@api_bp.route('/payment_jobs/<int:job_id>')
+def payment_job_api(job_id):
+    """Status of a queued payment or refund: queued, running, succeeded, failed or interrupted."""
+    job = get_payment_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@api_bp.route('/branches')
+def branches_api():
+    """List the branches, main collection first."""
+    return jsonify({'branches': list_branches()})
+
+@api_bp.route('/availability')
+def consolidated_availability_api():
+    """
+    Copy counts summed over all branches, with a per-branch breakdown.
+    Repeat ?book_id= to limit the result to specific books.
+    """
+    book_ids = request.args.getlist('book_id', type=int)
+    books = get_consolidated_availability(book_ids or None)
+    return jsonify({'books': books, 'count': len(books)})
+
+def _branch_circulation(branch_id, handler):
+    """Run a branch borrow/return for {"patron_id": ..., "book_id": ...}."""
+    data = request.get_json(silent=True) or {}
+    patron_id = str(data.get('patron_id', '')).strip()
+    book_id = data.get('book_id')
+    if not isinstance(book_id, int):
+        return jsonify({'error': 'book_id must be an integer'}), 400
+    
+    success, message = handler(patron_id, branch_id, book_id)
+    return jsonify({'branch_id': branch_id, 'success': success, 'message': message}), 200 if success else 400
+
+@api_bp.route('/branches/<branch_id>/borrow', methods=['POST'])
+def branch_borrow_api(branch_id):
+    """Borrow one of a branch's copies. Body: {"patron_id": "123456", "book_id": 1}"""
+    if branch_id == MAIN_BRANCH_ID:
+        return _branch_circulation(branch_id, lambda patron_id, _, book_id: borrow_book_by_patron(patron_id, book_id))
+    return _branch_circulation(branch_id, borrow_book_at_branch)
+
+@api_bp.route('/branches/<branch_id>/return', methods=['POST'])
+def branch_return_api(branch_id):
+    """Return a copy to the branch it was borrowed from. Body: {"patron_id": "123456", "book_id": 1}"""
+    if branch_id == MAIN_BRANCH_ID:
+        return _branch_circulation(branch_id, lambda patron_id, _, book_id: return_book_by_patron(patron_id, book_id))
+    return _branch_circulation(branch_id, return_book_at_branch)
+
+@api_bp.route('/availability/stream')
+def availability_stream_api():
+    """
+    Server-Sent Events feed of available_copies changes.
+    
+    Reconnecting clients send Last-Event-ID (or ?after=<seq>) and receive the
+    changes they missed first. Repeat ?book_id= to follow specific books.
+    """
+    after = request.headers.get('Last-Event-ID') or request.args.get('after')
+    if after is not None:
+        if not after.isdigit():
+            return jsonify({'error': 'Last-Event-ID must be a non-negative integer'}), 400
+        after = int(after)
+    book_ids = request.args.getlist('book_id', type=int)
+    
+    broadcaster = current_app.extensions['availability_broadcaster']
+    messages = broadcaster.stream(after, set(book_ids) if book_ids else None,
+                                  heartbeat=current_app.config['AVAILABILITY_HEARTBEAT'])
+    response = Response(messages, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@api_bp.route('/stats/maintenance')
+def maintenance_stats_api():
+    """Reports from the last scheduled backup/maintenance run."""
+    return jsonify({'last_run': get_last_maintenance_report()})
+
+@api_bp.route('/stats/limits')
+def rate_limit_stats_api():
+    """Rate limiting and load shedding counters for monitoring."""
+    guard = get_request_guard()
+    if guard is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(guard.snapshot(), enabled=True))
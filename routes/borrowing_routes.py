@@ -3,7 +3,8 @@ Borrowing Routes - Book borrowing and returning endpoints
 """
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from services.library_service import borrow_book_by_patron, return_book_by_patron
+from services.library_service import borrow_book_by_patron, return_book_by_patron, place_hold
+from services.branch_service import borrow_book_at_branch, return_book_at_branch, MAIN_BRANCH_ID
 
 borrowing_bp = Blueprint('borrowing', __name__)
 
@@ -21,8 +22,30 @@ def borrow_book():
         flash('Invalid book ID.', 'error')
         return redirect(url_for('catalog.catalog'))
     
-    # Use business logic function
-    success, message = borrow_book_by_patron(patron_id, book_id)
+    # Use business logic function; an optional branch_id picks the branch's copies
+    branch_id = request.form.get('branch_id', '').strip()
+    if branch_id and branch_id != MAIN_BRANCH_ID:
+        success, message = borrow_book_at_branch(patron_id, branch_id, book_id)
+    else:
+        success, message = borrow_book_by_patron(patron_id, book_id)
+    
+    flash(message, 'success' if success else 'error')
+    return redirect(url_for('catalog.catalog'))
+
+@borrowing_bp.route('/hold', methods=['POST'])
+def hold_book():
+    """
+    Place a hold on an unavailable book.
+    """
+    patron_id = request.form.get('patron_id', '').strip()
+    
+    try:
+        book_id = int(request.form.get('book_id', ''))
+    except (ValueError, TypeError):
+        flash('Invalid book ID.', 'error')
+        return redirect(url_for('catalog.catalog'))
+    
+    success, message = place_hold(patron_id, book_id)
     
     flash(message, 'success' if success else 'error')
     return redirect(url_for('catalog.catalog'))
@@ -45,7 +68,11 @@ def return_book():
         return render_template('return_book.html')
     
     # Use business logic function
-    success, message = return_book_by_patron(patron_id, book_id)
+    branch_id = request.form.get('branch_id', '').strip()
+    if branch_id and branch_id != MAIN_BRANCH_ID:
+        success, message = return_book_at_branch(patron_id, branch_id, book_id)
+    else:
+        success, message = return_book_by_patron(patron_id, book_id)
     
     flash(message, 'success' if success else 'error')
     return render_template('return_book.html')
@@ -2,9 +2,13 @@
 Catalog Routes - Book catalog related endpoints
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import get_all_books
+from flask import Blueprint, render_template, request, redirect, url_for, flash, make_response
+from database import get_all_books, iter_all_books
 from services.library_service import add_book_to_catalog
+from services.catalog_snapshot import get_current_catalog_snapshot
+from services.recommendation_service import iter_with_related_books
+from routes.conditional import get_cache_validators, not_modified_response, add_cache_headers
+from routes.streaming import streaming_requested, peek_rows, stream_page
 
 catalog_bp = Blueprint('catalog', __name__)
 
@@ -19,8 +23,23 @@ def catalog():
     Display all books in the catalog.
     Implements R2: Book Catalog Display
     """
-    books = get_all_books()
-    return render_template('catalog.html', books=books)
+    validators = get_cache_validators()
+    cached = not_modified_response(validators)
+    if cached:
+        return cached
+    
+    snapshot = get_current_catalog_snapshot()
+    # Related books are looked up one batch of rows at a time
+    related = {}
+    
+    if streaming_requested():
+        books = peek_rows(iter_with_related_books(snapshot.iter_books() if snapshot else iter_all_books(),
+                                                  related)) or []
+        return add_cache_headers(stream_page('catalog.html', books=books, related=related), validators)
+    
+    books = list(iter_with_related_books(snapshot.all_books() if snapshot else get_all_books(), related))
+    response = make_response(render_template('catalog.html', books=books, related=related))
+    return add_cache_headers(response, validators)
 
 @catalog_bp.route('/add_book', methods=['GET', 'POST'])
 def add_book():
@@ -0,0 +1,67 @@
+"""
+Conditional Requests - ETag/Last-Modified helpers for catalog-backed pages
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from flask import current_app, request, session, Response
+from database import get_catalog_version
+from services.catalog_snapshot import get_current_catalog_snapshot
+
+def get_cache_validators() -> Tuple[str, Optional[datetime]]:
+    """
+    Get the ETag and Last-Modified values for the current request.
+    
+    Read them once, before querying, so a change made while the page is
+    being rendered can never be labelled with the newer version. When the
+    page is served from a catalog snapshot they come from its header, so
+    a snapshot that lags the database is labelled with its own version
+    and no query is needed.
+    
+    Last-Modified is the end of the second the catalog last changed in
+    (HTTP dates have no fractions). Until that second is over it is None:
+    a later change in the same second would otherwise share the date and
+    be answered with a stale 304.
+    """
+    snapshot = get_current_catalog_snapshot()
+    if snapshot is not None:
+        version, changed_at = snapshot.catalog_version, snapshot.last_modified
+    else:
+        version, changed_at = get_catalog_version()
+    digest = hashlib.sha1(request.full_path.encode('utf-8')).hexdigest()[:12]
+    last_modified = changed_at.replace(microsecond=0) + timedelta(seconds=1) if changed_at else None
+    if last_modified is not None and last_modified > datetime.now(timezone.utc):
+        last_modified = None
+    return version + '-' + digest, last_modified
+
+def not_modified_response(validators: Tuple[str, Optional[datetime]]) -> Optional[Response]:
+    """
+    Return a 304 response if the client's cached copy is still current.
+    
+    Only the catalog version row is read, so a matching request never
+    runs the page's queries or templates. Requests with pending flash
+    messages are always rendered so the messages are not lost.
+    """
+    if '_flashes' in session:
+        return None
+    
+    etag, last_modified = validators
+    
+    if request.if_none_match:
+        if not request.if_none_match.contains(etag):
+            return None
+    elif last_modified is None or not request.if_modified_since or request.if_modified_since < last_modified:
+        return None
+    
+    return add_cache_headers(Response(status=304), validators)
+
+def add_cache_headers(response: Response, validators: Tuple[str, Optional[datetime]]) -> Response:
+    """Attach ETag, Last-Modified and the configured Cache-Control header."""
+    etag, last_modified = validators
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = current_app.config.get('CATALOG_CACHE_CONTROL', 'no-cache')
+    return response
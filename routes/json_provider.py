@@ -0,0 +1,12 @@
+"""
+JSON Provider - Serialize database records in jsonify() and the tojson filter
+"""
+
+from flask.json.provider import DefaultJSONProvider
+from records import to_jsonable
+
+class RecordJSONProvider(DefaultJSONProvider):
+    """Default provider that writes Book and loan records as JSON objects."""
+    
+    def dumps(self, obj, **kwargs):
+        return super().dumps(to_jsonable(obj), **kwargs)
@@ -0,0 +1,119 @@
+"""
+Profiling Routes - Opt-in per-request profiling and the /admin/profiles store
+"""
+
+import hmac
+import logging
+import random
+
+from flask import Blueprint, Response, abort, current_app, g, jsonify, request
+from services.profiler import PROFILE_MODES, ProfileStore, RequestCapture, StackSampler
+
+logger = logging.getLogger(__name__)
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+
+def _is_admin() -> bool:
+    """
+    Whether the request carries PROFILING_TOKEN in the X-Profile-Token header.
+
+    Never read from the query string, where it would end up in access logs,
+    browser history and Referer headers.
+    """
+    token = current_app.config['PROFILING_TOKEN']
+    given = request.headers.get('X-Profile-Token') or ''
+    return bool(token) and hmac.compare_digest(given.encode('utf-8'), token.encode('utf-8'))
+
+
+def _requested_mode():
+    """Profile mode for this request: asked for by an admin, sampled, or None."""
+    mode = request.headers.get('X-Profile')
+    if mode and _is_admin():
+        return mode if mode in PROFILE_MODES else 'cprofile'
+    rate = current_app.config['PROFILING_SAMPLE_RATE']
+    if rate and random.random() < rate:
+        return 'sample'
+    return None
+
+
+def _begin():
+    """before_request hook: start a capture if this request is to be profiled."""
+    if request.blueprint == 'admin':
+        return
+    mode = _requested_mode()
+    if mode is None:
+        return
+    capture = RequestCapture(mode, current_app.extensions['stack_sampler'])
+    try:
+        capture.start()
+    except ValueError:
+        # Another profiler is already active on this thread
+        logger.warning("Could not start %s profile for %s", mode, request.path)
+        return
+    g.profile_capture = capture
+
+
+def _end(exc=None):
+    """teardown_request hook: store the finished capture."""
+    capture = g.pop('profile_capture', None)
+    if capture is None:
+        return
+    store = current_app.extensions['profile_store']
+    profile = capture.stop(store.next_id(), request.method, request.full_path.rstrip('?'), request.endpoint)
+    store.add(profile)
+
+
+def _add_profile_header(response):
+    """after_request hook: tell the caller which capture holds their request."""
+    if 'profile_capture' in g:
+        response.headers['X-Profile-Mode'] = g.profile_capture.mode
+    return response
+
+
+@admin_bp.before_request
+def require_admin_token():
+    if not _is_admin():
+        abort(403)
+
+
+@admin_bp.route('/profiles')
+def profiles():
+    """List stored profiles, newest first."""
+    store = current_app.extensions['profile_store']
+    return jsonify({'profiles': [profile.summary() for profile in store.list()],
+                    'max_profiles': store.max_profiles})
+
+
+@admin_bp.route('/profiles/<int:profile_id>.<fmt>')
+def profile_download(profile_id, fmt):
+    """
+    Download a profile as pstats (cProfile captures), collapsed stacks
+    (flamegraph.pl / speedscope input) or a text report.
+    """
+    profile = current_app.extensions['profile_store'].get(profile_id)
+    if profile is None:
+        abort(404)
+    if fmt not in profile.summary()['formats']:
+        return jsonify({'error': 'Available formats: ' + ', '.join(profile.summary()['formats'])}), 400
+
+    if fmt == 'pstats':
+        response = Response(profile.pstats_bytes(), mimetype='application/octet-stream')
+    elif fmt == 'collapsed':
+        response = Response(profile.collapsed(), mimetype='text/plain')
+    else:
+        response = Response(profile.text(), mimetype='text/plain')
+    response.headers['Content-Disposition'] = 'attachment; filename=profile-' + str(profile_id) + '.' + fmt
+    return response
+
+
+def init_profiling(app) -> None:
+    """Install profiling hooks and /admin/profiles if PROFILING_ENABLED is set."""
+    if not app.config['PROFILING_ENABLED']:
+        return
+    app.extensions['profile_store'] = ProfileStore(app.config['PROFILING_MAX_PROFILES'])
+    app.extensions['stack_sampler'] = StackSampler(app.config['PROFILING_SAMPLE_INTERVAL'])
+    app.register_blueprint(admin_bp)
+    app.before_request(_begin)
+    app.after_request(_add_profile_header)
+    app.teardown_request(_end)
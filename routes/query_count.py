@@ -0,0 +1,47 @@
+"""
+Query Counting - Per-request SQL statement and connection counts
+"""
+
+import logging
+
+from flask import current_app, g, request
+from database import count_queries
+
+logger = logging.getLogger(__name__)
+
+
+def _begin():
+    """before_request hook: start counting for this request."""
+    g.query_count = count_queries()
+    g.query_counter = g.query_count.__enter__()
+
+
+def _report(response):
+    """after_request hook: expose the counts and log requests over the threshold."""
+    counter = g.get('query_counter')
+    if counter is None:
+        return response
+    response.headers['X-Query-Count'] = str(counter.queries)
+    response.headers['X-DB-Connections'] = str(counter.connections)
+    threshold = current_app.config['QUERY_COUNT_WARN_THRESHOLD']
+    if threshold and counter.queries > threshold:
+        logger.warning("%s %s ran %d queries on %d connections",
+                       request.method, request.path, counter.queries, counter.connections)
+    return response
+
+
+def _end(exc=None):
+    """teardown_request hook."""
+    query_count = g.pop('query_count', None)
+    g.pop('query_counter', None)
+    if query_count is not None:
+        query_count.__exit__(None, None, None)
+
+
+def init_query_counting(app) -> None:
+    """Count queries per request if QUERY_COUNT_ENABLED is set."""
+    if not app.config['QUERY_COUNT_ENABLED']:
+        return
+    app.before_request(_begin)
+    app.after_request(_report)
+    app.teardown_request(_end)
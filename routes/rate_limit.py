@@ -0,0 +1,197 @@
+"""
+Rate Limiting - Per-client token buckets and load shedding for all blueprints
+"""
+
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app, g, jsonify, request, Response
+from database import get_write_waiters
+
+# Requests that are never limited: monitoring and long-lived streams
+EXEMPT_ENDPOINTS = ('static', 'api.rate_limit_stats_api', 'api.availability_stream_api')
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets keyed by (rule name, client key), kept in memory.
+
+    Each bucket holds up to `burst` tokens and refills at `rate` tokens per
+    second. Only the most recently used max_keys buckets are kept; a bucket
+    that is dropped simply starts full again.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[Tuple[str, str], list]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, rule: str, key: str, rate: float, burst: float) -> float:
+        """
+        Take one token.
+
+        Returns:
+            float: 0 if the request is allowed, otherwise seconds until a token is available
+        """
+        return self.acquire_all(rule, [key], rate, burst)
+
+    def acquire_all(self, rule: str, keys: List[str], rate: float, burst: float) -> float:
+        """
+        Take one token from each key's bucket, or from none of them.
+
+        A request refused by one bucket does not use up the others.
+
+        Returns:
+            float: 0 if the request is allowed, otherwise seconds until every bucket has a token
+        """
+        now = time.monotonic()
+        with self._lock:
+            buckets = []
+            for key in keys:
+                bucket = self._buckets.get((rule, key))
+                if bucket is None:
+                    bucket = [float(burst), now]
+                    self._buckets[(rule, key)] = bucket
+                else:
+                    self._buckets.move_to_end((rule, key))
+                    bucket[0] = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+                    bucket[1] = now
+                buckets.append(bucket)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            wait = max((1.0 - bucket[0]) / rate for bucket in buckets)
+            if wait > 0:
+                return wait
+            for bucket in buckets:
+                bucket[0] -= 1.0
+            return 0.0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RequestGuard:
+    """Rate limits and load shedding for one app, plus the counters it exports."""
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]], max_in_flight: int,
+                 max_write_waiters: int, max_keys: int = 100000):
+        """
+        Args:
+            limits: Endpoint name (or 'default') -> (requests per second, burst)
+            max_in_flight: Requests handled at once before new ones get 503
+            max_write_waiters: transaction() callers queued on the SQLite write
+                lock before new write requests get 503 (see get_write_waiters)
+            max_keys: Most client buckets kept in memory
+        """
+        self.limits = limits
+        self.max_in_flight = max_in_flight
+        self.max_write_waiters = max_write_waiters
+        self.limiter = TokenBucketLimiter(max_keys)
+        self.in_flight = 0
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.limited_by_endpoint: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, endpoint: Optional[str] = None) -> None:
+        with self._lock:
+            self.counters[name] += 1
+            if endpoint:
+                self.limited_by_endpoint[endpoint] += 1
+
+    def shed_reason(self) -> Optional[str]:
+        """Reason to refuse the current request because the app is overloaded."""
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                return 'in_flight'
+        if request.method != 'GET' and get_write_waiters() >= self.max_write_waiters:
+            return 'write_queue'
+        return None
+
+    def retry_after(self, endpoint: str) -> float:
+        """Seconds until the current client may retry, or 0 if it is within its limits."""
+        rate, burst = self.limits.get(endpoint) or self.limits['default']
+        keys = ['ip:' + (request.remote_addr or '')]
+        patron_id = _request_patron_id()
+        if patron_id:
+            keys.append('patron:' + patron_id)
+        return self.limiter.acquire_all(endpoint, keys, rate, burst)
+
+    def begin(self) -> Optional[Response]:
+        """before_request hook: refuse the request or count it as in flight."""
+        endpoint = request.endpoint
+        if endpoint is None or endpoint in EXEMPT_ENDPOINTS:
+            return None
+
+        reason = self.shed_reason()
+        if reason:
+            self._count('shed_' + reason)
+            return _refusal(503, 'Server is busy. Try again shortly.', 1.0)
+
+        wait = self.retry_after(endpoint)
+        if wait:
+            self._count('rate_limited', endpoint)
+            return _refusal(429, 'Too many requests. Slow down.', wait)
+
+        with self._lock:
+            self.in_flight += 1
+            self.counters['allowed'] += 1
+        g.rate_limit_counted = True
+        return None
+
+    def end(self, exc=None) -> None:
+        """teardown_request hook."""
+        if g.pop('rate_limit_counted', False):
+            with self._lock:
+                self.in_flight -= 1
+
+    def snapshot(self) -> Dict:
+        """Counters for monitoring."""
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'write_waiters': get_write_waiters(),
+                'tracked_clients': len(self.limiter),
+                'allowed': self.counters['allowed'],
+                'rate_limited': self.counters['rate_limited'],
+                'shed_in_flight': self.counters['shed_in_flight'],
+                'shed_write_queue': self.counters['shed_write_queue'],
+                'rate_limited_by_endpoint': dict(self.limited_by_endpoint),
+            }
+
+
+def _request_patron_id() -> Optional[str]:
+    """Patron ID named in the URL, form, query string or JSON body, if any."""
+    patron_id = (request.view_args or {}).get('patron_id') or request.form.get('patron_id') \
+        or request.args.get('patron_id')
+    if not patron_id and request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            patron_id = data.get('patron_id')
+    return str(patron_id).strip() if patron_id else None
+
+
+def _refusal(status: int, message: str, retry_after: float) -> Response:
+    if request.blueprint == 'api':
+        response = jsonify({'error': message})
+    else:
+        response = Response(message, mimetype='text/plain')
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response
+
+
+def init_rate_limiting(app) -> None:
+    """Install the request guard on the app if RATE_LIMIT_ENABLED is set."""
+    if not app.config['RATE_LIMIT_ENABLED']:
+        return
+    guard = RequestGuard(app.config['RATE_LIMITS'], app.config['MAX_IN_FLIGHT_REQUESTS'],
+                         app.config['MAX_WRITE_WAITERS'])
+    app.extensions['request_guard'] = guard
+    app.before_request(guard.begin)
+    app.teardown_request(guard.end)
+
+
+def get_request_guard() -> Optional[RequestGuard]:
+    return current_app.extensions.get('request_guard')
@@ -2,8 +2,11 @@
 Search Routes - Book search functionality
 """
 
-from flask import Blueprint, render_template, request, flash
-from services.library_service import search_books_in_catalog
+from flask import Blueprint, render_template, request, flash, make_response
+from services.library_service import search_books_in_catalog, iter_search_books_in_catalog
+from services.recommendation_service import get_related_books_map, iter_with_related_books
+from routes.conditional import get_cache_validators, not_modified_response, add_cache_headers
+from routes.streaming import streaming_requested, peek_rows, stream_page
 
 search_bp = Blueprint('search', __name__)
 
@@ -19,10 +22,28 @@ def search_books():
     if not search_term:
         return render_template('search.html', books=[], search_term='', search_type=search_type)
     
-    # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
+    validators = get_cache_validators()
+    cached = not_modified_response(validators)
+    if cached:
+        return cached
+    
+    if streaming_requested():
+        books = peek_rows(iter_search_books_in_catalog(search_term, search_type))
+        if books:
+            related = {}
+            response = stream_page('search.html', books=iter_with_related_books(books, related),
+                                   search_term=search_term, search_type=search_type, related=related)
+            return add_cache_headers(response, validators)
+        books = []
+    else:
+        # Use business logic function
+        books = search_books_in_catalog(search_term, search_type)
     
     if not books:
         flash('Search functionality is not yet implemented.', 'error')
     
-    return render_template('search.html', books=books, search_term=search_term, search_type=search_type)
+    related = get_related_books_map([book['id'] for book in books])
+    
+    response = make_response(render_template('search.html', books=books, search_term=search_term,
+                                              search_type=search_type, related=related))
+    return add_cache_headers(response, validators)
@@ -0,0 +1,39 @@
+"""
+Streaming Helpers - Render catalog-sized pages as they are generated
+"""
+
+from itertools import chain
+from typing import Iterator, Optional
+
+from flask import current_app, request, session, stream_template, stream_with_context, Response
+
+def streaming_requested() -> bool:
+    """
+    Stream when asked with ?stream=1 or when STREAM_TEMPLATES is enabled.
+    
+    Pages with pending flash messages are never streamed: the session is
+    saved before the body is sent, so a message shown while streaming
+    would be shown again on the next page.
+    """
+    if '_flashes' in session:
+        return False
+    value = request.args.get('stream')
+    if value is not None:
+        return value not in ('0', 'false', '')
+    return current_app.config.get('STREAM_TEMPLATES', False)
+
+def peek_rows(rows: Iterator) -> Optional[Iterator]:
+    """
+    Return None if rows is empty, otherwise an iterator over all rows.
+    
+    Templates test `{% if books %}`, which is always true for a generator.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return None
+    return chain([first], rows)
+
+def stream_page(template_name: str, **context) -> Response:
+    """Render a template chunk by chunk so the first rows reach the client early."""
+    return Response(stream_with_context(stream_template(template_name, **context)))
@@ -0,0 +1,53 @@
+"""
+Request Tracing - A root span per request for the tracing module
+"""
+
+from flask import g, request
+from tracing import FileCollector, MemoryCollector, enable_tracing, start_span
+
+
+def _begin():
+    """before_request hook: open the request's server span."""
+    rule = request.url_rule.rule if request.url_rule else request.path
+    g.trace_span = start_span(request.method + ' ' + rule, 'SERVER', **{
+        'http.method': request.method, 'http.path': request.path, 'http.route': rule,
+        'endpoint': request.endpoint or '',
+    })
+
+
+def _add_trace_header(response):
+    """after_request hook: record the status and return the trace ID."""
+    span = g.get('trace_span')
+    if span is not None:
+        span.set_attribute('http.status_code', response.status_code)
+        trace_id = getattr(span, 'trace_id', None)
+        if trace_id:
+            response.headers['X-Trace-Id'] = trace_id
+    return response
+
+
+def _end(exc=None):
+    """teardown_request hook: finish the span, which exports the trace."""
+    span = g.pop('trace_span', None)
+    if span is not None:
+        span.end(exc)
+
+
+def init_tracing(app) -> None:
+    """
+    Trace requests if TRACING_ENABLED is set.
+
+    Traces are appended to TRACING_EXPORT_PATH, or kept in memory
+    (app.extensions['trace_collector']) when no path is set.
+    """
+    if not app.config['TRACING_ENABLED']:
+        return
+    if app.config['TRACING_EXPORT_PATH']:
+        collector = FileCollector(app.config['TRACING_EXPORT_PATH'])
+    else:
+        collector = MemoryCollector(app.config['TRACING_MAX_SPANS'])
+    enable_tracing(collector)
+    app.extensions['trace_collector'] = collector
+    app.before_request(_begin)
+    app.after_request(_add_trace_header)
+    app.teardown_request(_end)
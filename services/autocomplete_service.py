@@ -0,0 +1,169 @@
+"""
+Autocomplete Service Module - Prefix index for title/author type-ahead
+Keeps a sorted in-memory index of catalog titles and authors so suggestions
+are answered with a binary search instead of a full catalog scan.
+"""
+
+import bisect
+import sys
+import threading
+from typing import Dict, List, Tuple
+
+from database import get_all_books
+
+AUTOCOMPLETE_FIELDS = ('title', 'author')
+MAX_AUTOCOMPLETE_LIMIT = 50
+
+
+class PrefixIndex:
+    """
+    Sorted array of lowercase keys searched with bisect.
+
+    Every word start in a value gets its own key (the suffix of the value
+    from that word on), so "gats" matches "The Great Gatsby" as well as "the g".
+    Keys and entries are kept in two parallel lists to stay compact.
+    """
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._entries: List[Tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @staticmethod
+    def _word_suffixes(value: str) -> List[str]:
+        lowered = value.lower()
+        suffixes = []
+        for i, char in enumerate(lowered):
+            if char.isspace():
+                continue
+            if i == 0 or lowered[i - 1].isspace():
+                suffixes.append(lowered[i:])
+        return suffixes
+
+    def add(self, book_id: int, value: str) -> None:
+        """Insert every word suffix of a value, keeping the arrays sorted."""
+        for key in self._word_suffixes(value):
+            position = bisect.bisect_right(self._keys, key)
+            self._keys.insert(position, key)
+            self._entries.insert(position, (book_id, value))
+
+    def search(self, prefix: str, limit: int) -> List[Tuple[int, str]]:
+        """Return up to `limit` distinct (book_id, value) pairs matching the prefix."""
+        prefix = prefix.lower()
+        position = bisect.bisect_left(self._keys, prefix)
+        results = []
+        seen = set()
+        while position < len(self._keys) and len(results) < limit:
+            if not self._keys[position].startswith(prefix):
+                break
+            entry = self._entries[position]
+            if entry[0] not in seen:
+                seen.add(entry[0])
+                results.append(entry)
+            position += 1
+        return results
+
+    def memory_bytes(self) -> Dict[str, int]:
+        """Approximate memory held by the index (lists plus the objects they own)."""
+        keys_bytes = sys.getsizeof(self._keys) + sum(sys.getsizeof(k) for k in self._keys)
+        entries_bytes = sys.getsizeof(self._entries) + sum(
+            sys.getsizeof(e) + sys.getsizeof(e[0]) for e in self._entries
+        )
+        # Entry values share the string object of the book, count each once
+        values_bytes = sum(sys.getsizeof(v) for v in {id(e[1]): e[1] for e in self._entries}.values())
+        return {
+            'keys': keys_bytes,
+            'entries': entries_bytes,
+            'values': values_bytes,
+            'total': keys_bytes + entries_bytes + values_bytes,
+        }
+
+
+_indexes = {field: PrefixIndex() for field in AUTOCOMPLETE_FIELDS}
+_lock = threading.Lock()
+_built = False
+
+
+def build_autocomplete_index() -> int:
+    """
+    (Re)build the autocomplete index from the books table.
+
+    Returns:
+        int: Number of books indexed
+    """
+    global _indexes, _built
+    books = get_all_books()
+    indexes = {field: PrefixIndex() for field in AUTOCOMPLETE_FIELDS}
+    for field in AUTOCOMPLETE_FIELDS:
+        index = indexes[field]
+        pairs = []
+        for book in books:
+            for key in index._word_suffixes(book[field]):
+                pairs.append((key, (book['id'], book[field])))
+        pairs.sort(key=lambda pair: pair[0])
+        index._keys = [pair[0] for pair in pairs]
+        index._entries = [pair[1] for pair in pairs]
+
+    with _lock:
+        _indexes = indexes
+        _built = True
+    return len(books)
+
+
+def add_book_to_autocomplete_index(book_id: int, title: str, author: str) -> None:
+    """Add a newly inserted book to the index without rebuilding it."""
+    if not _built:
+        # The next lookup builds from the database, which already has the book
+        return
+    with _lock:
+        _indexes['title'].add(book_id, title)
+        _indexes['author'].add(book_id, author)
+
+
+def autocomplete(prefix: str, field: str = 'all', limit: int = 10) -> List[Dict]:
+    """
+    Return type-ahead suggestions for a prefix.
+
+    Args:
+        prefix: Text typed so far (case-insensitive)
+        field: 'title', 'author' or 'all'
+        limit: Maximum number of suggestions (capped at MAX_AUTOCOMPLETE_LIMIT)
+
+    Returns:
+        list: Suggestions as {'book_id', 'field', 'value'} dicts
+    """
+    prefix = (prefix or '').strip()
+    if not prefix or limit <= 0:
+        return []
+    if field == 'all':
+        fields = AUTOCOMPLETE_FIELDS
+    elif field in AUTOCOMPLETE_FIELDS:
+        fields = (field,)
+    else:
+        return []
+
+    if not _built:
+        build_autocomplete_index()
+
+    limit = min(limit, MAX_AUTOCOMPLETE_LIMIT)
+    suggestions = []
+    with _lock:
+        for name in fields:
+            for book_id, value in _indexes[name].search(prefix, limit - len(suggestions)):
+                suggestions.append({'book_id': book_id, 'field': name, 'value': value})
+            if len(suggestions) >= limit:
+                break
+    return suggestions
+
+
+def get_autocomplete_memory_report() -> Dict:
+    """Report index sizes and approximate memory footprint in bytes."""
+    with _lock:
+        report = {'built': _built, 'fields': {}, 'total_bytes': 0}
+        for name, index in _indexes.items():
+            memory = index.memory_bytes()
+            report['fields'][name] = {'keys': len(index), 'bytes': memory}
+            report['total_bytes'] += memory['total']
+    return report
@@ -0,0 +1,198 @@
+"""
+Availability Broadcaster Module - Push book availability changes to subscribers
+One background thread tails 'book.availability_changed' events from the
+outbox and fans them out to every connected subscriber, so dashboards get
+deltas without each of them reloading the catalog.
+"""
+
+import json
+import logging
+import queue
+import threading
+from typing import Dict, Iterator, List, Optional, Set
+
+from database import (
+    get_events_after, get_latest_event_seq, add_catalog_listener, remove_catalog_listener
+)
+
+logger = logging.getLogger(__name__)
+
+AVAILABILITY_EVENT = 'book.availability_changed'
+
+
+def format_sse(event: Dict) -> str:
+    """Format an availability event as a Server-Sent Events message."""
+    return 'id: ' + str(event['seq']) + '\nevent: availability\ndata: ' + json.dumps(event['payload']) + '\n\n'
+
+
+class Subscription:
+    """A subscriber's buffer of pending events."""
+
+    def __init__(self, book_ids: Optional[Set[int]], max_pending: int):
+        self.book_ids = book_ids
+        self.pending: queue.Queue = queue.Queue(max_pending)
+        # Set when the buffer overflowed; the subscriber then catches up from the outbox
+        self.lagging = False
+
+    def offer(self, event: Dict) -> None:
+        if self.book_ids is not None and event['entity_id'] not in self.book_ids:
+            return
+        try:
+            self.pending.put_nowait(event)
+        except queue.Full:
+            self.lagging = True
+
+
+class AvailabilityBroadcaster:
+    """
+    Reads new availability events once and hands them to all subscriptions.
+
+    The thread wakes as soon as a catalog change commits in this process and
+    otherwise re-checks every poll_interval seconds (for changes made by
+    other processes).
+    """
+
+    def __init__(self, poll_interval: float = 1.0, batch_size: int = 500, max_pending: int = 1000):
+        """
+        Args:
+            poll_interval: Longest time between outbox checks (seconds)
+            batch_size: Events read per query
+            max_pending: Events buffered per subscriber before it has to catch up
+        """
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_seq = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscriptions)
+
+    def wake(self) -> None:
+        """Check the outbox now (registered as a catalog listener)."""
+        self._wake.set()
+
+    def poll_once(self) -> int:
+        """
+        Publish events added since the last check.
+
+        Returns:
+            int: Number of events published
+        """
+        published = 0
+        while True:
+            events = get_events_after(self._last_seq, self.batch_size, [AVAILABILITY_EVENT])
+            if not events:
+                return published
+            with self._lock:
+                subscriptions = list(self._subscriptions)
+            for event in events:
+                for subscription in subscriptions:
+                    subscription.offer(event)
+            self._last_seq = events[-1]['seq']
+            published += len(events)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                self.poll_once()
+            except Exception:
+                logger.exception("Availability broadcast failed")
+
+    def start(self) -> None:
+        """Start the broadcast thread (no-op if it is running)."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._last_seq = get_latest_event_seq()
+            add_catalog_listener(self.wake)
+            self._thread = threading.Thread(target=self._run, name='availability-broadcaster', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the broadcast thread."""
+        remove_catalog_listener(self.wake)
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def subscribe(self, book_ids: Optional[Set[int]] = None) -> Subscription:
+        self.start()
+        subscription = Subscription(book_ids, self.max_pending)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def _catch_up(self, after_seq: int, book_ids: Optional[Set[int]]) -> Iterator[Dict]:
+        """Events after after_seq read straight from the outbox."""
+        while True:
+            events = get_events_after(after_seq, self.batch_size, [AVAILABILITY_EVENT])
+            for event in events:
+                after_seq = event['seq']
+                if book_ids is None or event['entity_id'] in book_ids:
+                    yield event
+            if len(events) < self.batch_size:
+                return
+
+    def stream(self, after_seq: Optional[int] = None, book_ids: Optional[Set[int]] = None,
+               heartbeat: float = 15.0, stop: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        Yield SSE messages: missed events after after_seq, then live ones.
+
+        A comment line is sent every `heartbeat` seconds without events so
+        proxies keep the connection open and dead clients are noticed.
+
+        Args:
+            after_seq: Last event ID the client saw (None to start from now)
+            book_ids: Only send events for these books (all if None)
+            heartbeat: Seconds between keep-alive comments
+            stop: Event that ends the stream when set
+        """
+        subscription = self.subscribe(book_ids)
+        stop = stop or self._stop
+        try:
+            start_from_now = after_seq is None
+            if start_from_now:
+                after_seq = get_latest_event_seq()
+            yield 'retry: 3000\n\n'
+            if not start_from_now:
+                # Subscribed first, so nothing committed meanwhile is missed
+                for event in self._catch_up(after_seq, book_ids):
+                    after_seq = event['seq']
+                    yield format_sse(event)
+
+            while not stop.is_set():
+                if subscription.lagging:
+                    # Drop the overflowed buffer and read what was missed from the outbox
+                    subscription.lagging = False
+                    while not subscription.pending.empty():
+                        subscription.pending.get_nowait()
+                    for event in self._catch_up(after_seq, book_ids):
+                        after_seq = event['seq']
+                        yield format_sse(event)
+                    continue
+                try:
+                    event = subscription.pending.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+                if event['seq'] > after_seq:
+                    after_seq = event['seq']
+                    yield format_sse(event)
+        finally:
+            self.unsubscribe(subscription)
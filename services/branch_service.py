@@ -0,0 +1,218 @@
+"""
+Branch Service Module - Per-branch inventory, loans and a consolidated view
+The main collection (books.available_copies, borrow_records) stays as it
+is and is reported as branch MAIN_BRANCH_ID. Other branches hold their own
+copies. A branch registered with a database_path keeps its inventory and
+loans in that SQLite file, so checkouts at different branches take
+different write locks. The 5-book limit is kept in library.db's
+patron_summary: a branch checkout reserves a slot there with one short
+conditional update before it runs.
+
+Holds and fee payments cover the main collection only; late fees on
+branch loans are recorded on the branch loan itself.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from database import (
+    get_branch, get_branches, get_branch_stores, insert_branch, get_book_by_id, get_books_by_ids,
+    get_all_books, transaction, get_branch_inventory, set_branch_inventory,
+    update_branch_availability, insert_branch_borrow_record, get_active_branch_loan,
+    update_branch_borrow_record_return_date, reserve_branch_loan, release_branch_loan,
+    get_branch_store_inventory
+)
+from services.library_service import _format_due_date, _late_fee_for_due_date, _is_valid_patron_id
+
+MAIN_BRANCH_ID = 'main'
+
+
+def add_branch(branch_id: str, name: str, database_path: Optional[str] = None) -> Tuple[bool, str]:
+    """
+    Register a library branch.
+
+    Args:
+        branch_id: Short identifier (letters, digits, '-' or '_', max 32 chars)
+        name: Display name
+        database_path: SQLite file for the branch's inventory and loans
+            (None keeps them in the main database)
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    branch_id = (branch_id or '').strip()
+    if not branch_id or len(branch_id) > 32 or not branch_id.replace('-', '').replace('_', '').isalnum():
+        return False, "Branch ID must be 1-32 letters, digits, '-' or '_'."
+    if branch_id == MAIN_BRANCH_ID:
+        return False, "Branch ID '" + MAIN_BRANCH_ID + "' is reserved for the main collection."
+    if not name or not name.strip():
+        return False, "Branch name is required."
+    if get_branch(branch_id):
+        return False, "A branch with this ID already exists."
+
+    if not insert_branch(branch_id, name.strip(), database_path or None):
+        return False, "Database error occurred while adding the branch."
+    return True, 'Branch "' + name.strip() + '" has been added.'
+
+
+def set_branch_copies(branch_id: str, book_id: int, total_copies: int) -> Tuple[bool, str]:
+    """
+    Set how many copies of a book a branch owns.
+
+    Copies on loan stay on loan; available copies change by the difference.
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    branch = get_branch(branch_id)
+    if not branch:
+        return False, "Branch not found."
+    if not isinstance(total_copies, int) or total_copies < 0:
+        return False, "Total copies must be a non-negative integer."
+    book = get_book_by_id(book_id)
+    if not book:
+        return False, "Book not found."
+
+    try:
+        with transaction(branch['database_path']) as conn:
+            inventory = get_branch_inventory(branch_id, book_id, conn) or {'total_copies': 0, 'available_copies': 0}
+            on_loan = inventory['total_copies'] - inventory['available_copies']
+            if total_copies < on_loan:
+                return False, str(on_loan) + " copies are on loan; total copies cannot be lower."
+            if not set_branch_inventory(branch_id, book_id, total_copies, total_copies - on_loan, conn):
+                raise RuntimeError("Database error occurred while updating branch inventory.")
+    except Exception as e:
+        return False, str(e)
+
+    return True, branch['name'] + ' now has ' + str(total_copies) + ' copies of "' + book['title'] + '".'
+
+
+def borrow_book_at_branch(patron_id: str, branch_id: str, book_id: int) -> Tuple[bool, str]:
+    """
+    Borrow a book from a branch's copies.
+
+    The 5-book limit covers the patron's loans and holds everywhere. A slot
+    is reserved in patron_summary with one conditional update before the
+    checkout, and given back if the checkout does not happen, so only the
+    branch's database is locked for the checkout itself.
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    if not _is_valid_patron_id(patron_id):
+        return False, "Invalid patron ID. Must be exactly 6 digits."
+
+    branch = get_branch(branch_id)
+    if not branch:
+        return False, "Branch not found."
+    book = get_book_by_id(book_id)
+    if not book:
+        return False, "Book not found."
+
+    if not reserve_branch_loan(patron_id):
+        return False, "You have reached the maximum borrowing limit of 5 books."
+
+    borrow_date = datetime.now()
+    due_date = borrow_date + timedelta(days=14)
+    error = None
+    try:
+        with transaction(branch['database_path']) as conn:
+            inventory = get_branch_inventory(branch_id, book_id, conn)
+            if not inventory or inventory['available_copies'] <= 0:
+                error = "This book is currently not available at " + branch['name'] + "."
+            elif not insert_branch_borrow_record(branch_id, patron_id, book_id, borrow_date, due_date, conn):
+                raise RuntimeError("Database error occurred while creating borrow record.")
+            elif not update_branch_availability(branch_id, book_id, -1, conn):
+                raise RuntimeError("Database error occurred while updating book availability.")
+    except Exception as e:
+        error = str(e)
+    if error:
+        # Released after the branch transaction: it may be library.db's own lock
+        release_branch_loan(patron_id)
+        return False, error
+
+    return True, 'Successfully borrowed "' + book['title'] + '" from ' + branch['name'] + '. Due date: ' \
+        + _format_due_date(due_date) + '.'
+
+
+def return_book_at_branch(patron_id: str, branch_id: str, book_id: int) -> Tuple[bool, str]:
+    """
+    Return a book to the branch it was borrowed from.
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    if not _is_valid_patron_id(patron_id):
+        return False, "Invalid patron ID. Must be exactly 6 digits."
+
+    branch = get_branch(branch_id)
+    if not branch:
+        return False, "Branch not found."
+    book = get_book_by_id(book_id)
+    if not book:
+        return False, "Book not found."
+
+    today = datetime.now()
+    try:
+        with transaction(branch['database_path']) as conn:
+            loan = get_active_branch_loan(branch_id, patron_id, book_id, conn)
+            if not loan:
+                return False, "This book was not borrowed by you from this branch or has already been returned."
+            fee_info = _late_fee_for_due_date(loan['due_date'], today)
+            if not update_branch_borrow_record_return_date(loan['id'], today, fee_info['fee_amount'], conn):
+                raise RuntimeError("Database error occurred while recording return.")
+            if not update_branch_availability(branch_id, book_id, 1, conn):
+                raise RuntimeError("Database error occurred while updating book availability.")
+    except Exception as e:
+        return False, str(e)
+    release_branch_loan(patron_id)
+
+    message = 'Successfully returned "' + book['title'] + '" to ' + branch['name'] + '.'
+    if fee_info['fee_amount'] > 0:
+        message = message + ' Amount due: $' + str(round(fee_info['fee_amount'], 2)) + '.'
+    return True, message
+
+
+def get_consolidated_availability(book_ids: Optional[List[int]] = None) -> List[Dict]:
+    """
+    Copy counts per book summed over the main collection and every branch.
+
+    Each database is read once with its own short read, one after another,
+    so no shard is locked while the others are read. The totals are
+    therefore not a single point-in-time snapshot across branches, which
+    is fine for display.
+
+    Args:
+        book_ids: Only these books (all books if None)
+
+    Returns:
+        list: Dicts with book_id, title, author, total_copies,
+        available_copies and a per-branch breakdown
+    """
+    books = get_all_books() if book_ids is None else get_books_by_ids(book_ids)
+    availability = {}
+    for book in books:
+        availability[book['id']] = {
+            'book_id': book['id'], 'title': book['title'], 'author': book['author'],
+            'total_copies': book['total_copies'], 'available_copies': book['available_copies'],
+            'branches': [{'branch_id': MAIN_BRANCH_ID, 'total_copies': book['total_copies'],
+                          'available_copies': book['available_copies']}],
+        }
+
+    wanted = None if book_ids is None else list(availability)
+    for database_path in get_branch_stores():
+        for row in get_branch_store_inventory(database_path, wanted):
+            entry = availability.get(row['book_id'])
+            if entry is None:
+                continue
+            entry['total_copies'] += row['total_copies']
+            entry['available_copies'] += row['available_copies']
+            entry['branches'].append({'branch_id': row['branch_id'], 'total_copies': row['total_copies'],
+                                      'available_copies': row['available_copies']})
+
+    return [availability[book['id']] for book in books]
+
+
+def list_branches() -> List[Dict]:
+    """All branches, with the main collection first."""
+    return [{'id': MAIN_BRANCH_ID, 'name': 'Main collection', 'database_path': None}] + get_branches()
@@ -0,0 +1,472 @@
+"""
+Catalog Snapshot Module - Immutable columnar copy of the books table
+The snapshot is one file of fixed-width integer arrays and offset-indexed
+UTF-8 string blobs. Readers map it with mmap and search the blobs in place,
+so any number of processes can serve catalog reads without touching
+library.db. Each build writes a new numbered file (<path>.<generation>)
+and readers map the newest one, so no file is ever replaced while it is
+mapped (Windows refuses to) and readers never see a partial snapshot.
+
+One process builds (SnapshotManager); the others only map the newest file
+(SnapshotReader). Neither queries the database per read: a snapshot is
+served until this process changes the catalog or a newer file appears,
+and pages label themselves with the version in the snapshot's header.
+
+File layout (little-endian, sections 8-byte aligned):
+    header      magic, format version, row count, catalog last-modified
+                (microseconds since the epoch, 0 if unknown), version tag
+    ids         int64[n]
+    total       int32[n]
+    available   int32[n]
+    isbn_order  int32[n]   row numbers sorted by ISBN
+    strings     for each of STRING_COLUMNS: uint32 offsets[n + 1], blob
+"""
+
+import bisect
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from database import get_all_books, get_catalog_version, add_catalog_listener, remove_catalog_listener
+from records import Book
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'LIBSNAP1'
+FORMAT_VERSION = 2
+_HEADER = struct.Struct('<8sIIqI')
+STRING_COLUMNS = ('title', 'author', 'isbn', 'title_lower', 'author_lower')
+SEARCH_FIELDS = ('title', 'author')
+
+
+def _padding(size: int) -> bytes:
+    return b'\0' * (-size % 8)
+
+
+def _generations(path: str) -> List[int]:
+    """Generation numbers of the snapshot files written for path, oldest first."""
+    directory, prefix = os.path.split(os.path.abspath(path))
+    generations = []
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    for name in names:
+        suffix = name[len(prefix) + 1:]
+        if name.startswith(prefix + '.') and suffix.isdigit():
+            generations.append(int(suffix))
+    return sorted(generations)
+
+
+def latest_snapshot_file(path: str) -> Optional[str]:
+    """The newest snapshot file written for path, or None if there is none."""
+    generations = _generations(path)
+    return path + '.' + str(generations[-1]) if generations else None
+
+
+def _remove_old_snapshot_files(path: str, keep: int) -> None:
+    for generation in _generations(path)[:-keep]:
+        try:
+            os.remove(path + '.' + str(generation))
+        except OSError:
+            # Still mapped somewhere (Windows); a later build removes it
+            pass
+
+
+def _install_snapshot_file(temp_path: str, path: str) -> str:
+    """
+    Move a finished file to the next free generation for path.
+
+    The name is claimed with O_CREAT | O_EXCL, so two processes building at
+    once never take the same generation; the loser retries with the next.
+    Readers skip the claimed file until the rename fills it (an empty file
+    is not a valid snapshot).
+    """
+    while True:
+        generations = _generations(path)
+        file_path = path + '.' + str(generations[-1] + 1 if generations else 1)
+        try:
+            os.close(os.open(file_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            continue
+        # Nobody maps the empty placeholder, so replacing it also works on Windows
+        os.replace(temp_path, file_path)
+        return file_path
+
+
+def write_catalog_snapshot(path: str, books: List[Book], version: str, keep: int = 2,
+                           last_modified: Optional[datetime] = None) -> str:
+    """
+    Write books (in display order) to a new snapshot file for path.
+
+    Files older than the newest `keep` are removed where possible; the
+    previous one is kept so a reader that has just looked it up can still
+    open it.
+
+    Returns:
+        str: The file written
+    """
+    count = len(books)
+    sections = [
+        array('q', [book['id'] for book in books]).tobytes(),
+        array('i', [book['total_copies'] for book in books]).tobytes(),
+        array('i', [book['available_copies'] for book in books]).tobytes(),
+        array('i', sorted(range(count), key=lambda row: books[row]['isbn'])).tobytes(),
+    ]
+    for column in STRING_COLUMNS:
+        field, _, lower = column.partition('_')
+        encoded = [(book[field].lower() if lower else book[field]).encode('utf-8') for book in books]
+        offsets = array('I', [0])
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        sections.append(offsets.tobytes())
+        sections.append(b''.join(encoded))
+
+    tag = version.encode('utf-8')
+    changed_at = int(last_modified.timestamp() * 1000000) if last_modified else 0
+    temp_path = path + '.tmp-' + str(os.getpid()) + '-' + str(threading.get_ident())
+    with open(temp_path, 'wb') as f:
+        header = _HEADER.pack(MAGIC, FORMAT_VERSION, count, changed_at, len(tag)) + tag
+        f.write(header + _padding(len(header)))
+        for section in sections:
+            f.write(section + _padding(len(section)))
+        f.flush()
+        os.fsync(f.fileno())
+    file_path = _install_snapshot_file(temp_path, path)
+    _remove_old_snapshot_files(path, keep)
+    return file_path
+
+
+def build_catalog_snapshot(path: str) -> str:
+    """
+    Export the books table to a snapshot file.
+
+    The catalog version is read before the books, so a change made during
+    the export leaves the snapshot marked as older than the catalog.
+
+    Returns:
+        str: Catalog version tag stored in the snapshot
+    """
+    version, last_modified = get_catalog_version()
+    write_catalog_snapshot(path, get_all_books(), version, last_modified=last_modified)
+    return version
+
+
+class CatalogSnapshot:
+    """Read-only view of the newest snapshot file for a path; string columns are sliced from the mapping on demand."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file_path = latest_snapshot_file(path)
+        if self.file_path is None:
+            raise FileNotFoundError('No catalog snapshot for ' + path)
+        with open(self.file_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _HEADER.size:
+            self._mmap.close()
+            raise ValueError('Not a catalog snapshot: ' + self.file_path)
+        magic, format_version, count, changed_at, tag_length = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError('Not a catalog snapshot: ' + self.file_path)
+        position = _HEADER.size
+        self.catalog_version = self._mmap[position:position + tag_length].decode('utf-8')
+        # When the catalog last changed as of this snapshot (None if not recorded)
+        self.last_modified = (datetime.fromtimestamp(changed_at / 1000000, timezone.utc)
+                              if changed_at else None)
+        position += tag_length
+        position += -position % 8
+        self._count = count
+        view = memoryview(self._mmap)
+        # Every view, slices included, must be released before the mmap can close
+        self._views = [view]
+
+        def take(size: int, fmt: str):
+            nonlocal position
+            raw = view[position:position + size]
+            section = raw.cast(fmt)
+            self._views += [raw, section]
+            position += size + (-size % 8)
+            return section
+
+        self._ids = take(8 * count, 'q')
+        self._total = take(4 * count, 'i')
+        self._available = take(4 * count, 'i')
+        self._isbn_order = take(4 * count, 'i')
+        self._offsets: Dict[str, memoryview] = {}
+        self._blob_start: Dict[str, int] = {}
+        for column in STRING_COLUMNS:
+            offsets = take(4 * (count + 1), 'I')
+            self._offsets[column] = offsets
+            self._blob_start[column] = position
+            size = offsets[count]
+            position += size + (-size % 8)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def is_current_file(self) -> bool:
+        """Whether the mapped file is still the newest one for self.path."""
+        return latest_snapshot_file(self.path) == self.file_path
+
+    def close(self) -> None:
+        for view in reversed(self._views):
+            view.release()
+        self._mmap.close()
+
+    def _string_bytes(self, column: str, row: int) -> bytes:
+        offsets = self._offsets[column]
+        start = self._blob_start[column]
+        return self._mmap[start + offsets[row]:start + offsets[row + 1]]
+
+    def book(self, row: int) -> Book:
+        """The book at a row (rows are in title order)."""
+        return Book((self._ids[row], self._string_bytes('title', row).decode('utf-8'),
+                     self._string_bytes('author', row).decode('utf-8'),
+                     self._string_bytes('isbn', row).decode('utf-8'),
+                     self._total[row], self._available[row]))
+
+    def iter_books(self) -> Iterator[Book]:
+        for row in range(self._count):
+            yield self.book(row)
+
+    def all_books(self) -> List[Book]:
+        return [self.book(row) for row in range(self._count)]
+
+    def find_isbn(self, isbn: str) -> Optional[Book]:
+        """Exact ISBN lookup by binary search over the sorted row order."""
+        target = isbn.encode('utf-8')
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._string_bytes('isbn', self._isbn_order[middle]) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count:
+            row = self._isbn_order[low]
+            if self._string_bytes('isbn', row) == target:
+                return self.book(row)
+        return None
+
+    def iter_matching_rows(self, term: str, field: str) -> Iterator[int]:
+        """
+        Rows whose field contains term, case-insensitively, in title order.
+
+        The lowercase blob is scanned with mmap.find, so rows that do not
+        match are never decoded.
+        """
+        column = field + '_lower'
+        needle = term.lower().encode('utf-8')
+        if not needle:
+            return
+        offsets = self._offsets[column]
+        start = self._blob_start[column]
+        end = start + offsets[self._count]
+        position = start
+        while True:
+            found = self._mmap.find(needle, position, end)
+            if found < 0:
+                return
+            row = bisect.bisect_right(offsets, found - start) - 1
+            row_end = start + offsets[row + 1]
+            if found + len(needle) <= row_end:
+                yield row
+                position = row_end
+            else:
+                # The match spans two rows; look again from the next byte
+                position = found + 1
+
+    def search(self, term: str, field: str) -> List[Book]:
+        """Books whose title or author contains term (same rule as search_books_in_catalog)."""
+        return [self.book(row) for row in self.iter_matching_rows(term, field)]
+
+    def iter_search(self, term: str, field: str) -> Iterator[Book]:
+        for row in self.iter_matching_rows(term, field):
+            yield self.book(row)
+
+
+def reopen_if_changed(snapshot: Optional[CatalogSnapshot], path: str) -> Optional[CatalogSnapshot]:
+    """
+    Return a snapshot for the newest file for path, reusing `snapshot` if it is still the newest.
+
+    Used by reader processes to pick up a newly built file.
+    """
+    if snapshot is not None and snapshot.is_current_file():
+        return snapshot
+    try:
+        return CatalogSnapshot(path)
+    except (OSError, ValueError):
+        return snapshot
+
+
+class SnapshotManager:
+    """
+    Keeps the snapshot file in step with the catalog; run it in one process.
+
+    Catalog changes made by this process wake a background thread that
+    rebuilds the file, at most once per min_interval seconds, and maps the
+    new one. Changes made by other processes are picked up by checking the
+    catalog version every poll_interval seconds on that thread.
+    """
+
+    def __init__(self, path: str, min_interval: float = 0.5, poll_interval: float = 1.0):
+        self.path = path
+        self.min_interval = min_interval
+        self.poll_interval = poll_interval
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self.rebuild_count = 0
+        # Local changes so far, and whether the snapshot may miss one of them
+        self._changes = 0
+        self._stale = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_build = 0.0
+
+    def rebuild(self) -> CatalogSnapshot:
+        """Write a new snapshot and switch to it."""
+        changes = self._changes
+        build_catalog_snapshot(self.path)
+        self.snapshot = CatalogSnapshot(self.path)
+        self._mark_current(changes)
+        self.rebuild_count += 1
+        self._last_build = time.monotonic()
+        return self.snapshot
+
+    def _mark_current(self, changes: int) -> None:
+        """The snapshot includes every local change up to `changes`; the catalog was read after those commits."""
+        with self._lock:
+            if self._changes == changes:
+                self._stale = False
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        """The snapshot, or None while a change made by this process is not in it yet."""
+        return None if self._stale else self.snapshot
+
+    def wake(self) -> None:
+        """Called after this process commits a catalog change."""
+        with self._lock:
+            self._changes += 1
+            self._stale = True
+        self._wake.set()
+
+    def _catalog_changed(self) -> bool:
+        snapshot = self.snapshot
+        return snapshot is None or snapshot.catalog_version != get_catalog_version()[0]
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            if self._stop.is_set():
+                return
+            try:
+                self._wake.clear()
+                changes = self._changes
+                # Writes that did not touch books (loans, payments) also wake us
+                if not self._catalog_changed():
+                    self._mark_current(changes)
+                    continue
+                delay = self._last_build + self.min_interval - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+                self.rebuild()
+            except Exception:
+                logger.exception("Catalog snapshot rebuild failed")
+
+    def start(self) -> None:
+        """Build the first snapshot and follow catalog changes."""
+        self.rebuild()
+        self._stop.clear()
+        add_catalog_listener(self.wake)
+        self._thread = threading.Thread(target=self._run, name='catalog-snapshot', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        remove_catalog_listener(self.wake)
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+class SnapshotReader:
+    """
+    Serves the newest snapshot file built by another process's SnapshotManager.
+
+    The directory is checked for a newer file at most once per
+    check_interval seconds. After this process changes the catalog the
+    mapped snapshot is not used again until a newer one replaces it.
+    """
+
+    def __init__(self, path: str, check_interval: float = 0.5):
+        self.path = path
+        self.check_interval = check_interval
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self._stale_version: Optional[str] = None
+        self._checked_at: Optional[float] = None
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        """The newest snapshot, or None if there is none or it predates this process's last change."""
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            self.snapshot = reopen_if_changed(self.snapshot, self.path)
+        snapshot = self.snapshot
+        if snapshot is None or snapshot.catalog_version == self._stale_version:
+            return None
+        return snapshot
+
+    def wake(self) -> None:
+        """Called after this process commits a catalog change."""
+        snapshot = self.snapshot
+        if snapshot is not None:
+            self._stale_version = snapshot.catalog_version
+        self._checked_at = None
+
+    def start(self) -> None:
+        add_catalog_listener(self.wake)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        remove_catalog_listener(self.wake)
+
+
+_manager = None
+
+
+def enable_catalog_snapshot(path: str, min_interval: float = 0.5, builder: bool = True):
+    """
+    Serve catalog reads in this process from a snapshot at path.
+
+    Exactly one process per path should be the builder; the others read
+    the files it writes.
+
+    Returns:
+        The SnapshotManager (builder) or SnapshotReader
+    """
+    global _manager
+    disable_catalog_snapshot()
+    manager = SnapshotManager(path, min_interval) if builder else SnapshotReader(path, min_interval)
+    manager.start()
+    _manager = manager
+    return manager
+
+
+def disable_catalog_snapshot() -> None:
+    global _manager
+    if _manager is not None:
+        _manager.stop()
+        _manager = None
+
+
+def get_current_catalog_snapshot() -> Optional[CatalogSnapshot]:
+    """The snapshot to read from, or None to read from the database."""
+    manager = _manager
+    return manager.current() if manager else None
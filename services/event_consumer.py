@@ -0,0 +1,111 @@
+"""
+Event Consumer Module - Follow the events outbox incrementally
+Downstream systems read only the events added since their last
+position instead of re-scanning books and borrow_records.
+"""
+
+import logging
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+
+from database import get_events_after, get_scheduler_state, set_scheduler_state
+
+logger = logging.getLogger(__name__)
+
+
+def iter_events(after_seq: int = 0, batch_size: int = 100, event_types: List[str] = None,
+                follow: bool = False, poll_interval: float = 1.0,
+                stop: Optional[threading.Event] = None) -> Iterator[Dict]:
+    """
+    Yield outbox events after a sequence number in order.
+    
+    Args:
+        after_seq: Last sequence number already seen
+        batch_size: Rows fetched per query
+        event_types: Only yield these event types (all if None)
+        follow: Keep waiting for new events instead of stopping at the end
+        poll_interval: Seconds between checks for new events when following
+        stop: Event that ends a follow loop when set
+    """
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        events = get_events_after(after_seq, batch_size, event_types)
+        for event in events:
+            after_seq = event['seq']
+            yield event
+        if len(events) < batch_size:
+            if not follow:
+                return
+            stop.wait(poll_interval)
+
+
+class EventConsumer:
+    """
+    Named consumer that hands batches of events to a handler.
+    
+    Its position is stored in scheduler_state after each batch the
+    handler accepts, so a restarted consumer picks up where it stopped
+    (at-least-once delivery).
+    """
+
+    def __init__(self, name: str, handler: Callable[[List[Dict]], None], batch_size: int = 100,
+                 event_types: List[str] = None):
+        self.name = name
+        self.handler = handler
+        self.batch_size = batch_size
+        self.event_types = event_types
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def state_name(self) -> str:
+        return 'event_consumer:' + self.name
+
+    @property
+    def position(self) -> int:
+        return int(get_scheduler_state(self.state_name) or 0)
+
+    def poll_once(self) -> int:
+        """
+        Deliver every pending event in batches.
+        
+        Returns:
+            int: Number of events delivered
+        """
+        delivered = 0
+        after_seq = self.position
+        while True:
+            events = get_events_after(after_seq, self.batch_size, self.event_types)
+            if not events:
+                return delivered
+            self.handler(events)
+            after_seq = events[-1]['seq']
+            set_scheduler_state(self.state_name, str(after_seq))
+            delivered += len(events)
+
+    def start(self, poll_interval: float = 1.0, max_backoff: float = 60.0) -> None:
+        """
+        Follow the outbox in a background thread.
+        
+        A failing poll (handler or database error) is logged and retried
+        after a delay that doubles up to max_backoff seconds; the batch
+        that failed is delivered again on the retry.
+        """
+        def run():
+            delay = poll_interval
+            while not self._stop.is_set():
+                try:
+                    self.poll_once()
+                    delay = poll_interval
+                except Exception:
+                    logger.exception("Event consumer %s failed", self.name)
+                    delay = min(max_backoff, max(delay, poll_interval) * 2)
+                self._stop.wait(delay)
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name='event-consumer-' + self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
@@ -0,0 +1,193 @@
+"""
+Fuzzy Search Service Module - Typo-tolerant title/author search
+Words from titles and authors are kept in a trigram index so that edit
+distance is only computed against a small set of candidate words instead
+of every book in the catalog.
+"""
+
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+from database import get_all_books
+
+FUZZY_FIELDS = ('title', 'author')
+
+_WORD_PATTERN = re.compile(r'[0-9a-z]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric words."""
+    return _WORD_PATTERN.findall(text.lower())
+
+
+def trigrams(word: str) -> Set[str]:
+    """Trigrams of a word padded with '$' so short words still produce some."""
+    padded = '$' + word + '$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edit_distance(word: str) -> int:
+    """Number of typos tolerated for a query word of this length."""
+    if len(word) <= 3:
+        return 0
+    if len(word) <= 5:
+        return 1
+    return 2
+
+
+def bounded_levenshtein(a: str, b: str, limit: int) -> int:
+    """
+    Edit distance between a and b, giving up early once it exceeds limit.
+
+    Returns:
+        int: The distance, or limit + 1 if it is larger than limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        row_min = i
+        for j, char_b in enumerate(b, 1):
+            cost = 0 if char_a == char_b else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            current.append(value)
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class FuzzyIndex:
+    """
+    Vocabulary of catalog words with a trigram -> words posting index.
+
+    The vocabulary grows much more slowly than the catalog, so a query only
+    touches the words that share trigrams with it.
+    """
+
+    def __init__(self):
+        self._word_books: Dict[str, Set[int]] = defaultdict(set)
+        self._gram_words: Dict[str, Set[str]] = defaultdict(set)
+        self.last_candidate_count = 0
+
+    def add(self, book_id: int, text: str) -> None:
+        for word in tokenize(text):
+            if word not in self._word_books:
+                for gram in trigrams(word):
+                    self._gram_words[gram].add(word)
+            self._word_books[word].add(book_id)
+
+    def match_word(self, query_word: str) -> Dict[int, int]:
+        """Map book_id -> best edit distance for words close to query_word."""
+        limit = max_edit_distance(query_word)
+        matches: Dict[int, int] = {}
+        if limit == 0:
+            for book_id in self._word_books.get(query_word, ()):
+                matches[book_id] = 0
+            self.last_candidate_count += 1
+            return matches
+
+        query_grams = trigrams(query_word)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in query_grams:
+            for word in self._gram_words.get(gram, ()):
+                shared[word] += 1
+
+        # Each edit destroys at most three trigrams
+        threshold = max(1, len(query_grams) - 3 * limit)
+        for word, count in shared.items():
+            if count < threshold:
+                continue
+            self.last_candidate_count += 1
+            distance = bounded_levenshtein(query_word, word, limit)
+            if distance > limit:
+                continue
+            for book_id in self._word_books[word]:
+                if distance < matches.get(book_id, limit + 1):
+                    matches[book_id] = distance
+        return matches
+
+    def search(self, query: str) -> List[Tuple[int, int]]:
+        """
+        Books whose text fuzzy-matches every word of the query.
+
+        Returns:
+            list: (book_id, total_distance) pairs
+        """
+        self.last_candidate_count = 0
+        words = tokenize(query)
+        if not words:
+            return []
+        scores = None
+        for word in words:
+            matches = self.match_word(word)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {book_id: scores[book_id] + distance
+                          for book_id, distance in matches.items() if book_id in scores}
+            if not scores:
+                return []
+        return list(scores.items())
+
+
+_indexes = {field: FuzzyIndex() for field in FUZZY_FIELDS}
+_lock = threading.Lock()
+_built = False
+
+
+def build_fuzzy_index() -> int:
+    """
+    (Re)build the fuzzy index from the books table.
+
+    Returns:
+        int: Number of books indexed
+    """
+    global _indexes, _built
+    books = get_all_books()
+    indexes = {field: FuzzyIndex() for field in FUZZY_FIELDS}
+    for book in books:
+        for field in FUZZY_FIELDS:
+            indexes[field].add(book['id'], book[field])
+    with _lock:
+        _indexes = indexes
+        _built = True
+    return len(books)
+
+
+def add_book_to_fuzzy_index(book_id: int, title: str, author: str) -> None:
+    """Add a newly inserted book to the index without rebuilding it."""
+    if not _built:
+        return
+    with _lock:
+        _indexes['title'].add(book_id, title)
+        _indexes['author'].add(book_id, author)
+
+
+def fuzzy_search_book_ids(query: str) -> List[int]:
+    """
+    Book IDs whose title or author matches the query allowing small typos.
+
+    Results are ordered by edit distance (closest first); the better of the
+    title and author match is used for each book, ties by book ID.
+    """
+    if not _built:
+        build_fuzzy_index()
+    best: Dict[int, int] = {}
+    with _lock:
+        for field in FUZZY_FIELDS:
+            for book_id, distance in _indexes[field].search(query):
+                if distance < best.get(book_id, distance + 1):
+                    best[book_id] = distance
+    return sorted(best, key=lambda book_id: (best[book_id], book_id))
+
+
+def get_last_candidate_count() -> int:
+    """Number of edit-distance checks performed by the last query (for benchmarks)."""
+    with _lock:
+        return sum(index.last_candidate_count for index in _indexes.values())
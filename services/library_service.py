@@ -4,16 +4,27 @@ Contains all the core business logic for the Library Management System
 """
 
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 from database import (
     get_db_connection, get_book_by_id, get_book_by_isbn, 
     get_patron_borrow_count, insert_book, insert_borrow_record, 
     update_book_availability, update_borrow_record_return_date, 
-    get_all_books, get_patron_borrowed_books
+    get_all_books, get_patron_borrowed_books, get_books_by_ids,
+    get_active_loans_for_patrons, transaction, iter_all_books,
+    insert_hold, delete_hold, get_next_hold, get_patron_holds, get_patron_summary,
+    insert_payment, update_payment, get_payment_by_transaction, record_payment_refund,
+    reserve_payment_refund, release_payment_refund,
+    count_toward_borrow_limit
 )
 
-from services.payment_service import PaymentGateway
+from services.payment_service import PaymentGateway, payment_reference
+from tracing import traced
+from services.autocomplete_service import add_book_to_autocomplete_index
+from services.fuzzy_search_service import add_book_to_fuzzy_index, fuzzy_search_book_ids
+from services.catalog_snapshot import get_current_catalog_snapshot
+from services.sharded_search import get_sharded_search, SHARDED_SEARCH_TYPES
 
+@traced()
 def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
     """
     Add a new book to the catalog.
@@ -53,10 +64,15 @@ def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -
     success = insert_book(title.strip(), author.strip(), isbn, total_copies, total_copies)
     if success:
         book_title = title.strip()
+        new_book = get_book_by_isbn(isbn)
+        if new_book:
+            add_book_to_autocomplete_index(new_book['id'], new_book['title'], new_book['author'])
+            add_book_to_fuzzy_index(new_book['id'], new_book['title'], new_book['author'])
         return True, 'Book "' + book_title + '" has been successfully added to the catalog.'
     else:
         return False, "Database error occurred while adding the book."
 
+@traced()
 def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     """
     Allow a patron to borrow a book.
@@ -79,31 +95,98 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if book['available_copies'] <= 0:
         return False, "This book is currently not available."
     
-    current_borrowed = get_patron_borrow_count(patron_id)
-    
-    if current_borrowed >= 5:
-        return False, "You have reached the maximum borrowing limit of 5 books."
-    
     borrow_date = datetime.now()
     due_date = borrow_date + timedelta(days=14)
     
-    borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date)
-    if not borrow_success:
-        return False, "Database error occurred while creating borrow record."
-    
-    availability_success = update_book_availability(book_id, -1)
-    if not availability_success:
-        return False, "Database error occurred while updating book availability."
+    # Holds count toward the limit: each one becomes a loan when fulfilled.
+    # So do loans from the branches. The check and the insert share the
+    # write lock that branch checkouts take to reserve their slot.
+    try:
+        with transaction() as conn:
+            if count_toward_borrow_limit(get_patron_summary(patron_id, conn)) >= 5:
+                return False, "You have reached the maximum borrowing limit of 5 books."
+            if not insert_borrow_record(patron_id, book_id, borrow_date, due_date, conn):
+                raise RuntimeError("Database error occurred while creating borrow record.")
+            if not update_book_availability(book_id, -1, conn):
+                raise RuntimeError("Database error occurred while updating book availability.")
+    except Exception as e:
+        return False, str(e)
     
     book_title = book["title"]
     
+    return True, 'Successfully borrowed "' + book_title + '". Due date: ' + _format_due_date(due_date) + '.'
+
+def _format_due_date(due_date: datetime) -> str:
     year = str(due_date.year)
     month = str(due_date.month)
     day = str(due_date.day)
-    due_date_string = year + '-' + month + '-' + day
+    return year + '-' + month + '-' + day
+
+@traced()
+def borrow_books_batch(patron_id: str, book_ids: List[int]) -> Tuple[bool, str, List[Dict]]:
+    """
+    Borrow several books for one patron in a single transaction (self-checkout).
     
-    return True, 'Successfully borrowed "' + book_title + '". Due date: ' + due_date_string + '.'
+    The patron is validated once and the 5-book limit is enforced across
+    the whole batch. Items that cannot be borrowed are reported and skipped;
+    the rest are committed together.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        book_ids: IDs of the books to borrow, in scan order
+        
+    Returns:
+        tuple: (success: bool, message: str, results: list of per-item dicts)
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits.", []
+    
+    if not book_ids:
+        return False, "No books to borrow.", []
+    
+    results = []
+    try:
+        with transaction() as conn:
+            books = {book['id']: book for book in get_books_by_ids(book_ids, conn)}
+            available = {book_id: book['available_copies'] for book_id, book in books.items()}
+            current_borrowed = count_toward_borrow_limit(get_patron_summary(patron_id, conn))
+            borrow_date = datetime.now()
+            due_date = borrow_date + timedelta(days=14)
+            
+            for book_id in book_ids:
+                book = books.get(book_id)
+                if not book:
+                    results.append({'book_id': book_id, 'success': False, 'message': "Book not found."})
+                    continue
+                if available[book_id] <= 0:
+                    results.append({'book_id': book_id, 'success': False,
+                                    'message': "This book is currently not available."})
+                    continue
+                if current_borrowed >= 5:
+                    results.append({'book_id': book_id, 'success': False,
+                                    'message': "You have reached the maximum borrowing limit of 5 books."})
+                    continue
+                
+                if not insert_borrow_record(patron_id, book_id, borrow_date, due_date, conn):
+                    raise RuntimeError("Database error occurred while creating borrow record.")
+                if not update_book_availability(book_id, -1, conn):
+                    raise RuntimeError("Database error occurred while updating book availability.")
+                
+                available[book_id] -= 1
+                current_borrowed += 1
+                results.append({
+                    'book_id': book_id,
+                    'success': True,
+                    'message': 'Successfully borrowed "' + book['title'] + '". Due date: ' + _format_due_date(due_date) + '.',
+                    'due_date': due_date.isoformat()
+                })
+    except Exception as e:
+        return False, str(e), [{'book_id': book_id, 'success': False, 'message': str(e)} for book_id in book_ids]
+    
+    borrowed = sum(1 for result in results if result['success'])
+    return borrowed > 0, 'Borrowed ' + str(borrowed) + ' of ' + str(len(book_ids)) + ' books.', results
 
+@traced()
 def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     """
     Process book return by a patron.
@@ -114,7 +197,7 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     2. Check if book exists
     3. Check if this patron actually borrowed this book
     4. Record the return date
-    5. Add the book back to available copies
+    5. Give the copy to the first hold, or add it back to available copies
     """
     if len(patron_id) != 6 or not patron_id.isdigit():
         return False, "Invalid patron ID. Must be exactly 6 digits."
@@ -125,26 +208,29 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     
     borrowed_books = get_patron_borrowed_books(patron_id)
     
-    book_is_borrowed = False
+    due_date = None
     for borrowed_book in borrowed_books:
         if borrowed_book['book_id'] == book_id:
-            book_is_borrowed = True
+            due_date = borrowed_book['due_date']
             break
     
-    if not book_is_borrowed:
+    if due_date is None:
         return False, "This book was not borrowed by you or has already been returned."
     
-    # Calculate late fees BEFORE processing the return
-    fee_info = calculate_late_fee_for_book(patron_id, book_id)
+    # Calculate late fees BEFORE processing the return (from the loan already read)
+    fee_info = _late_fee_for_due_date(due_date, datetime.now())
     
+    # Record the return and hand the copy to the hold queue atomically
     today = datetime.now()
-    success = update_borrow_record_return_date(patron_id, book_id, today)
-    if not success:
-        return False, "Database error occurred while recording return."
-    
-    success = update_book_availability(book_id, 1)
-    if not success:
-        return False, "Database error occurred while updating book availability."
+    try:
+        with transaction() as conn:
+            if not update_borrow_record_return_date(patron_id, book_id, today, conn,
+                                                    late_fee=fee_info['fee_amount']):
+                raise RuntimeError("Database error occurred while recording return.")
+            if not _dispatch_returned_copy(book_id, today, conn):
+                raise RuntimeError("Database error occurred while updating book availability.")
+    except Exception as e:
+        return False, str(e)
     
     # Build success message with book title
     message = 'Successfully returned "' + book["title"] + '".'
@@ -157,6 +243,141 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     
     return True, message
 
+@traced()
+def return_books_batch(patron_id: str, book_ids: List[int]) -> Tuple[bool, str, List[Dict]]:
+    """
+    Return several books for one patron in a single transaction.
+    
+    The patron and their active loans are looked up once. Items that were
+    not borrowed by the patron are reported and skipped.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        book_ids: IDs of the books being returned
+        
+    Returns:
+        tuple: (success: bool, message: str, results: list of per-item dicts)
+    """
+    if len(patron_id) != 6 or not patron_id.isdigit():
+        return False, "Invalid patron ID. Must be exactly 6 digits.", []
+    
+    if not book_ids:
+        return False, "No books to return.", []
+    
+    results = []
+    try:
+        with transaction() as conn:
+            books = {book['id']: book for book in get_books_by_ids(book_ids, conn)}
+            due_dates = {}
+            for loan in get_active_loans_for_patrons([patron_id], conn):
+                due_dates.setdefault(loan['book_id'], loan['due_date'])
+            today = datetime.now()
+            
+            for book_id in book_ids:
+                book = books.get(book_id)
+                if not book:
+                    results.append({'book_id': book_id, 'success': False, 'message': "Book not found."})
+                    continue
+                if book_id not in due_dates:
+                    results.append({'book_id': book_id, 'success': False,
+                                    'message': "This book was not borrowed by you or has already been returned."})
+                    continue
+                
+                fee_info = _late_fee_for_due_date(due_dates.pop(book_id), today)
+                if not update_borrow_record_return_date(patron_id, book_id, today, conn,
+                                                        late_fee=fee_info['fee_amount']):
+                    raise RuntimeError("Database error occurred while recording return.")
+                if not _dispatch_returned_copy(book_id, today, conn):
+                    raise RuntimeError("Database error occurred while updating book availability.")
+                
+                message = 'Successfully returned "' + book["title"] + '".'
+                if fee_info['fee_amount'] > 0:
+                    message = message + ' Amount due: $' + str(round(fee_info['fee_amount'], 2)) + '.'
+                results.append({'book_id': book_id, 'success': True, 'message': message,
+                                'fee_amount': fee_info['fee_amount']})
+    except Exception as e:
+        return False, str(e), [{'book_id': book_id, 'success': False, 'message': str(e)} for book_id in book_ids]
+    
+    returned = sum(1 for result in results if result['success'])
+    return returned > 0, 'Returned ' + str(returned) + ' of ' + str(len(book_ids)) + ' books.', results
+
+def _dispatch_returned_copy(book_id: int, today: datetime, conn) -> bool:
+    """
+    Give a returned copy to the head of the book's hold queue.
+    
+    The oldest hold becomes a loan for its patron; without holds the copy
+    goes back to available_copies. Runs inside the caller's transaction.
+    """
+    hold = get_next_hold(book_id, conn)
+    if hold is None:
+        return update_book_availability(book_id, 1, conn)
+    
+    if not delete_hold(hold['id'], conn):
+        return False
+    return insert_borrow_record(hold['patron_id'], book_id, today, today + timedelta(days=14), conn)
+
+@traced()
+def place_hold(patron_id: str, book_id: int) -> Tuple[bool, str]:
+    """
+    Join the hold queue for a book that has no available copies.
+    
+    Holds count toward the 5-book limit. When a copy is returned it is
+    checked out to the oldest hold automatically.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the book to reserve
+        
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits."
+    
+    try:
+        with transaction() as conn:
+            books = get_books_by_ids([book_id], conn)
+            if not books:
+                return False, "Book not found."
+            book = books[0]
+            
+            if book['available_copies'] > 0:
+                return False, "This book is available. Please borrow it instead."
+            
+            holds = get_patron_holds(patron_id, conn)
+            if any(hold['book_id'] == book_id for hold in holds):
+                return False, "You already have a hold on this book."
+            
+            if count_toward_borrow_limit(get_patron_summary(patron_id, conn)) >= 5:
+                return False, "You have reached the maximum borrowing limit of 5 books."
+            
+            if not insert_hold(patron_id, book_id, datetime.now(), conn):
+                raise RuntimeError("Database error occurred while placing hold.")
+    except Exception as e:
+        return False, str(e)
+    
+    return True, 'Hold placed on "' + book['title'] + '". The next returned copy will be checked out to you.'
+
+@traced()
+def cancel_hold(patron_id: str, book_id: int) -> Tuple[bool, str]:
+    """
+    Leave the hold queue for a book.
+    
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits."
+    
+    for hold in get_patron_holds(patron_id):
+        if hold['book_id'] == book_id:
+            if not delete_hold(hold['id']):
+                return False, "Database error occurred while cancelling hold."
+            return True, 'Hold on "' + hold['title'] + '" has been cancelled.'
+    
+    return False, "You do not have a hold on this book."
+
+@traced()
 def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     """
     Calculate late fees for a specific book.
@@ -180,7 +401,11 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     
     if not due_date:
         return {'fee_amount': 0.00, 'days_overdue': 0, 'status': 'No active borrow record found'}
-    today = datetime.now()
+    
+    return _late_fee_for_due_date(due_date, datetime.now())
+
+def _late_fee_for_due_date(due_date: datetime, today: datetime) -> Dict:
+    """Apply the R5 fee rules to a single due date."""
     days_overdue = (today - due_date).days
     
     if days_overdue <= 0:
@@ -199,6 +424,61 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     
     return {'fee_amount': fee, 'days_overdue': days_overdue, 'status': 'success'}
 
+def _is_valid_patron_id(patron_id) -> bool:
+    return isinstance(patron_id, str) and len(patron_id) == 6 and patron_id.isdigit()
+
+@traced()
+def calculate_late_fees_batch(pairs: List[Tuple[str, int]] = None, patron_ids: List[str] = None) -> List[Dict]:
+    """
+    Calculate late fees for many patrons/books at once.
+    
+    All active loans involved are read with one set-based query instead of
+    one get_patron_borrowed_books call per fee.
+    
+    Args:
+        pairs: (patron_id, book_id) pairs, one result per pair in the same order
+        patron_ids: Patron IDs, one result per active loan of each patron
+        
+    Returns:
+        list: Dicts with patron_id, book_id, fee_amount, days_overdue and status
+    """
+    pairs = pairs or []
+    patron_ids = patron_ids or []
+    
+    wanted = [pid for pid in patron_ids if _is_valid_patron_id(pid)]
+    wanted += [pid for pid, _ in pairs if _is_valid_patron_id(pid)]
+    loans = get_active_loans_for_patrons(wanted)
+    today = datetime.now()
+    
+    # Earliest active loan per (patron, book), like calculate_late_fee_for_book
+    due_dates = {}
+    loans_by_patron = {}
+    for loan in loans:
+        due_dates.setdefault((loan['patron_id'], loan['book_id']), loan['due_date'])
+        loans_by_patron.setdefault(loan['patron_id'], []).append(loan)
+    
+    results = []
+    for patron_id, book_id in pairs:
+        if not _is_valid_patron_id(patron_id):
+            fee_info = {'fee_amount': 0.00, 'days_overdue': 0, 'status': 'Invalid patron ID'}
+        elif (patron_id, book_id) not in due_dates:
+            fee_info = {'fee_amount': 0.00, 'days_overdue': 0, 'status': 'No active borrow record found'}
+        else:
+            fee_info = _late_fee_for_due_date(due_dates[(patron_id, book_id)], today)
+        results.append(dict(fee_info, patron_id=patron_id, book_id=book_id))
+    
+    for patron_id in dict.fromkeys(patron_ids):
+        if not _is_valid_patron_id(patron_id):
+            results.append({'patron_id': patron_id, 'book_id': None, 'fee_amount': 0.00,
+                            'days_overdue': 0, 'status': 'Invalid patron ID'})
+            continue
+        for loan in loans_by_patron.get(patron_id, []):
+            fee_info = _late_fee_for_due_date(loan['due_date'], today)
+            results.append(dict(fee_info, patron_id=patron_id, book_id=loan['book_id']))
+    
+    return results
+
+@traced()
 def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     """
     Search for books in the catalog.
@@ -208,6 +488,7 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     - 'title': finds books with matching title (partial match)
     - 'author': finds books with matching author (partial match) 
     - 'isbn': finds book with exact ISBN match
+    - 'fuzzy': finds books whose title or author matches with small typos
     """
     if not search_term:
         return []
@@ -216,8 +497,17 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     if not search_term:
         return []
     
+    sharded = get_sharded_search()
+    if sharded and search_type in SHARDED_SEARCH_TYPES:
+        return sharded.search(search_term, search_type)
+    
+    # Title, author and ISBN lookups are answered from the mmap snapshot when it is current
+    snapshot = get_current_catalog_snapshot()
+    if snapshot and search_type in ('title', 'author'):
+        return snapshot.search(search_term, search_type)
+    
     if search_type == 'isbn':
-        book = get_book_by_isbn(search_term)
+        book = snapshot.find_isbn(search_term) if snapshot else get_book_by_isbn(search_term)
         if book:
             return [book]
         else:
@@ -239,9 +529,40 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
                 results.append(book)
         return results
     
+    elif search_type == 'fuzzy':
+        book_ids = fuzzy_search_book_ids(search_term)
+        books_by_id = {}
+        for book in get_books_by_ids(book_ids):
+            books_by_id[book['id']] = book
+        return [books_by_id[book_id] for book_id in book_ids if book_id in books_by_id]
+    
     else:
         return []
 
+def iter_search_books_in_catalog(search_term: str, search_type: str) -> Iterator[Dict]:
+    """
+    Lazy version of search_books_in_catalog for streamed pages.
+    
+    Title and author matches are yielded as they are read from the
+    database; ISBN and fuzzy results are small and come from the list version.
+    """
+    search_term = (search_term or '').strip()
+    if not search_term:
+        return
+    
+    if search_type in ('title', 'author') and not get_sharded_search():
+        snapshot = get_current_catalog_snapshot()
+        if snapshot:
+            yield from snapshot.iter_search(search_term, search_type)
+            return
+        term = search_term.lower()
+        for book in iter_all_books():
+            if term in book[search_type].lower():
+                yield book
+    else:
+        yield from search_books_in_catalog(search_term, search_type)
+
+@traced()
 def get_patron_status_report(patron_id: str) -> Dict:
     """
     Get status report for a patron.
@@ -255,9 +576,16 @@ def get_patron_status_report(patron_id: str) -> Dict:
     
     borrowed_books = get_patron_borrowed_books(patron_id)
 
+    # Fees come from the due dates already loaded (one query, not one per loan).
+    # Like calculate_late_fee_for_book, a book borrowed twice is charged by
+    # its earliest loan for both.
+    today = datetime.now()
+    due_dates = {}
+    for book in borrowed_books:
+        due_dates.setdefault(book['book_id'], book['due_date'])
     total_fees = 0.00
     for book in borrowed_books:
-        fee_info = calculate_late_fee_for_book(patron_id, book['book_id'])
+        fee_info = _late_fee_for_due_date(due_dates[book['book_id']], today)
         total_fees += fee_info['fee_amount']
 
     history = []
@@ -272,16 +600,22 @@ def get_patron_status_report(patron_id: str) -> Dict:
             'status': 'Currently Borrowed'
         })
 
-    number_of_books_borrowed = len(borrowed_books)
+    # Header counters come from the materialized summary row
+    summary = get_patron_summary(patron_id)
 
     return {
         'patron_id': patron_id,
-        'Currently Borrowed': number_of_books_borrowed,
+        'Currently Borrowed': summary['active_loans'],
+        'active_holds': summary['active_holds'],
+        'lifetime_loans': summary['lifetime_loans'],
+        'earliest_due_date': summary['earliest_due_date'],
+        'assessed_fees': summary['assessed_fees'],
         'borrowed_books': borrowed_books,
         'total_late_fees': total_fees,
         'borrowing_history': history
     }
 
+@traced()
 def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway = None) -> Tuple[bool, str, Optional[str]]:
     """
     Process payment for late fees using external payment gateway.
@@ -328,25 +662,35 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
     if payment_gateway is None:
         payment_gateway = PaymentGateway()
     
+    # Record the charge in the local ledger before contacting the gateway
+    payment_id = insert_payment(patron_id, book_id, fee_amount)
+    if payment_id is None:
+        return False, "Database error occurred while recording payment.", None
+    
     # Process payment through external gateway
     # THIS IS WHAT YOU SHOULD MOCK IN THEIR TESTS!
     try:
         success, transaction_id, message = payment_gateway.process_payment(
             patron_id=patron_id,
             amount=fee_amount,
-            description=f"Late fees for '{book['title']}'"
+            description=f"Late fees for '{book['title']}'",
+            reference=payment_reference(payment_id)
         )
         
         if success:
+            update_payment(payment_id, 'completed', transaction_id, message)
             return True, f"Payment successful! {message}", transaction_id
         else:
+            update_payment(payment_id, 'failed', None, message)
             return False, f"Payment failed: {message}", None
             
     except Exception as e:
-        # Handle payment gateway errors
+        # Handle payment gateway errors; the outcome is unknown
+        update_payment(payment_id, 'error', None, str(e))
         return False, f"Payment processing error: {str(e)}", None
 
 
+@traced()
 def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway: PaymentGateway = None) -> Tuple[bool, str]:
     """
     Refund a late fee payment (e.g., if book was returned on time but fees were charged in error).
@@ -371,6 +715,13 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
     if amount > 15.00:  # Maximum late fee per book
         return False, "Refund amount exceeds maximum late fee."
     
+    # Charges recorded in the ledger cannot be refunded beyond what was paid.
+    # The amount is reserved before calling the gateway, so two concurrent
+    # refunds cannot both pass the check.
+    payment = get_payment_by_transaction(transaction_id)
+    if payment and not reserve_payment_refund(payment['id'], amount):
+        return False, "Refund amount exceeds amount paid."
+    
     # Use provided gateway or create new one
     if payment_gateway is None:
         payment_gateway = PaymentGateway()
@@ -379,11 +730,16 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
     # THIS IS WHAT YOU SHOULD MOCK IN YOUR TESTS!
     try:
         success, message = payment_gateway.refund_payment(transaction_id, amount)
-        
-        if success:
-            return True, message
-        else:
-            return False, f"Refund failed: {message}"
-            
     except Exception as e:
-        return False, f"Refund processing error: {str(e)}"
\ No newline at end of file
+        if payment:
+            release_payment_refund(payment['id'], amount)
+        return False, f"Refund processing error: {str(e)}"
+    
+    if not success:
+        if payment:
+            release_payment_refund(payment['id'], amount)
+        return False, f"Refund failed: {message}"
+    
+    if payment:
+        record_payment_refund(payment['id'], message)
+    return True, message
\ No newline at end of file
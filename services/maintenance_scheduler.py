@@ -0,0 +1,184 @@
+"""
+Maintenance Scheduler Module - Online backups and database upkeep
+Backups use the SQLite backup API in small page steps, so the app keeps
+serving (and writing) while they run. Statistics refreshes and WAL
+checkpoints run in an off-peak window. Branch databases are handled along
+with library.db.
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from database import (
+    backup_database, optimize_database, get_branches, get_scheduler_state, set_scheduler_state
+)
+
+logger = logging.getLogger(__name__)
+
+BACKUP_STATE_NAME = 'maintenance_last_backup'
+MAINTENANCE_STATE_NAME = 'maintenance_last_optimize'
+REPORT_STATE_NAME = 'maintenance_last_report'
+
+
+def _databases() -> List[Tuple[str, Optional[str]]]:
+    """(label, path) for library.db and each sharded branch database."""
+    databases = [('library', None)]
+    for branch in get_branches():
+        if branch['database_path']:
+            databases.append(('branch-' + branch['id'], branch['database_path']))
+    return databases
+
+
+def run_backup(backup_dir: str, pages: int = 256, pause: float = 0.005, keep: int = 7,
+               now: datetime = None) -> List[Dict]:
+    """
+    Back up every database into backup_dir as <label>-<timestamp>.db.
+
+    Only the newest `keep` backups of each database are kept.
+
+    Returns:
+        list: One backup_database() report per database
+    """
+    now = now or datetime.now()
+    os.makedirs(backup_dir, exist_ok=True)
+    stamp = now.strftime('%Y%m%d-%H%M%S')
+    reports = []
+    for label, path in _databases():
+        reports.append(backup_database(os.path.join(backup_dir, label + '-' + stamp + '.db'),
+                                       pages=pages, pause=pause, database_path=path))
+        _prune_backups(backup_dir, label, keep)
+    return reports
+
+
+def _prune_backups(backup_dir: str, label: str, keep: int) -> None:
+    # Timestamped names sort chronologically
+    backups = sorted(name for name in os.listdir(backup_dir)
+                     if name.startswith(label + '-') and name.endswith('.db')
+                     and name[len(label) + 1:-3].replace('-', '').isdigit())
+    for name in backups[:max(0, len(backups) - keep)]:
+        os.remove(os.path.join(backup_dir, name))
+
+
+def run_maintenance(analyze: bool = True, vacuum: bool = False) -> List[Dict]:
+    """
+    Refresh statistics (and optionally VACUUM) every database.
+
+    Returns:
+        list: One optimize_database() report per database
+    """
+    return [optimize_database(path, analyze=analyze, vacuum=vacuum) for _, path in _databases()]
+
+
+def in_window(now: datetime, window: Optional[Tuple[int, int]]) -> bool:
+    """Whether now's hour is in [start, end) (wrapping past midnight); None means always."""
+    if window is None:
+        return True
+    start, end = window
+    if start <= end:
+        return start <= now.hour < end
+    return now.hour >= start or now.hour < end
+
+
+class MaintenanceScheduler:
+    """
+    Runs backups and maintenance when they are due and the clock is in the window.
+
+    Last-run times are kept in scheduler_state, so a restart does not
+    repeat work that was already done today.
+    """
+
+    def __init__(self, backup_dir: Optional[str] = None, backup_interval: float = 86400.0,
+                 backup_keep: int = 7, backup_pages: int = 256, backup_pause: float = 0.005,
+                 maintenance_interval: float = 86400.0, window: Optional[Tuple[int, int]] = (2, 5),
+                 check_interval: float = 300.0):
+        """
+        Args:
+            backup_dir: Directory for backups (None disables backups)
+            backup_interval: Seconds between backups
+            backup_keep: Backups kept per database
+            backup_pages: Pages copied per backup step
+            backup_pause: Seconds the source is left unlocked between steps
+            maintenance_interval: Seconds between ANALYZE/optimize/checkpoint runs
+            window: Off-peak (start hour, end hour), local time; None for any time
+            check_interval: Seconds between checks for due work
+        """
+        self.backup_dir = backup_dir
+        self.backup_interval = backup_interval
+        self.backup_keep = backup_keep
+        self.backup_pages = backup_pages
+        self.backup_pause = backup_pause
+        self.maintenance_interval = maintenance_interval
+        self.window = window
+        self.check_interval = check_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _is_due(self, state_name: str, interval: float, now: datetime) -> bool:
+        last_run = get_scheduler_state(state_name)
+        # A little slack so a daily job does not drift out of a short window
+        return not last_run or now - datetime.fromisoformat(last_run) >= \
+            timedelta(seconds=interval) - timedelta(seconds=self.check_interval)
+
+    def run_once(self, now: datetime = None) -> Dict:
+        """
+        Run whatever is due.
+
+        Returns:
+            dict: 'backups' and 'maintenance' reports (empty lists if nothing ran)
+        """
+        now = now or datetime.now()
+        report = {'backups': [], 'maintenance': []}
+        if not in_window(now, self.window):
+            return report
+
+        if self.backup_dir and self._is_due(BACKUP_STATE_NAME, self.backup_interval, now):
+            report['backups'] = run_backup(self.backup_dir, self.backup_pages, self.backup_pause,
+                                           self.backup_keep, now)
+            set_scheduler_state(BACKUP_STATE_NAME, now.isoformat())
+            for backup in report['backups']:
+                logger.info("Backed up %s to %s: %d pages in %d steps, %.1f ms (%d restarts)",
+                            backup['database'], backup['path'], backup['pages'], backup['steps'],
+                            backup['duration_ms'], backup['restarts'])
+
+        if self._is_due(MAINTENANCE_STATE_NAME, self.maintenance_interval, now):
+            report['maintenance'] = run_maintenance()
+            set_scheduler_state(MAINTENANCE_STATE_NAME, now.isoformat())
+            for result in report['maintenance']:
+                logger.info("Maintained %s in %.1f ms: %s", result['database'], result['duration_ms'],
+                            result['steps'])
+
+        if report['backups'] or report['maintenance']:
+            set_scheduler_state(REPORT_STATE_NAME, json.dumps(dict(report, ran_at=now.isoformat())))
+        return report
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Database maintenance failed")
+            self._stop.wait(self.check_interval)
+
+    def start(self) -> None:
+        """Start the background thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='maintenance-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+def get_last_maintenance_report() -> Optional[Dict]:
+    """The most recent scheduled run's reports, if any."""
+    value = get_scheduler_state(REPORT_STATE_NAME)
+    return json.loads(value) if value else None
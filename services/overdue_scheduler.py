@@ -0,0 +1,201 @@
+"""
+Overdue Scheduler Module - Detects loans as they become overdue
+A background thread walks active loans in due-date order with an
+index-backed cursor. It sleeps until the next loan falls due and hands
+newly overdue loans to a pluggable sink in batches, so the borrow_records
+table is never polled in full. Loans recorded after the cursor passed
+their due date are caught by a second cursor on the record ID.
+"""
+
+import logging
+import smtplib
+import threading
+from datetime import datetime
+from email.message import EmailMessage
+from typing import Dict, List, Optional
+
+from database import (
+    get_overdue_loans_after, get_overdue_loans_added_after, get_max_borrow_record_id,
+    get_next_due_date_after, get_scheduler_state, set_scheduler_state, insert_overdue_events
+)
+
+logger = logging.getLogger(__name__)
+
+CURSOR_STATE_NAME = 'overdue_cursor'
+
+
+class LogSink:
+    """Write overdue events to the application log."""
+
+    def emit(self, events: List[Dict]) -> None:
+        for event in events:
+            logger.warning("Loan %s overdue: patron %s, book %s, due %s",
+                           event['borrow_record_id'], event['patron_id'],
+                           event['book_id'], event['due_date'])
+
+
+class OutboxSink:
+    """Append overdue events to the overdue_events table."""
+
+    def emit(self, events: List[Dict]) -> None:
+        if not insert_overdue_events(events):
+            raise RuntimeError("Database error occurred while writing overdue events.")
+
+
+class SmtpSink:
+    """Send one notice per patron through a (local) SMTP server."""
+
+    def __init__(self, host: str = 'localhost', port: int = 1025,
+                 sender: str = 'library@localhost', domain: str = 'patrons.localhost'):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.domain = domain
+
+    def emit(self, events: List[Dict]) -> None:
+        by_patron: Dict[str, List[Dict]] = {}
+        for event in events:
+            by_patron.setdefault(event['patron_id'], []).append(event)
+
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            for patron_id, patron_events in by_patron.items():
+                message = EmailMessage()
+                message['From'] = self.sender
+                message['To'] = patron_id + '@' + self.domain
+                message['Subject'] = 'Overdue library books'
+                lines = ['Book ' + str(e['book_id']) + ' was due ' + e['due_date'] for e in patron_events]
+                message.set_content('\n'.join(lines))
+                smtp.send_message(message)
+
+
+SINKS = {
+    'log': LogSink,
+    'outbox': OutboxSink,
+    'smtp': SmtpSink,
+}
+
+
+class OverdueScheduler:
+    """
+    Emits an event for each active loan once its due date has passed.
+
+    The cursor is the (due_date, id) of the last loan reported, plus the
+    highest record ID that existed when the loans behind it were scanned;
+    newer records that sort behind the cursor (a loan entered with a past
+    due date) are reported on the next run. It is stored in
+    scheduler_state, so a restart resumes without re-sending.
+    """
+
+    def __init__(self, sink, batch_size: int = 100, max_sleep: float = 3600.0):
+        """
+        Args:
+            sink: Object with an emit(events) method
+            batch_size: Maximum number of events handed to the sink at once
+            max_sleep: Longest time to sleep when no loan is due soon (seconds)
+        """
+        self.sink = sink
+        self.batch_size = batch_size
+        self.max_sleep = max_sleep
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _load_cursor(self):
+        value = get_scheduler_state(CURSOR_STATE_NAME)
+        if not value:
+            return '', 0, 0
+        parts = value.split('|')
+        if len(parts) == 2:
+            # Stored before the record ID was tracked; don't re-send older loans
+            return parts[0], int(parts[1]), get_max_borrow_record_id()
+        return parts[0], int(parts[1]), int(parts[2])
+
+    def _save_cursor(self, due_date: str, record_id: int, seen_id: int) -> None:
+        set_scheduler_state(CURSOR_STATE_NAME, due_date + '|' + str(record_id) + '|' + str(seen_id))
+
+    def _emit(self, loans: List[Dict], now: datetime) -> None:
+        detected_at = now.isoformat()
+        self.sink.emit([{
+            'borrow_record_id': loan['id'],
+            'patron_id': loan['patron_id'],
+            'book_id': loan['book_id'],
+            'due_date': loan['due_date'],
+            'detected_at': detected_at
+        } for loan in loans])
+
+    def run_once(self, now: datetime = None) -> int:
+        """
+        Emit every loan that is overdue at `now` and not reported yet.
+
+        Returns:
+            int: Number of events emitted
+        """
+        now = now or datetime.now()
+        due_date, record_id, seen_id = self._load_cursor()
+        # Every record up to here is visible to the scans below
+        newest_id = get_max_borrow_record_id()
+        emitted = 0
+
+        # Loans recorded since the last run that sort behind the cursor
+        while True:
+            loans = get_overdue_loans_added_after(seen_id, due_date, record_id, self.batch_size)
+            if not loans:
+                break
+            self._emit(loans, now)
+            seen_id = loans[-1]['id']
+            self._save_cursor(due_date, record_id, seen_id)
+            emitted += len(loans)
+
+        while True:
+            loans = get_overdue_loans_after(due_date, record_id, now, self.batch_size)
+            if not loans:
+                break
+            self._emit(loans, now)
+
+            # Only advance once the sink has accepted the batch
+            due_date, record_id = loans[-1]['due_date'], loans[-1]['id']
+            self._save_cursor(due_date, record_id, seen_id)
+            emitted += len(loans)
+
+        if newest_id > seen_id:
+            self._save_cursor(due_date, record_id, newest_id)
+        return emitted
+
+    def seconds_until_next(self, now: datetime = None) -> float:
+        """Time until the next active loan falls due, capped at max_sleep."""
+        now = now or datetime.now()
+        due_date, record_id, _ = self._load_cursor()
+        next_due = get_next_due_date_after(due_date, record_id)
+        if next_due is None:
+            return self.max_sleep
+        return min(self.max_sleep, max(0.0, (next_due - now).total_seconds()))
+
+    def wake(self) -> None:
+        """Re-check immediately, e.g. after a loan with an early due date was added."""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+                delay = self.seconds_until_next()
+            except Exception:
+                logger.exception("Overdue scheduler run failed")
+                delay = min(self.max_sleep, 60.0)
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def start(self) -> None:
+        """Start the background thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='overdue-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the background thread."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
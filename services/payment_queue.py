@@ -0,0 +1,176 @@
+"""
+Payment Queue Module - Background processing of late-fee payments and refunds
+Requests are stored in the payment_jobs table and handled by a small pool
+of worker threads, so a web request only waits for one insert instead of
+the payment gateway round trip. Only one payment job per late fee
+(patron and book) can be queued or running at a time.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from database import (
+    insert_payment_job, get_active_payment_job, claim_payment_job, finish_payment_job,
+    fail_expired_payment_jobs, count_queued_payment_jobs
+)
+from services.library_service import pay_late_fees, refund_late_fee_payment
+from tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ('payment', 'refund')
+
+
+class PaymentQueue:
+    """
+    SQLite-backed job queue with a fixed number of worker threads.
+
+    The number of workers bounds how many gateway calls run at once. Jobs
+    survive a restart. A claimed job is leased to its worker process for
+    lease_seconds; once the lease has run out (the process stopped) the job
+    is marked 'interrupted' because the gateway may or may not have charged.
+    Its ledger entry stays 'pending'; reconcile_payments later looks the
+    charge up by the ledger reference sent to the gateway and records it as
+    completed or failed. Jobs running in other live processes are never touched.
+    """
+
+    def __init__(self, workers: int = 4, payment_gateway=None,
+                 max_queued: int = 1000, poll_interval: float = 1.0,
+                 lease_seconds: float = 300.0):
+        """
+        Args:
+            workers: Number of worker threads (concurrent gateway calls)
+            payment_gateway: Gateway passed to pay_late_fees/refund_late_fee_payment
+            max_queued: Queue depth at which new jobs are refused
+            poll_interval: Longest time an idle worker waits before re-checking (seconds)
+            lease_seconds: How long a claimed job is reserved for its worker; must
+                exceed the longest gateway call, retries included
+        """
+        self.workers = workers
+        self.payment_gateway = payment_gateway
+        self.max_queued = max_queued
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.owner = socket.gethostname() + ':' + str(os.getpid())
+        self._last_recovery = 0.0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def submit_payment(self, patron_id: str, book_id: int) -> Tuple[bool, str, Optional[int]]:
+        """
+        Queue payment of a patron's late fee for a book.
+
+        Refused while another payment job for the same fee is queued or
+        running; the job_id returned then is that job's.
+
+        Returns:
+            tuple: (accepted: bool, message: str, job_id: Optional[int])
+        """
+        if not isinstance(patron_id, str) or not patron_id.isdigit() or len(patron_id) != 6:
+            return False, "Invalid patron ID. Must be exactly 6 digits.", None
+        if not isinstance(book_id, int) or isinstance(book_id, bool):
+            return False, "Invalid book ID.", None
+        return self._submit('payment', {'patron_id': patron_id, 'book_id': book_id},
+                            'payment:' + patron_id + ':' + str(book_id))
+
+    def submit_refund(self, transaction_id: str, amount: float) -> Tuple[bool, str, Optional[int]]:
+        """
+        Queue a refund of a late fee payment.
+
+        Returns:
+            tuple: (accepted: bool, message: str, job_id: Optional[int])
+        """
+        if not isinstance(transaction_id, str) or not transaction_id.startswith("txn_"):
+            return False, "Invalid transaction ID.", None
+        if not isinstance(amount, (int, float)) or isinstance(amount, bool) or amount <= 0:
+            return False, "Refund amount must be greater than 0.", None
+        return self._submit('refund', {'transaction_id': transaction_id, 'amount': float(amount)})
+
+    def _submit(self, kind: str, payload: dict,
+                job_key: Optional[str] = None) -> Tuple[bool, str, Optional[int]]:
+        if count_queued_payment_jobs() >= self.max_queued:
+            return False, "Payment queue is full. Try again later.", None
+        job_id = insert_payment_job(kind, payload, job_key)
+        if job_id is None:
+            active = get_active_payment_job(job_key) if job_key else None
+            if active:
+                return False, "A payment for this late fee is already in progress.", active['id']
+            return False, "Database error occurred while queueing the request.", None
+        if self.workers > 0:
+            self.start()
+        self._wake.set()
+        return True, "Request queued.", job_id
+
+    def run_once(self) -> bool:
+        """
+        Claim and process one queued job.
+
+        Returns:
+            bool: True if a job was processed, False if the queue was empty
+        """
+        job = claim_payment_job(self.owner, self.lease_seconds)
+        if not job:
+            return False
+        payload = job['payload']
+        transaction_id = None
+        with start_span('payment_job ' + job['kind'], 'CONSUMER', job_id=job['id']) as span:
+            try:
+                if job['kind'] == 'payment':
+                    success, message, transaction_id = pay_late_fees(
+                        payload['patron_id'], payload['book_id'], self.payment_gateway)
+                elif job['kind'] == 'refund':
+                    success, message = refund_late_fee_payment(
+                        payload['transaction_id'], payload['amount'], self.payment_gateway)
+                else:
+                    success, message = False, "Unknown job kind: " + job['kind']
+            except Exception as e:
+                logger.exception("Payment job %s failed", job['id'])
+                success, message = False, f"Payment processing error: {str(e)}"
+            span.set_attribute('success', success)
+            finish_payment_job(job['id'], 'succeeded' if success else 'failed', message, transaction_id)
+        return True
+
+    def recover_expired_jobs(self) -> int:
+        """Mark jobs whose worker's lease ran out as interrupted. Returns the number of jobs."""
+        self._last_recovery = time.monotonic()
+        return fail_expired_payment_jobs("Interrupted before completion; check the payments ledger.")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+                # Other processes may stop at any time, not just before our start()
+                if time.monotonic() - self._last_recovery >= self.lease_seconds:
+                    self.recover_expired_jobs()
+            except Exception:
+                logger.exception("Payment worker failed")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def start(self) -> None:
+        """Start the worker threads (no-op if they are running)."""
+        with self._lock:
+            if any(thread.is_alive() for thread in self._threads):
+                return
+            self._stop.clear()
+            self.recover_expired_jobs()
+            self._threads = [
+                threading.Thread(target=self._run, name='payment-worker-' + str(i), daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the worker threads after their current job."""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
@@ -7,9 +7,17 @@ since we cannot make actual payment API calls during testing.
 """
 
 import requests
-from typing import Dict, Tuple
+from requests.adapters import HTTPAdapter
+from typing import Dict, Optional, Tuple
 import time
 
+from tracing import traced
+
+
+def payment_reference(payment_id: int) -> str:
+    """Gateway reference (idempotency key) for a payments ledger entry."""
+    return f"libpay_{payment_id}"
+
 
 class PaymentGateway:
     """
@@ -22,17 +30,54 @@ class PaymentGateway:
     - Incurring costs or rate limits
     """
     
-    def __init__(self, api_key: str = "test_key_12345"):
+    def __init__(self, api_key: str = "test_key_12345", base_url: Optional[str] = None,
+                 timeout: float = 5.0, pool_size: int = 10, session: Optional[requests.Session] = None):
         """
         Initialize payment gateway with API credentials.
         
+        Without a base_url the gateway is simulated locally. With one (e.g. the
+        stub server in services/stub_gateway.py) every call is a real HTTP
+        request through a pooled requests.Session, so connections are reused.
+        
         Args:
             api_key: API key for authentication (default is test key)
+            base_url: Gateway URL to call over HTTP (None to simulate)
+            timeout: Seconds to wait for connect and for each read
+            pool_size: Connections kept open per host
+            session: Session to use instead of creating one
         """
         self.api_key = api_key
-        self.base_url = "https://api.payment-gateway.example.com"
+        self.http_mode = base_url is not None
+        self.base_url = (base_url or "https://api.payment-gateway.example.com").rstrip("/")
+        self.timeout = timeout
+        self.session = None
+        if self.http_mode:
+            self.session = session or requests.Session()
+            if session is None:
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                self.session.mount("http://", adapter)
+                self.session.mount("https://", adapter)
+            self.session.headers["Authorization"] = f"Bearer {self.api_key}"
+    
+    def close(self) -> None:
+        """Close pooled HTTP connections."""
+        if self.session is not None:
+            self.session.close()
+    
+    def _error_message(self, response: requests.Response) -> str:
+        try:
+            return response.json().get("error", response.reason)
+        except ValueError:
+            return response.reason
     
-    def process_payment(self, patron_id: str, amount: float, description: str = "") -> Tuple[bool, str, str]:
+    def _raise_for_unknown_outcome(self, response: requests.Response) -> None:
+        """Rate limiting and server errors leave the outcome unknown, so they raise."""
+        if response.status_code == 429 or response.status_code >= 500:
+            response.raise_for_status()
+    
+    @traced(kind='CLIENT')
+    def process_payment(self, patron_id: str, amount: float, description: str = "",
+                        reference: Optional[str] = None) -> Tuple[bool, str, str]:
         """
         Process a payment through the external gateway.
         
@@ -43,6 +88,9 @@ class PaymentGateway:
             patron_id: 6-digit patron/customer ID
             amount: Payment amount in dollars
             description: Payment description
+            reference: Our ID for the charge; sent as the idempotency key so a
+                retried request is not charged twice and find_payment can
+                look the charge up if the answer was lost
             
         Returns:
             tuple: (success: bool, transaction_id: str, message: str)
@@ -51,6 +99,28 @@ class PaymentGateway:
             gateway = PaymentGateway()
             success, txn_id, msg = gateway.process_payment("123456", 10.50, "Late fees")
         """
+        if self.http_mode:
+            body = {
+                "customer_id": patron_id,
+                "amount": amount,
+                "currency": "usd",
+                "description": description
+            }
+            headers = {}
+            if reference:
+                body["reference"] = reference
+                headers["Idempotency-Key"] = reference
+            response = self.session.post(
+                f"{self.base_url}/charges",
+                json=body,
+                headers=headers,
+                timeout=self.timeout
+            )
+            self._raise_for_unknown_outcome(response)
+            if response.ok:
+                return True, response.json()["id"], f"Payment of ${amount:.2f} processed successfully"
+            return False, "", self._error_message(response)
+        
         # Simulate API call delay
         time.sleep(0.5)
         
@@ -82,6 +152,7 @@ class PaymentGateway:
         transaction_id = f"txn_{patron_id}_{int(time.time())}"
         return True, transaction_id, f"Payment of ${amount:.2f} processed successfully"
     
+    @traced(kind='CLIENT')
     def refund_payment(self, transaction_id: str, amount: float) -> Tuple[bool, str]:
         """
         Refund a previous payment.
@@ -96,6 +167,18 @@ class PaymentGateway:
         Returns:
             tuple: (success: bool, message: str)
         """
+        if self.http_mode:
+            response = self.session.post(
+                f"{self.base_url}/refunds",
+                json={"transaction_id": transaction_id, "amount": amount},
+                timeout=self.timeout
+            )
+            self._raise_for_unknown_outcome(response)
+            if response.ok:
+                refund_id = response.json()["id"]
+                return True, f"Refund of ${amount:.2f} processed successfully. Refund ID: {refund_id}"
+            return False, self._error_message(response)
+        
         time.sleep(0.5)
         
         if not transaction_id or not transaction_id.startswith("txn_"):
@@ -107,6 +190,7 @@ class PaymentGateway:
         refund_id = f"refund_{transaction_id}_{int(time.time())}"
         return True, f"Refund of ${amount:.2f} processed successfully. Refund ID: {refund_id}"
     
+    @traced(kind='CLIENT')
     def verify_payment_status(self, transaction_id: str) -> Dict:
         """
         Check the status of a payment transaction.
@@ -120,6 +204,13 @@ class PaymentGateway:
         Returns:
             dict: Payment status information
         """
+        if self.http_mode:
+            response = self.session.get(f"{self.base_url}/charges/{transaction_id}", timeout=self.timeout)
+            if response.status_code == 404:
+                return {"status": "not_found", "message": "Transaction not found"}
+            response.raise_for_status()
+            return response.json()
+        
         time.sleep(0.3)
         
         if not transaction_id or not transaction_id.startswith("txn_"):
@@ -131,4 +222,32 @@ class PaymentGateway:
             "status": "completed",
             "amount": 10.50,
             "timestamp": time.time()
-        }
\ No newline at end of file
+        }
+    
+    @traced(kind='CLIENT')
+    def find_payment(self, reference: str) -> Dict:
+        """
+        Look up a charge by the reference it was created with.
+        
+        Used to settle charges whose response never arrived (timeouts,
+        worker restarts). You should MOCK this method in tests!
+        
+        Args:
+            reference: Reference passed to process_payment
+            
+        Returns:
+            dict: Payment status information, with "status" "not_found" if
+            the gateway never created the charge
+        """
+        if self.http_mode:
+            response = self.session.get(f"{self.base_url}/charges",
+                                        params={"reference": reference}, timeout=self.timeout)
+            if response.status_code == 404:
+                return {"status": "not_found", "message": "Transaction not found"}
+            response.raise_for_status()
+            return response.json()
+        
+        time.sleep(0.3)
+        
+        # The simulated gateway keeps no record of past charges
+        return {"status": "not_found", "message": "Transaction not found"}
@@ -0,0 +1,214 @@
+"""
+Profiler Module - cProfile and stack-sampling captures of single requests
+A capture is either a full cProfile run (exact call counts, higher
+overhead) or a statistical sample of the thread's stack every few
+milliseconds (cheap enough to leave on for a small share of traffic).
+Finished captures go to a bounded in-memory store.
+"""
+
+import cProfile
+import io
+import itertools
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+PROFILE_MODES = ('cprofile', 'sample')
+
+
+def _frame_label(code) -> str:
+    """Flame graph frame name: function (file:first line). Semicolons would split the frame."""
+    # co_qualname is new in Python 3.11
+    return (getattr(code, 'co_qualname', code.co_name) + ' (' + os.path.basename(code.co_filename) + ':'
+            + str(code.co_firstlineno) + ')').replace(';', ',')
+
+
+class StackSampler:
+    """
+    One background thread that samples the stacks of registered threads.
+
+    Each registered thread gets a Counter of collapsed stacks
+    ("outer;inner;leaf" -> samples).
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._targets: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start_sampling(self, thread_id: int) -> None:
+        with self._lock:
+            self._targets[thread_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def stop_sampling(self, thread_id: int) -> Counter:
+        with self._lock:
+            return self._targets.pop(thread_id, Counter())
+
+    def sample_once(self) -> None:
+        with self._lock:
+            targets = dict(self._targets)
+        if not targets:
+            return
+        frames = sys._current_frames()
+        for thread_id, stacks in targets.items():
+            frame = frames.get(thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                stacks[';'.join(reversed(labels))] += 1
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                idle = not self._targets
+                if idle:
+                    self._wake.clear()
+            if idle:
+                self._wake.wait()
+                continue
+            self.sample_once()
+            time.sleep(self.interval)
+
+
+class Profile:
+    """A finished capture of one request."""
+
+    def __init__(self, profile_id: int, mode: str, method: str, path: str, endpoint: Optional[str],
+                 duration_ms: float, stats: Optional[Dict] = None, stacks: Optional[Counter] = None):
+        self.id = profile_id
+        self.mode = mode
+        self.method = method
+        self.path = path
+        self.endpoint = endpoint
+        self.duration_ms = duration_ms
+        self.created_at = datetime.now().isoformat()
+        self.stats = stats
+        self.stacks = stacks
+
+    def summary(self) -> Dict:
+        return {
+            'id': self.id, 'mode': self.mode, 'method': self.method, 'path': self.path,
+            'endpoint': self.endpoint, 'duration_ms': round(self.duration_ms, 3),
+            'created_at': self.created_at,
+            'samples': sum(self.stacks.values()) if self.stacks is not None else None,
+            'formats': ['pstats', 'collapsed', 'txt'] if self.stats is not None else ['collapsed'],
+        }
+
+    def pstats_bytes(self) -> bytes:
+        """The profile in the pstats file format (pstats.Stats / snakeviz can load it)."""
+        return marshal.dumps(self.stats)
+
+    def collapsed(self) -> str:
+        """
+        Collapsed stacks ("frame;frame;frame count" per line) for flamegraph.pl
+        or speedscope.
+
+        cProfile keeps only caller/callee pairs, so for cprofile captures each
+        line is a caller;callee edge weighted by its own time in microseconds.
+        """
+        if self.stacks is not None:
+            return ''.join(stack + ' ' + str(count) + '\n' for stack, count in sorted(self.stacks.items()))
+        lines = []
+        for func, (_, _, _, _, callers) in sorted(self.stats.items()):
+            for caller, (_, _, own_time, _) in sorted(callers.items()):
+                weight = int(own_time * 1000000)
+                if weight:
+                    lines.append(_stat_label(caller) + ';' + _stat_label(func) + ' ' + str(weight) + '\n')
+        return ''.join(lines)
+
+    def text(self, limit: int = 40) -> str:
+        """Top functions by cumulative time, as printed by pstats."""
+        output = io.StringIO()
+        stats = pstats.Stats(_StatsSource(self.stats), stream=output)
+        stats.sort_stats('cumulative').print_stats(limit)
+        return output.getvalue()
+
+
+def _stat_label(func) -> str:
+    filename, line, name = func
+    return (name + ' (' + os.path.basename(filename) + ':' + str(line) + ')').replace(';', ',')
+
+
+class _StatsSource:
+    """Lets pstats.Stats load a stats dict that is already in memory."""
+
+    def __init__(self, stats: Dict):
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+class ProfileStore:
+    """The most recent max_profiles captures, oldest dropped first."""
+
+    def __init__(self, max_profiles: int = 50):
+        self.max_profiles = max_profiles
+        self._profiles: 'OrderedDict[int, Profile]' = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def add(self, profile: Profile) -> None:
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[Profile]:
+        """Captures, newest first."""
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+
+class RequestCapture:
+    """Profiling of one request, started and stopped on the request's thread."""
+
+    def __init__(self, mode: str, sampler: StackSampler):
+        if mode not in PROFILE_MODES:
+            raise ValueError('Profile mode must be one of ' + ', '.join(PROFILE_MODES))
+        self.mode = mode
+        self.sampler = sampler
+        self._profiler: Optional[cProfile.Profile] = None
+        self._started = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        if self.mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self.sampler.start_sampling(threading.get_ident())
+
+    def stop(self, profile_id: int, method: str, path: str, endpoint: Optional[str]) -> Profile:
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.create_stats()
+            stats, stacks = self._profiler.stats, None
+        else:
+            stats, stacks = None, self.sampler.stop_sampling(threading.get_ident())
+        duration_ms = (time.perf_counter() - self._started) * 1000
+        return Profile(profile_id, self.mode, method, path, endpoint, duration_ms, stats=stats, stacks=stacks)
@@ -0,0 +1,85 @@
+"""
+Recommendation Service Module - "Patrons who borrowed this also borrowed"
+An offline job counts how often two books were borrowed by the same
+patron, keeps the top neighbours per book in book_related, and requests
+are answered from that table with a primary-key lookup.
+"""
+
+import heapq
+import math
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List
+
+from database import iter_patron_histories, replace_book_related, get_related_for_books
+
+# Patrons with very long histories add little signal and most of the cost;
+# only their most recent borrows are kept
+MAX_HISTORY_PER_PATRON = 200
+
+
+def build_related_index(top_k: int = 10, chunk_size: int = 5000) -> Dict:
+    """
+    Rebuild book_related from the borrow history.
+    
+    The co-occurrence matrix is kept sparse (only pairs that were actually
+    borrowed together). Scores are cosine similarity between the books'
+    borrower sets: co_borrowers / sqrt(borrowers_a * borrowers_b).
+    
+    Returns:
+        dict: Patrons read, non-zero pairs and rows written
+    """
+    borrowers: Dict[int, int] = defaultdict(int)
+    co_counts: Dict[int, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    patrons = 0
+    
+    for _, books in iter_patron_histories(chunk_size):
+        patrons += 1
+        books = books[:MAX_HISTORY_PER_PATRON]
+        for book_id in books:
+            borrowers[book_id] += 1
+        for i, first in enumerate(books):
+            for second in books[i + 1:]:
+                co_counts[first][second] += 1
+                co_counts[second][first] += 1
+    
+    rows = []
+    pairs = 0
+    for book_id, neighbours in co_counts.items():
+        pairs += len(neighbours)
+        scored = []
+        for other, count in neighbours.items():
+            score = count / math.sqrt(borrowers[book_id] * borrowers[other])
+            scored.append((score, count, other))
+        # Ties: more co-borrowers first, then the lower book ID
+        best = heapq.nlargest(top_k, scored, key=lambda item: (item[0], item[1], -item[2]))
+        for rank, (score, count, other) in enumerate(best):
+            rows.append((book_id, rank, other, round(score, 6), count))
+    
+    if not replace_book_related(rows):
+        raise RuntimeError("Database error occurred while saving related books.")
+    return {'patrons': patrons, 'pairs': pairs // 2, 'rows': len(rows)}
+
+
+def get_related_books(book_id: int, limit: int = 5) -> List[Dict]:
+    """Get the precomputed neighbours of one book, best first."""
+    return get_related_for_books([book_id], limit).get(book_id, [])
+
+
+def get_related_books_map(book_ids: List[int], limit: int = 3) -> Dict[int, List[Dict]]:
+    """Get neighbours for a page of books in one query."""
+    return get_related_for_books(book_ids, limit)
+
+
+def iter_with_related_books(books: Iterable, related: Dict[int, List[Dict]], limit: int = 3,
+                            batch_size: int = 100) -> Iterator:
+    """
+    Yield books while filling `related` with their neighbours, one query per batch.
+
+    For streamed pages: a book's entry is in `related` before the book is
+    yielded, so the template can look it up as it renders the row.
+    """
+    books = iter(books)
+    for batch in iter(lambda: list(islice(books, batch_size)), []):
+        related.update(get_related_books_map([book['id'] for book in batch], limit))
+        yield from batch
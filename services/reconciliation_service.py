@@ -0,0 +1,131 @@
+"""
+Reconciliation Service Module - Check the payments ledger against the gateway
+Unreconciled ledger entries are read in batches and their status calls are
+made concurrently, so a backlog costs roughly one gateway round trip per
+batch instead of one per payment.
+
+Charges whose outcome was never recorded ('pending' or 'error' entries with
+no transaction ID) are looked up by the reference they were sent with and
+settled as completed or failed.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from database import (
+    get_unreconciled_payments, get_unsettled_payments, mark_payments_reconciled, settle_payments
+)
+from services.payment_service import PaymentGateway, payment_reference
+
+# Ledger statuses for which the gateway should report a completed charge
+PAID_STATUSES = ('completed', 'refunded', 'partially_refunded')
+
+
+def _verify(payment_gateway: PaymentGateway, transaction_id: str) -> Optional[Dict]:
+    try:
+        return payment_gateway.verify_payment_status(transaction_id)
+    except Exception:
+        return None
+
+
+def _find(payment_gateway: PaymentGateway, payment_id: int) -> Optional[Dict]:
+    try:
+        return payment_gateway.find_payment(payment_reference(payment_id))
+    except Exception:
+        return None
+
+
+def _settled(answer: Dict) -> Optional[Tuple[str, Optional[str]]]:
+    """(ledger status, transaction ID) for a lookup answer, or None if still unknown."""
+    if answer['status'] == 'completed' and answer.get('transaction_id'):
+        return 'completed', answer['transaction_id']
+    if answer['status'] == 'not_found':
+        return 'failed', None
+    return None
+
+
+def _reconciled_status(ledger_status: str, gateway_status: str) -> Optional[str]:
+    """New ledger status for a gateway answer, or None to keep the current one."""
+    if gateway_status == 'completed':
+        return None if ledger_status in PAID_STATUSES else 'completed'
+    if gateway_status == 'not_found' or ledger_status in PAID_STATUSES:
+        return 'disputed'
+    return None
+
+
+def _settle_unknown_outcomes(payment_gateway: PaymentGateway, pool: ThreadPoolExecutor,
+                             batch_size: int, settle_after: float, summary: Dict) -> None:
+    """Look up stale 'pending'/'error' entries by reference and record the answer."""
+    updated_before = (datetime.now() - timedelta(seconds=settle_after)).isoformat()
+    after_id = 0
+    while True:
+        batch = get_unsettled_payments(updated_before, after_id, batch_size)
+        if not batch:
+            break
+        after_id = batch[-1]['id']
+        
+        answers = pool.map(lambda payment: _find(payment_gateway, payment['id']), batch)
+        results = []
+        for payment, answer in zip(batch, answers):
+            if not answer or 'status' not in answer:
+                summary['errors'] += 1
+                continue
+            settled = _settled(answer)
+            if not settled:
+                summary['unsettled'] += 1
+                continue
+            results.append((payment['id'], settled[0], settled[1], answer['status']))
+        
+        if results and not settle_payments(results):
+            raise RuntimeError("Database error occurred while saving reconciliation results.")
+        summary['settled'] += len(results)
+
+
+def reconcile_payments(payment_gateway: PaymentGateway = None, batch_size: int = 100,
+                       max_workers: int = 8, settle_after: float = 300.0) -> Dict:
+    """
+    Verify every unreconciled ledger entry with the payment gateway.
+    
+    Entries whose status call fails stay unreconciled for the next run.
+    
+    Args:
+        payment_gateway: Gateway to query (injectable for testing)
+        batch_size: Ledger entries read and written per database round trip
+        max_workers: Concurrent gateway calls
+        settle_after: Seconds a 'pending' or 'error' entry must sit unchanged
+            before it is looked up, so charges still in flight are left alone
+        
+    Returns:
+        dict: Counts of checked, updated (status changed), settled (unknown
+        outcomes resolved), unsettled (still unknown) and failed checks
+    """
+    if payment_gateway is None:
+        payment_gateway = PaymentGateway()
+    
+    summary = {'checked': 0, 'updated': 0, 'settled': 0, 'unsettled': 0, 'errors': 0}
+    after_id = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        _settle_unknown_outcomes(payment_gateway, pool, batch_size, settle_after, summary)
+
+        while True:
+            batch = get_unreconciled_payments(after_id, batch_size)
+            if not batch:
+                break
+            after_id = batch[-1]['id']
+            
+            answers = pool.map(lambda payment: _verify(payment_gateway, payment['transaction_id']), batch)
+            results = []
+            for payment, answer in zip(batch, answers):
+                if not answer or 'status' not in answer:
+                    summary['errors'] += 1
+                    continue
+                new_status = _reconciled_status(payment['status'], answer['status'])
+                if new_status:
+                    summary['updated'] += 1
+                results.append((payment['id'], answer['status'], new_status))
+            
+            if results and not mark_payments_reconciled(results):
+                raise RuntimeError("Database error occurred while saving reconciliation results.")
+            summary['checked'] += len(results)
+    return summary
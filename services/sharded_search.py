@@ -0,0 +1,156 @@
+"""
+Sharded Search Module - Parallel title/author/fuzzy search across processes
+The catalog is split into ID ranges. Each range is held in memory by its
+own worker process, which answers substring and fuzzy queries for that
+range only. The parent sends a query to every shard at once and merges the
+sorted partial results, so search time drops roughly with the number of
+cores.
+
+Workers return only sort keys and book IDs; the parent reads the matching
+rows itself so copy counts are always current.
+"""
+
+import heapq
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import database
+from database import get_book_id_boundaries, get_books_by_ids, get_books_in_id_range, get_catalog_version
+from records import Book
+from services.fuzzy_search_service import FuzzyIndex, FUZZY_FIELDS
+
+SHARDED_SEARCH_TYPES = ('title', 'author', 'fuzzy')
+
+# State of the shard held by a worker process
+_shard: Dict = {}
+
+
+def _load_shard(database_path: str, low: int, high: Optional[int]) -> None:
+    """Worker initializer: read the shard's books into memory."""
+    database.DATABASE = database_path
+    _shard.update({
+        'low': low, 'high': high, 'last_id': 0, 'version': None,
+        'ids': [], 'titles': [], 'title': [], 'author': [],
+        'fuzzy': {field: FuzzyIndex() for field in FUZZY_FIELDS},
+    })
+    _refresh_shard()
+
+
+def _refresh_shard() -> None:
+    """Add books inserted since the last load (books are never deleted or renamed)."""
+    for book in get_books_in_id_range(_shard['low'], _shard['high'], _shard['last_id']):
+        _shard['ids'].append(book.id)
+        _shard['titles'].append(book.title)
+        _shard['title'].append(book.title.lower())
+        _shard['author'].append(book.author.lower())
+        for field in FUZZY_FIELDS:
+            _shard['fuzzy'][field].add(book.id, book[field])
+        _shard['last_id'] = book.id
+
+
+def _search_shard(term: str, search_type: str, version: str) -> List[Tuple]:
+    """
+    Search this worker's shard.
+
+    Returns:
+        list: (title, id) pairs for substring searches, (distance, id) pairs
+        for fuzzy search, sorted
+    """
+    if version != _shard['version']:
+        _refresh_shard()
+        _shard['version'] = version
+
+    if search_type == 'fuzzy':
+        best: Dict[int, int] = {}
+        for field in FUZZY_FIELDS:
+            for book_id, distance in _shard['fuzzy'][field].search(term):
+                if distance < best.get(book_id, distance + 1):
+                    best[book_id] = distance
+        return sorted((distance, book_id) for book_id, distance in best.items())
+
+    term = term.lower()
+    titles = _shard['titles']
+    ids = _shard['ids']
+    return sorted((titles[i], ids[i]) for i, value in enumerate(_shard[search_type]) if term in value)
+
+
+class ShardedSearch:
+    """
+    One single-process executor per ID range, each keeping its shard loaded.
+
+    Results keep the single-process order: title (then ID) for title and
+    author searches, edit distance then ID for fuzzy search.
+    """
+
+    def __init__(self, shards: int = 4):
+        """
+        Args:
+            shards: Number of ID ranges and worker processes
+        """
+        self.shards = shards
+        self._executors: List[ProcessPoolExecutor] = []
+
+    def start(self) -> None:
+        """Split the catalog and start the worker processes."""
+        boundaries = get_book_id_boundaries(self.shards)
+        context = multiprocessing.get_context('spawn')
+        for i, low in enumerate(boundaries):
+            high = boundaries[i + 1] if i + 1 < len(boundaries) else None
+            executor = ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_load_shard,
+                                           initargs=(database.DATABASE, low, high))
+            self._executors.append(executor)
+        # Wait for every shard to finish loading
+        for executor in self._executors:
+            executor.submit(len, ()).result()
+
+    def close(self) -> None:
+        # Searches wait for their results, so nothing is left pending here;
+        # shutdown(cancel_futures=...) would need Python 3.9
+        for executor in self._executors:
+            executor.shutdown(wait=True)
+        self._executors = []
+
+    def search_ids(self, term: str, search_type: str) -> List[int]:
+        """Matching book IDs in result order."""
+        if search_type not in SHARDED_SEARCH_TYPES:
+            raise ValueError('Sharded search supports ' + ', '.join(SHARDED_SEARCH_TYPES))
+        version = get_catalog_version()[0]
+        futures = [executor.submit(_search_shard, term, search_type, version)
+                   for executor in self._executors]
+        partials = [future.result() for future in futures]
+        return [book_id for _, book_id in heapq.merge(*partials)]
+
+    def search(self, term: str, search_type: str) -> List[Book]:
+        """Matching books with current copy counts, in result order."""
+        book_ids = self.search_ids(term, search_type)
+        books = {}
+        # Stay well below SQLite's limit on bound parameters per statement
+        for start in range(0, len(book_ids), 500):
+            for book in get_books_by_ids(book_ids[start:start + 500]):
+                books[book.id] = book
+        return [books[book_id] for book_id in book_ids if book_id in books]
+
+
+_backend: Optional[ShardedSearch] = None
+
+
+def enable_sharded_search(shards: int) -> ShardedSearch:
+    """Route title, author and fuzzy search in this process through worker shards."""
+    global _backend
+    disable_sharded_search()
+    backend = ShardedSearch(shards)
+    backend.start()
+    _backend = backend
+    return backend
+
+
+def disable_sharded_search() -> None:
+    global _backend
+    if _backend is not None:
+        _backend.close()
+        _backend = None
+
+
+def get_sharded_search() -> Optional[ShardedSearch]:
+    return _backend
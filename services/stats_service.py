@@ -0,0 +1,61 @@
+"""
+Stats Service Module - Popularity leaderboard and circulation totals
+Reports are computed from the per-day counters kept by database triggers,
+never from a scan of borrow_records.
+"""
+
+import heapq
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from database import get_book_loan_counts_since, get_circulation_daily_since, get_books_by_ids
+
+POPULARITY_WINDOWS = (7, 30, 365)
+
+
+def _first_day(days: int, today: datetime = None) -> str:
+    today = today or datetime.now()
+    return (today - timedelta(days=days - 1)).date().isoformat()
+
+
+def get_popular_books(window_days: int = 30, limit: int = 10) -> List[Dict]:
+    """
+    Get the most borrowed books over a recent window.
+    
+    Args:
+        window_days: One of POPULARITY_WINDOWS (7, 30 or 365)
+        limit: Number of books to return
+        
+    Returns:
+        list: Dicts with book_id, title, author and loans, most borrowed first
+    """
+    if window_days not in POPULARITY_WINDOWS or limit <= 0:
+        return []
+    
+    counts = get_book_loan_counts_since(_first_day(window_days))
+    # Ties go to the lower book ID so the order is stable
+    top = heapq.nlargest(limit, counts, key=lambda item: (item[1], -item[0]))
+    books = {book['id']: book for book in get_books_by_ids([book_id for book_id, _ in top])}
+    
+    results = []
+    for book_id, loans in top:
+        book = books.get(book_id, {})
+        results.append({'book_id': book_id, 'title': book.get('title'),
+                        'author': book.get('author'), 'loans': loans})
+    return results
+
+
+def get_circulation_totals(days: int = 30) -> Dict:
+    """
+    Get loans and returns per day for the last `days` days.
+    
+    Returns:
+        dict: 'daily' list (days without activity are omitted) and overall totals
+    """
+    daily = get_circulation_daily_since(_first_day(days))
+    return {
+        'days': days,
+        'daily': daily,
+        'total_loans': sum(day['loans'] for day in daily),
+        'total_returns': sum(day['returns'] for day in daily)
+    }
@@ -0,0 +1,301 @@
+"""
+Stub Gateway Module - Local stand-in for the external payment gateway
+Serves the charges, refunds and status endpoints that PaymentGateway talks
+to, with configurable latency, error rate and rate limit, so the HTTP
+payment path can be exercised and benchmarked without the real service.
+
+Usage: python -m services.stub_gateway --port 8099 --profile flaky
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal')
+
+# Named settings for common scenarios
+FAULT_PROFILES = {
+    'healthy': {},
+    'slow': {'latency_ms': 400.0, 'latency_jitter_ms': 200.0, 'latency_distribution': 'lognormal'},
+    'flaky': {'latency_ms': 50.0, 'latency_jitter_ms': 30.0, 'latency_distribution': 'uniform',
+              'error_rate': 0.1},
+    'throttled': {'rate_limit': 20.0},
+}
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that time out close the socket before the delayed reply
+        pass
+
+
+class StubGatewayServer:
+    """
+    Threaded HTTP server implementing the gateway API in memory.
+
+    Endpoints (all require an "Authorization: Bearer <key>" header):
+        POST /charges      {"customer_id", "amount", "currency", "description", "reference"}
+        POST /refunds      {"transaction_id", "amount"}
+        GET  /charges/<id> status of a charge
+        GET  /charges?reference=<ref>  status of the charge created with a reference
+
+    A repeated charge with the same reference returns the original charge
+    instead of charging again.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency_ms: float = 0.0,
+                 latency_jitter_ms: float = 0.0, latency_distribution: str = 'fixed',
+                 error_rate: float = 0.0, rate_limit: Optional[float] = None,
+                 amount_limit: float = 1000.0, seed: Optional[int] = None):
+        """
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+            latency_ms: Typical response time added to every request
+            latency_jitter_ms: Spread of the response time (range for 'uniform',
+                standard deviation for 'lognormal')
+            latency_distribution: 'fixed', 'uniform' or 'lognormal'
+            error_rate: Fraction of requests answered with 503
+            rate_limit: Requests per second allowed before answering 429 (None for no limit)
+            amount_limit: Charges above this amount are declined
+            seed: Random seed for reproducible runs
+        """
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError("latency_distribution must be one of " + ', '.join(LATENCY_DISTRIBUTIONS))
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.latency_distribution = latency_distribution
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.amount_limit = amount_limit
+        self.charges: Dict[str, Dict] = {}
+        self.references: Dict[str, str] = {}
+        self.request_count = 0
+        self.connection_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._tokens = rate_limit or 0.0
+        self._tokens_at = time.monotonic()
+        self._httpd = _QuietHTTPServer((host, port), self._handler_class())
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_profile(cls, profile: str, **overrides) -> 'StubGatewayServer':
+        """Create a server with one of the FAULT_PROFILES settings."""
+        settings = dict(FAULT_PROFILES[profile])
+        settings.update(overrides)
+        return cls(**settings)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return 'http://' + host + ':' + str(port)
+
+    def start(self) -> 'StubGatewayServer':
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='stub-gateway', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the listening socket."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _delay(self) -> float:
+        """Response delay in seconds drawn from the latency distribution."""
+        with self._lock:
+            if self.latency_distribution == 'uniform':
+                ms = self._random.uniform(self.latency_ms - self.latency_jitter_ms,
+                                          self.latency_ms + self.latency_jitter_ms)
+            elif self.latency_distribution == 'lognormal' and self.latency_ms > 0:
+                # Median latency_ms with a long right tail
+                sigma = self.latency_jitter_ms / self.latency_ms
+                ms = self.latency_ms * self._random.lognormvariate(0.0, sigma)
+            else:
+                ms = self.latency_ms
+        return max(0.0, ms) / 1000.0
+
+    def _admit(self) -> Optional[int]:
+        """Count a request; return an error status to inject, if any."""
+        with self._lock:
+            self.request_count += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(self.rate_limit, self._tokens + (now - self._tokens_at) * self.rate_limit)
+                self._tokens_at = now
+                if self._tokens < 1.0:
+                    return 429
+                self._tokens -= 1.0
+            if self.error_rate and self._random.random() < self.error_rate:
+                return 503
+        return None
+
+    def _charge(self, body: Dict):
+        customer_id = str(body.get('customer_id', ''))
+        amount = body.get('amount')
+        if not isinstance(amount, (int, float)) or amount <= 0:
+            return 400, {'error': 'Invalid amount: must be greater than 0'}
+        if len(customer_id) != 6:
+            return 400, {'error': 'Invalid patron ID format'}
+        if amount > self.amount_limit:
+            return 402, {'error': 'Payment declined: amount exceeds limit'}
+        reference = body.get('reference')
+        with self._lock:
+            if reference and reference in self.references:
+                charge = self.charges[self.references[reference]]
+                return 200, {'id': charge['transaction_id'], 'status': charge['status'], 'amount': charge['amount']}
+            self._next_id += 1
+            transaction_id = 'txn_' + customer_id + '_' + str(self._next_id)
+            charge = {'transaction_id': transaction_id, 'status': 'completed', 'amount': amount,
+                      'refunded': 0.0, 'description': body.get('description', ''),
+                      'reference': reference, 'timestamp': time.time()}
+            self.charges[transaction_id] = charge
+            if reference:
+                self.references[reference] = transaction_id
+        return 200, {'id': transaction_id, 'status': 'completed', 'amount': amount}
+
+    def _refund(self, body: Dict):
+        transaction_id = body.get('transaction_id')
+        amount = body.get('amount')
+        if not isinstance(amount, (int, float)) or amount <= 0:
+            return 400, {'error': 'Invalid refund amount'}
+        with self._lock:
+            charge = self.charges.get(transaction_id)
+            if not charge:
+                return 404, {'error': 'Invalid transaction ID'}
+            if charge['refunded'] + amount > charge['amount'] + 0.005:
+                return 400, {'error': 'Refund exceeds charge amount'}
+            charge['refunded'] += amount
+            self._next_id += 1
+            refund_id = 'refund_' + transaction_id + '_' + str(self._next_id)
+        return 200, {'id': refund_id, 'amount': amount}
+
+    def _status(self, transaction_id: str):
+        with self._lock:
+            charge = self.charges.get(transaction_id)
+            if not charge:
+                return 404, {'status': 'not_found', 'message': 'Transaction not found'}
+            return 200, {key: charge[key] for key in ('transaction_id', 'status', 'amount', 'timestamp')}
+
+    def _find(self, reference: str):
+        with self._lock:
+            transaction_id = self.references.get(reference)
+        if not transaction_id:
+            return 404, {'status': 'not_found', 'message': 'Transaction not found'}
+        return self._status(transaction_id)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately; without this, delayed
+            # ACKs stall every response on a kept-alive connection
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connection_count += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, payload: Dict) -> None:
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                if status == 429:
+                    self.send_header('Retry-After', '1')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self, route) -> None:
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                time.sleep(server._delay())
+                if not (self.headers.get('Authorization') or '').startswith('Bearer '):
+                    self._send(401, {'error': 'Missing API key'})
+                    return
+                injected = server._admit()
+                if injected == 429:
+                    self._send(429, {'error': 'Rate limit exceeded'})
+                    return
+                if injected:
+                    self._send(injected, {'error': 'Service unavailable'})
+                    return
+                try:
+                    body = json.loads(raw) if raw else {}
+                except ValueError:
+                    self._send(400, {'error': 'Invalid JSON'})
+                    return
+                self._send(*route(body))
+
+            def do_POST(self):
+                if self.path == '/charges':
+                    self._handle(server._charge)
+                elif self.path == '/refunds':
+                    self._handle(server._refund)
+                else:
+                    self._handle(lambda body: (404, {'error': 'Not found'}))
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path.startswith('/charges/'):
+                    transaction_id = url.path[len('/charges/'):]
+                    self._handle(lambda body: server._status(transaction_id))
+                elif url.path == '/charges':
+                    reference = parse_qs(url.query).get('reference', [''])[0]
+                    self._handle(lambda body: server._find(reference))
+                else:
+                    self._handle(lambda body: (404, {'error': 'Not found'}))
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the stub payment gateway.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--profile', choices=sorted(FAULT_PROFILES), default='healthy')
+    parser.add_argument('--latency-ms', type=float)
+    parser.add_argument('--jitter-ms', type=float)
+    parser.add_argument('--error-rate', type=float)
+    parser.add_argument('--rate-limit', type=float)
+    args = parser.parse_args()
+
+    overrides = {'host': args.host, 'port': args.port}
+    for name, value in (('latency_ms', args.latency_ms), ('latency_jitter_ms', args.jitter_ms),
+                        ('error_rate', args.error_rate), ('rate_limit', args.rate_limit)):
+        if value is not None:
+            overrides[name] = value
+    server = StubGatewayServer.from_profile(args.profile, **overrides)
+    print('Stub gateway listening on ' + server.url + ' (profile: ' + args.profile + ')')
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
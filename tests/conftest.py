@@ -43,3 +43,28 @@ def setup_database():
             os.remove(DATABASE)
         except:
             pass
+
+@pytest.fixture
+def query_budget():
+    """
+    Assert that a block stays within a query budget.
+    
+    Usage:
+        with query_budget(3):
+            borrow_book_by_patron("123456", 1)
+    """
+    from contextlib import contextmanager
+    from database import count_queries
+    
+    @contextmanager
+    def budget(max_queries, max_connections=None):
+        with count_queries() as counter:
+            yield counter
+        assert counter.queries <= max_queries, (
+            'Ran ' + str(counter.queries) + ' queries (budget ' + str(max_queries) + '):\n'
+            + '\n'.join(' '.join(sql.split()) for sql in counter.statements))
+        if max_connections is not None:
+            assert counter.connections <= max_connections, (
+                'Opened ' + str(counter.connections) + ' connections (budget ' + str(max_connections) + ')')
+    
+    return budget
@@ -0,0 +1,60 @@
+import pytest
+from app import create_app
+from services.library_service import add_book_to_catalog
+from services.autocomplete_service import (
+    build_autocomplete_index, autocomplete, get_autocomplete_memory_report
+)
+
+
+def test_autocomplete_title_prefix():
+    """Prefix of the title returns the book."""
+    add_book_to_catalog("Gatsby Returns", "Some Author", "9014567890123", 1)
+    build_autocomplete_index()
+    result = autocomplete("gats", "title")
+    assert len(result) == 1
+    assert result[0]["value"] == "Gatsby Returns"
+
+
+def test_autocomplete_matches_word_starts():
+    """Prefix of a later word in the title also matches."""
+    add_book_to_catalog("The Great Gatsby", "F. Scott Fitzgerald", "9014567890124", 1)
+    build_autocomplete_index()
+    result = autocomplete("great", "title")
+    assert result[0]["value"] == "The Great Gatsby"
+    assert autocomplete("reat", "title") == []
+
+
+def test_autocomplete_updated_on_insert():
+    """Books added after the build are found without a rebuild."""
+    build_autocomplete_index()
+    assert autocomplete("orwell", "author") == []
+    add_book_to_catalog("Animal Farm", "George Orwell", "9014567890125", 2)
+    result = autocomplete("orwell", "author")
+    assert len(result) == 1
+    assert result[0]["field"] == "author"
+
+
+def test_autocomplete_respects_limit():
+    """No more than `limit` suggestions are returned."""
+    for i in range(5):
+        add_book_to_catalog("Python Vol " + str(i), "Author", "901456789020" + str(i), 1)
+    build_autocomplete_index()
+    assert len(autocomplete("python", "title", limit=3)) == 3
+
+
+def test_autocomplete_memory_report():
+    """Memory report lists key counts and byte totals."""
+    add_book_to_catalog("Report Book", "Report Author", "9014567890126", 1)
+    build_autocomplete_index()
+    report = get_autocomplete_memory_report()
+    assert report["fields"]["title"]["keys"] == 2
+    assert report["total_bytes"] > 0
+
+
+def test_autocomplete_api():
+    """The API endpoint returns suggestions and rejects empty queries."""
+    client = create_app().test_client()
+    response = client.get("/api/autocomplete?q=mock&field=title")
+    assert response.status_code == 200
+    assert response.get_json()["suggestions"][0]["value"] == "To Kill a Mockingbird"
+    assert client.get("/api/autocomplete?q=").status_code == 400
@@ -0,0 +1,94 @@
+import pytest
+import json
+import threading
+from app import create_app
+from services.availability_broadcaster import AvailabilityBroadcaster
+from database import insert_book, get_book_by_isbn, update_book_availability, get_latest_event_seq
+
+
+@pytest.fixture
+def broadcaster():
+    instance = AvailabilityBroadcaster(poll_interval=0.05)
+    yield instance
+    instance.stop()
+
+
+def add_book(isbn="9034567890900", copies=3):
+    insert_book("Streamed Book", "Author", isbn, copies, copies)
+    return get_book_by_isbn(isbn)["id"]
+
+
+def parse(message):
+    lines = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+    return int(lines["id"]), json.loads(lines["data"])
+
+
+def test_resume_sends_missed_availability_changes(broadcaster):
+    book_id = add_book()
+    update_book_availability(book_id, -1)
+    update_book_availability(book_id, -1)
+    stream = broadcaster.stream(after_seq=0, heartbeat=0.05)
+    assert next(stream).startswith("retry:")
+    first_seq, first = parse(next(stream))
+    second_seq, second = parse(next(stream))
+    assert first == {"book_id": book_id, "available_copies": 2, "total_copies": 3, "change": -1}
+    assert second["available_copies"] == 1
+    assert second_seq > first_seq
+    assert next(stream) == ": heartbeat\n\n"
+    stream.close()
+
+
+def test_live_changes_reach_every_subscriber(broadcaster):
+    book_id = add_book()
+    streams = [broadcaster.stream(heartbeat=2.0) for _ in range(3)]
+    for stream in streams:
+        next(stream)
+    assert broadcaster.subscriber_count == 3
+    update_book_availability(book_id, -1)
+    for stream in streams:
+        assert parse(next(stream))[1]["available_copies"] == 2
+        stream.close()
+    assert broadcaster.subscriber_count == 0
+
+
+def test_book_filter(broadcaster):
+    followed = add_book()
+    other = add_book("9034567890901")
+    update_book_availability(other, -1)
+    update_book_availability(followed, -1)
+    stream = broadcaster.stream(after_seq=0, book_ids={followed}, heartbeat=0.05)
+    next(stream)
+    assert parse(next(stream))[1]["book_id"] == followed
+    assert next(stream) == ": heartbeat\n\n"
+    stream.close()
+
+
+def test_lagging_subscriber_catches_up_from_outbox():
+    broadcaster = AvailabilityBroadcaster(poll_interval=60.0, max_pending=1)
+    book_id = add_book()
+    stream = broadcaster.stream(heartbeat=0.05, stop=threading.Event())
+    next(stream)
+    broadcaster.stop()
+    for _ in range(3):
+        update_book_availability(book_id, -1)
+    broadcaster.poll_once()
+    copies = [parse(next(stream))[1]["available_copies"] for _ in range(3)]
+    assert copies == [2, 1, 0]
+    stream.close()
+
+
+def test_stream_endpoint_resumes_from_last_event_id():
+    book_id = add_book()
+    seq = get_latest_event_seq()
+    update_book_availability(book_id, -1)
+    app = create_app({"AVAILABILITY_HEARTBEAT": 0.05})
+    client = app.test_client()
+    response = client.get("/api/availability/stream", headers={"Last-Event-ID": str(seq)})
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b"retry:")
+    assert parse(next(chunks).decode())[1]["book_id"] == book_id
+    response.close()
+    app.extensions["availability_broadcaster"].stop()
+    assert client.get("/api/availability/stream?after=abc").status_code == 400
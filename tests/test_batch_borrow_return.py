@@ -0,0 +1,68 @@
+import pytest
+from app import create_app
+from services.library_service import (
+    add_book_to_catalog, borrow_book_by_patron, borrow_books_batch, return_books_batch
+)
+from database import get_book_by_isbn, get_patron_borrow_count
+
+
+def add_books(count, copies=1, first=0):
+    book_ids = []
+    for i in range(first, first + count):
+        isbn = "90145678901" + str(10 + i)
+        add_book_to_catalog("Kiosk Book " + str(i), "Kiosk Author", isbn, copies)
+        book_ids.append(get_book_by_isbn(isbn)["id"])
+    return book_ids
+
+
+def test_borrow_batch_borrows_all_items():
+    book_ids = add_books(3)
+    success, message, results = borrow_books_batch("123456", book_ids)
+    assert success is True
+    assert all(result["success"] for result in results)
+    assert get_patron_borrow_count("123456") == 3
+    assert get_book_by_isbn("9014567890110")["available_copies"] == 0
+
+
+def test_borrow_batch_enforces_limit_across_batch():
+    book_ids = add_books(4)
+    borrow_book_by_patron("123456", book_ids[0])
+    extra_book_id = add_books(1, copies=2, first=10)[0]
+    success, message, results = borrow_books_batch("123456", book_ids[1:] + [extra_book_id, extra_book_id])
+    assert [result["success"] for result in results] == [True, True, True, True, False]
+    assert "maximum borrowing limit" in results[-1]["message"]
+    assert get_patron_borrow_count("123456") == 5
+
+
+def test_borrow_batch_reports_unavailable_and_missing_books():
+    book_ids = add_books(1)
+    success, message, results = borrow_books_batch("123456", [book_ids[0], book_ids[0], 9999])
+    assert [result["success"] for result in results] == [True, False, False]
+    assert results[2]["message"] == "Book not found."
+
+
+def test_borrow_batch_invalid_patron():
+    success, message, results = borrow_books_batch("12345", add_books(1))
+    assert success is False
+    assert results == []
+
+
+def test_return_batch_returns_borrowed_items():
+    book_ids = add_books(2)
+    borrow_books_batch("123456", book_ids)
+    success, message, results = return_books_batch("123456", book_ids + [book_ids[0]])
+    assert [result["success"] for result in results] == [True, True, False]
+    assert get_patron_borrow_count("123456") == 0
+    assert get_book_by_isbn("9014567890110")["available_copies"] == 1
+
+
+def test_batch_api_endpoints():
+    book_ids = add_books(2)
+    client = create_app().test_client()
+    response = client.post("/api/borrow/batch", json={"patron_id": "123456", "book_ids": book_ids})
+    assert response.status_code == 200
+    assert len(response.get_json()["results"]) == 2
+    response = client.post("/api/return/batch", json={"patron_id": "123456", "book_ids": book_ids})
+    assert response.get_json()["success"] is True
+    assert client.post("/api/borrow/batch", json={"patron_id": "123456"}).status_code == 400
+    assert client.post("/api/borrow/batch", json={"patron_id": "1", "book_ids": [1]}).status_code == 400
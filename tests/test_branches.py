@@ -0,0 +1,159 @@
+import pytest
+import threading
+from app import create_app
+from services.library_service import add_book_to_catalog, borrow_book_by_patron
+from services.branch_service import (
+    add_branch, set_branch_copies, borrow_book_at_branch, return_book_at_branch,
+    get_consolidated_availability
+)
+from database import (
+    get_book_by_isbn, get_branch, get_db_connection, get_patron_summary, verify_patron_summary
+)
+
+
+def add_book(isbn="9014567890500", copies=1):
+    add_book_to_catalog("Branch Book", "Branch Author", isbn, copies)
+    return get_book_by_isbn(isbn)["id"]
+
+
+def test_add_branch_validates_and_creates_store(tmp_path):
+    path = str(tmp_path / "east.db")
+    assert add_branch("east", "East Branch", path)[0] is True
+    assert get_branch("east")["database_path"] == path
+    assert add_branch("east", "Again")[0] is False
+    assert add_branch("main", "Main")[0] is False
+    assert add_branch("bad id!", "Bad")[0] is False
+
+
+def test_borrow_and_return_at_sharded_branch(tmp_path):
+    book_id = add_book()
+    add_branch("east", "East Branch", str(tmp_path / "east.db"))
+    set_branch_copies("east", book_id, 1)
+
+    success, message = borrow_book_at_branch("123456", "east", book_id)
+    assert success is True
+    assert "East Branch" in message
+    assert borrow_book_at_branch("654321", "east", book_id)[0] is False
+    # The main collection's copy is untouched
+    assert get_book_by_isbn("9014567890500")["available_copies"] == 1
+
+    assert return_book_at_branch("123456", "east", book_id)[0] is True
+    assert return_book_at_branch("123456", "east", book_id)[0] is False
+
+
+def test_borrow_limit_counts_loans_at_every_branch(tmp_path):
+    add_branch("east", "East Branch", str(tmp_path / "east.db"))
+    add_branch("west", "West Branch")
+    book_ids = [add_book("90145678905" + str(10 + i)) for i in range(6)]
+    for book_id in book_ids:
+        set_branch_copies("east", book_id, 1)
+        set_branch_copies("west", book_id, 1)
+
+    for book_id in book_ids[:2]:
+        assert borrow_book_at_branch("123456", "east", book_id)[0] is True
+    for book_id in book_ids[2:4]:
+        assert borrow_book_at_branch("123456", "west", book_id)[0] is True
+    assert borrow_book_by_patron("123456", book_ids[4])[0] is True
+    assert borrow_book_by_patron("123456", book_ids[5])[0] is False
+    assert borrow_book_at_branch("123456", "east", book_ids[5])[0] is False
+
+
+def test_concurrent_borrows_cannot_exceed_limit(tmp_path):
+    add_branch("east", "East Branch", str(tmp_path / "east.db"))
+    add_branch("north", "North Branch", str(tmp_path / "north.db"))
+    book_ids = [add_book("90145678905" + str(10 + i)) for i in range(8)]
+    for book_id in book_ids:
+        set_branch_copies("east", book_id, 1)
+        set_branch_copies("north", book_id, 1)
+    for book_id in book_ids[:4]:
+        assert borrow_book_at_branch("123456", "east", book_id)[0] is True
+
+    results = []
+    barrier = threading.Barrier(4)
+
+    def borrow(branch_id, book_id):
+        barrier.wait()
+        if branch_id == "main":
+            results.append(borrow_book_by_patron("123456", book_id)[0])
+        else:
+            results.append(borrow_book_at_branch("123456", branch_id, book_id)[0])
+
+    threads = [threading.Thread(target=borrow, args=(branch_id, book_id))
+               for branch_id, book_id in (("east", book_ids[4]), ("north", book_ids[5]),
+                                          ("main", book_ids[6]), ("main", book_ids[7]))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [False, False, False, True]
+    assert verify_patron_summary() == []
+
+
+def test_branch_loan_slots_are_given_back(tmp_path):
+    add_branch("east", "East Branch", str(tmp_path / "east.db"))
+    book_id = add_book()
+    assert borrow_book_at_branch("123456", "east", book_id)[0] is False
+    assert get_patron_summary("123456")["branch_loans"] == 0
+    set_branch_copies("east", book_id, 1)
+    assert borrow_book_at_branch("123456", "east", book_id)[0] is True
+    assert get_patron_summary("123456")["branch_loans"] == 1
+    assert return_book_at_branch("123456", "east", book_id)[0] is True
+    assert get_patron_summary("123456")["branch_loans"] == 0
+
+
+def test_verify_recounts_branch_loans(tmp_path):
+    add_branch("east", "East Branch", str(tmp_path / "east.db"))
+    book_id = add_book()
+    set_branch_copies("east", book_id, 1)
+    borrow_book_at_branch("123456", "east", book_id)
+    conn = get_db_connection()
+    conn.execute("UPDATE patron_summary SET branch_loans = 0")
+    conn.commit()
+    conn.close()
+    assert verify_patron_summary(repair=True)[0]["expected"]["branch_loans"] == 1
+    assert get_patron_summary("123456")["branch_loans"] == 1
+    assert verify_patron_summary() == []
+
+
+def test_set_branch_copies_keeps_copies_on_loan(tmp_path):
+    book_id = add_book()
+    add_branch("east", "East Branch", str(tmp_path / "east.db"))
+    set_branch_copies("east", book_id, 2)
+    borrow_book_at_branch("123456", "east", book_id)
+
+    assert set_branch_copies("east", book_id, 0)[0] is False
+    assert set_branch_copies("east", book_id, 3)[0] is True
+    branch = get_consolidated_availability([book_id])[0]["branches"][1]
+    assert branch == {"branch_id": "east", "total_copies": 3, "available_copies": 2}
+
+
+def test_consolidated_availability_sums_branches(tmp_path):
+    book_id = add_book(copies=2)
+    add_branch("east", "East Branch", str(tmp_path / "east.db"))
+    add_branch("west", "West Branch")
+    set_branch_copies("east", book_id, 3)
+    set_branch_copies("west", book_id, 1)
+    borrow_book_at_branch("123456", "west", book_id)
+
+    entry = get_consolidated_availability([book_id])[0]
+    assert entry["total_copies"] == 6
+    assert entry["available_copies"] == 5
+    assert [branch["branch_id"] for branch in entry["branches"]] == ["main", "east", "west"]
+
+
+def test_branch_api_routes(tmp_path):
+    app = create_app({'TESTING': True, 'RATE_LIMIT_ENABLED': False})
+    client = app.test_client()
+    book_id = add_book()
+    add_branch("east", "East Branch", str(tmp_path / "east.db"))
+    set_branch_copies("east", book_id, 1)
+
+    branches = client.get('/api/branches').get_json()['branches']
+    assert [branch['id'] for branch in branches] == ['main', 'east']
+
+    response = client.post('/api/branches/east/borrow', json={'patron_id': '123456', 'book_id': book_id})
+    assert response.status_code == 200
+    response = client.get('/api/availability?book_id=' + str(book_id))
+    assert response.get_json()['books'][0]['available_copies'] == 1
+    response = client.post('/api/branches/nowhere/borrow', json={'patron_id': '123456', 'book_id': book_id})
+    assert response.status_code == 400
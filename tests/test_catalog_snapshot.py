@@ -0,0 +1,122 @@
+import os
+import pytest
+import time
+from app import create_app
+from database import add_sample_data, get_all_books, insert_book, get_book_by_isbn, update_book_availability
+from services.catalog_snapshot import (
+    CatalogSnapshot, build_catalog_snapshot, latest_snapshot_file, reopen_if_changed,
+    enable_catalog_snapshot, disable_catalog_snapshot, get_current_catalog_snapshot
+)
+from services.library_service import search_books_in_catalog
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    add_sample_data()
+    insert_book("Café Society", "Zoë Author", "9054567890900", 2, 1)
+    insert_book("ab", "Short", "9054567890901", 1, 1)
+    insert_book("cd", "Short", "9054567890902", 1, 1)
+    yield str(tmp_path / "catalog.snapshot")
+    disable_catalog_snapshot()
+
+
+def test_snapshot_round_trip(snapshot_path):
+    build_catalog_snapshot(snapshot_path)
+    snapshot = CatalogSnapshot(snapshot_path)
+    assert snapshot.all_books() == get_all_books()
+    assert list(snapshot.iter_books()) == get_all_books()
+    snapshot.close()
+
+
+def test_snapshot_search_matches_database(snapshot_path):
+    build_catalog_snapshot(snapshot_path)
+    snapshot = CatalogSnapshot(snapshot_path)
+    for term, field in (("the", "title"), ("CAFÉ", "title"), ("zoë", "author"), ("orwell", "author"),
+                        ("bc", "title"), ("zzz", "title")):
+        expected = [book for book in get_all_books() if term.lower() in book[field].lower()]
+        assert snapshot.search(term, field) == expected
+    assert snapshot.find_isbn("9054567890900").title == "Café Society"
+    assert snapshot.find_isbn("0000000000000") is None
+    snapshot.close()
+
+
+def test_swapped_file_is_picked_up_and_old_mapping_stays_valid(snapshot_path):
+    build_catalog_snapshot(snapshot_path)
+    old = CatalogSnapshot(snapshot_path)
+    assert reopen_if_changed(old, snapshot_path) is old
+    insert_book("Newer Book", "Author", "9054567890903", 1, 1)
+    build_catalog_snapshot(snapshot_path)
+    new = reopen_if_changed(old, snapshot_path)
+    assert new is not old
+    assert len(new) == len(old) + 1
+    assert old.find_isbn("9054567890903") is None
+    assert old.all_books()[0] == get_all_books()[0]
+    assert new.file_path == latest_snapshot_file(snapshot_path) != old.file_path
+    new.close()
+
+
+def test_old_files_are_removed_and_close_releases_the_mapping(snapshot_path):
+    for _ in range(4):
+        build_catalog_snapshot(snapshot_path)
+    assert sorted(os.listdir(os.path.dirname(snapshot_path))) == ["catalog.snapshot.3", "catalog.snapshot.4"]
+    snapshot = CatalogSnapshot(snapshot_path)
+    assert snapshot.file_path.endswith("catalog.snapshot.4")
+    snapshot.close()
+    assert snapshot._mmap.closed
+
+
+def test_search_uses_current_snapshot_and_follows_changes(snapshot_path, mocker):
+    manager = enable_catalog_snapshot(snapshot_path, min_interval=0.0)
+    spy = mocker.patch("services.library_service.get_all_books", side_effect=get_all_books)
+    assert [book.title for book in search_books_in_catalog("café", "title")] == ["Café Society"]
+    spy.assert_not_called()
+
+    book_id = get_book_by_isbn("9054567890900")["id"]
+    update_book_availability(book_id, -1)
+    assert get_current_catalog_snapshot() is None
+    deadline = time.time() + 5
+    while get_current_catalog_snapshot() is None and time.time() < deadline:
+        time.sleep(0.01)
+    assert manager.rebuild_count >= 2
+    assert search_books_in_catalog("café", "title")[0].available_copies == 0
+
+
+def test_catalog_page_served_from_snapshot(snapshot_path, mocker):
+    client = create_app({"CATALOG_SNAPSHOT_PATH": snapshot_path}).test_client()
+    spy = mocker.patch("routes.catalog_routes.get_all_books")
+    response = client.get("/catalog")
+    assert response.status_code == 200
+    assert "Café Society" in response.get_data(as_text=True)
+    spy.assert_not_called()
+
+
+def test_reader_maps_builder_files_without_querying_the_database(snapshot_path, mocker):
+    build_catalog_snapshot(snapshot_path)
+    reader = enable_catalog_snapshot(snapshot_path, min_interval=0.0, builder=False)
+    version = mocker.patch("services.catalog_snapshot.get_catalog_version")
+    first = get_current_catalog_snapshot()
+    assert first is not None and get_current_catalog_snapshot() is first
+    version.assert_not_called()
+
+    # This process's own change is never served from the older snapshot
+    update_book_availability(get_book_by_isbn("9054567890900")["id"], -1)
+    assert get_current_catalog_snapshot() is None
+    mocker.stopall()
+    build_catalog_snapshot(snapshot_path)
+    assert get_current_catalog_snapshot().find_isbn("9054567890900").available_copies == 0
+    assert reader.snapshot.file_path.endswith("catalog.snapshot.2")
+
+
+def test_concurrently_claimed_generation_is_skipped(snapshot_path):
+    build_catalog_snapshot(snapshot_path)
+    old = CatalogSnapshot(snapshot_path)
+    # Another builder has claimed generation 2 and not filled it yet
+    open(snapshot_path + ".2", "wb").close()
+    assert reopen_if_changed(old, snapshot_path) is old
+    build_catalog_snapshot(snapshot_path)
+    new = reopen_if_changed(old, snapshot_path)
+    assert new.file_path.endswith("catalog.snapshot.3")
+    assert new.catalog_version == old.catalog_version
+    assert new.last_modified is not None
+    old.close()
+    new.close()
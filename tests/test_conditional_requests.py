@@ -0,0 +1,88 @@
+import pytest
+import sqlite3
+from app import create_app
+from database import DATABASE, get_db_connection
+from services.library_service import add_book_to_catalog, borrow_book_by_patron
+
+
+@pytest.fixture
+def client():
+    return create_app().test_client()
+
+
+def age_last_catalog_change(seconds=5):
+    conn = get_db_connection()
+    conn.execute("UPDATE catalog_state SET last_modified = strftime('%Y-%m-%dT%H:%M:%f', 'now', ?)",
+                 ("-" + str(seconds) + " seconds",))
+    conn.commit()
+    conn.close()
+
+
+def test_catalog_sends_etag_and_last_modified(client):
+    age_last_catalog_change()
+    response = client.get("/catalog")
+    assert response.status_code == 200
+    assert response.headers["ETag"]
+    assert response.headers["Last-Modified"]
+    assert response.headers["Cache-Control"] == "no-cache"
+
+
+def test_catalog_matching_etag_returns_304_without_database(client, mocker):
+    etag = client.get("/catalog").headers["ETag"]
+    get_all_books = mocker.patch("routes.catalog_routes.get_all_books")
+    response = client.get("/catalog", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    get_all_books.assert_not_called()
+
+
+def test_catalog_etag_changes_after_borrow(client):
+    etag = client.get("/catalog").headers["ETag"]
+    borrow_book_by_patron("123456", 1)
+    response = client.get("/catalog", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_catalog_etag_changes_after_add_book(client):
+    etag = client.get("/catalog").headers["ETag"]
+    add_book_to_catalog("New Arrival", "Some Author", "9014567890123", 1)
+    assert client.get("/catalog", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_search_etag_depends_on_query(client):
+    etag = client.get("/api/search?q=gatsby").headers["ETag"]
+    assert client.get("/api/search?q=gatsby", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/search?q=orwell", headers={"If-None-Match": etag}).status_code == 200
+    assert client.get("/search?q=gatsby", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_if_modified_since_returns_304(client):
+    age_last_catalog_change()
+    last_modified = client.get("/search?q=gatsby").headers["Last-Modified"]
+    response = client.get("/search?q=gatsby", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+
+def test_no_last_modified_in_the_second_of_a_change(client):
+    age_last_catalog_change()
+    last_modified = client.get("/search?q=gatsby").headers["Last-Modified"]
+    add_book_to_catalog("New Arrival", "Some Author", "9014567890123", 1)
+    response = client.get("/search?q=gatsby", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 200
+    assert "Last-Modified" not in response.headers
+
+
+def test_changes_from_another_process_change_the_etag(client):
+    etag = client.get("/catalog").headers["ETag"]
+    # A plain connection, as another worker process would use
+    conn = sqlite3.connect(DATABASE)
+    conn.execute("UPDATE books SET available_copies = available_copies - 1 WHERE id = 1")
+    conn.commit()
+    conn.close()
+    assert client.get("/catalog", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_cache_control_is_configurable():
+    client = create_app({"CATALOG_CACHE_CONTROL": "public, max-age=30"}).test_client()
+    assert client.get("/catalog").headers["Cache-Control"] == "public, max-age=30"
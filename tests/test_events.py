@@ -0,0 +1,75 @@
+import pytest
+import time
+from app import create_app
+from services.library_service import add_book_to_catalog, borrow_book_by_patron, return_book_by_patron
+from services.event_consumer import EventConsumer, iter_events
+from database import get_book_by_isbn, get_events_after, get_latest_event_seq
+
+
+def test_changes_append_events_in_order():
+    add_book_to_catalog("Event Book", "Author", "9014567890800", 2)
+    book_id = get_book_by_isbn("9014567890800")["id"]
+    borrow_book_by_patron("123456", book_id)
+    return_book_by_patron("123456", book_id)
+    types = [event["event_type"] for event in get_events_after(0)]
+    assert types == ["book.created", "loan.created", "book.availability_changed",
+                     "loan.returned", "book.availability_changed"]
+
+
+def test_event_payload_describes_change():
+    add_book_to_catalog("Event Book", "Author", "9014567890800", 2)
+    book_id = get_book_by_isbn("9014567890800")["id"]
+    borrow_book_by_patron("123456", book_id)
+    event = get_events_after(0, event_types=["book.availability_changed"])[0]
+    assert event["payload"] == {"book_id": book_id, "available_copies": 1, "total_copies": 2, "change": -1}
+
+
+def test_failed_borrow_writes_no_events():
+    add_book_to_catalog("Event Book", "Author", "9014567890800", 1)
+    seq = get_latest_event_seq()
+    borrow_book_by_patron("12", get_book_by_isbn("9014567890800")["id"])
+    assert get_events_after(seq) == []
+
+
+def test_consumer_resumes_from_saved_position():
+    add_book_to_catalog("First", "Author", "9014567890800", 1)
+    received = []
+    assert EventConsumer("reports", received.extend).poll_once() == 1
+    add_book_to_catalog("Second", "Author", "9014567890801", 1)
+    assert EventConsumer("reports", received.extend, batch_size=1).poll_once() == 1
+    assert [event["payload"]["title"] for event in received] == ["First", "Second"]
+
+
+def test_consumer_thread_survives_handler_errors():
+    add_book_to_catalog("First", "Author", "9014567890800", 1)
+    received = []
+
+    def flaky_handler(events):
+        if not received:
+            received.append(None)
+            raise RuntimeError("downstream unavailable")
+        received.extend(events)
+
+    consumer = EventConsumer("flaky", flaky_handler)
+    consumer.start(poll_interval=0.01)
+    deadline = time.time() + 5
+    while len(received) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    consumer.stop()
+    assert [event["payload"]["title"] for event in received[1:]] == ["First"]
+    assert consumer.position == received[-1]["seq"]
+
+
+def test_iter_events_filters_types():
+    add_book_to_catalog("Event Book", "Author", "9014567890800", 1)
+    borrow_book_by_patron("123456", get_book_by_isbn("9014567890800")["id"])
+    events = list(iter_events(0, batch_size=1, event_types=["loan.created"]))
+    assert [event["event_type"] for event in events] == ["loan.created"]
+
+
+def test_events_api():
+    client = create_app().test_client()
+    data = client.get("/api/events?after=0&limit=2").get_json()
+    assert data["count"] == 2
+    rest = client.get("/api/events?after=" + str(data["next_after"])).get_json()
+    assert rest["events"][0]["seq"] == data["next_after"] + 1
@@ -0,0 +1,48 @@
+import pytest
+from services.library_service import add_book_to_catalog, search_books_in_catalog
+from services.fuzzy_search_service import build_fuzzy_index, bounded_levenshtein
+
+
+def test_fuzzy_search_title_typo():
+    """A doubled letter in the title still finds the book."""
+    add_book_to_catalog("The Great Gatsby", "F. Scott Fitzgerald", "9014567890123", 3)
+    build_fuzzy_index()
+    result = search_books_in_catalog("Gatsbby", "fuzzy")
+    assert len(result) == 1
+    assert result[0]["title"] == "The Great Gatsby"
+
+
+def test_fuzzy_search_author_typo():
+    """A missing letter in the author still finds the book."""
+    add_book_to_catalog("1984", "George Orwell", "9014567890124", 1)
+    build_fuzzy_index()
+    result = search_books_in_catalog("Orwel", "fuzzy")
+    assert result[0]["author"] == "George Orwell"
+
+
+def test_fuzzy_search_exact_match_ranked_first():
+    """Closer matches come before ones with more typos."""
+    add_book_to_catalog("Python Tricks", "Author A", "9014567890125", 1)
+    add_book_to_catalog("Pythons Tricks", "Author B", "9014567890126", 1)
+    build_fuzzy_index()
+    result = search_books_in_catalog("python", "fuzzy")
+    assert [book["title"] for book in result] == ["Python Tricks", "Pythons Tricks"]
+
+
+def test_fuzzy_search_no_match():
+    """Words that are too different are not returned."""
+    add_book_to_catalog("Deep Learning", "Some Author", "9014567890127", 1)
+    build_fuzzy_index()
+    assert search_books_in_catalog("Gardening", "fuzzy") == []
+
+
+def test_fuzzy_index_updated_on_insert():
+    """Books added after the build are searchable without a rebuild."""
+    build_fuzzy_index()
+    add_book_to_catalog("Moby Dick", "Herman Melville", "9014567890128", 1)
+    assert search_books_in_catalog("Melvile", "fuzzy")[0]["title"] == "Moby Dick"
+
+
+def test_bounded_levenshtein_gives_up_early():
+    assert bounded_levenshtein("kitten", "sitting", 3) == 3
+    assert bounded_levenshtein("kitten", "sitting", 1) == 2
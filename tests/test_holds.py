@@ -0,0 +1,78 @@
+import pytest
+from app import create_app
+from services.library_service import (
+    add_book_to_catalog, borrow_book_by_patron, return_book_by_patron,
+    place_hold, cancel_hold, return_books_batch
+)
+from database import get_book_by_isbn, get_patron_borrow_count, get_patron_holds
+
+
+def add_unavailable_book(isbn="9014567890200"):
+    """Add a single-copy book and lend it to patron 111111."""
+    add_book_to_catalog("Popular Book", "Popular Author", isbn, 1)
+    book_id = get_book_by_isbn(isbn)["id"]
+    borrow_book_by_patron("111111", book_id)
+    return book_id
+
+
+def test_place_hold_on_unavailable_book():
+    book_id = add_unavailable_book()
+    success, message = place_hold("222222", book_id)
+    assert success is True
+    holds = get_patron_holds("222222")
+    assert holds[0]["book_id"] == book_id
+    assert holds[0]["position"] == 1
+
+
+def test_place_hold_rejected_when_available_or_duplicate():
+    add_book_to_catalog("Shelf Book", "Author", "9014567890201", 1)
+    assert place_hold("222222", get_book_by_isbn("9014567890201")["id"])[0] is False
+    book_id = add_unavailable_book()
+    assert place_hold("222222", book_id)[0] is True
+    assert place_hold("222222", book_id)[0] is False
+
+
+def test_return_checks_copy_out_to_head_of_queue():
+    book_id = add_unavailable_book()
+    place_hold("222222", book_id)
+    place_hold("333333", book_id)
+    success, message = return_book_by_patron("111111", book_id)
+    assert success is True
+    assert get_patron_borrow_count("222222") == 1
+    assert get_patron_holds("222222") == []
+    assert get_patron_holds("333333")[0]["position"] == 1
+    assert get_book_by_isbn("9014567890200")["available_copies"] == 0
+
+
+def test_batch_return_dispatches_holds():
+    book_id = add_unavailable_book()
+    place_hold("222222", book_id)
+    return_books_batch("111111", [book_id])
+    assert get_patron_borrow_count("222222") == 1
+
+
+def test_holds_count_toward_borrow_limit():
+    for i in range(4):
+        place_hold("222222", add_unavailable_book("901456789030" + str(i)))
+    add_book_to_catalog("Fifth Book", "Author", "9014567890310", 2)
+    fifth = get_book_by_isbn("9014567890310")["id"]
+    assert borrow_book_by_patron("222222", fifth)[0] is True
+    assert borrow_book_by_patron("222222", fifth)[0] is False
+
+
+def test_cancel_hold():
+    book_id = add_unavailable_book()
+    place_hold("222222", book_id)
+    assert cancel_hold("222222", book_id)[0] is True
+    assert cancel_hold("222222", book_id)[0] is False
+    return_book_by_patron("111111", book_id)
+    assert get_book_by_isbn("9014567890200")["available_copies"] == 1
+
+
+def test_holds_api():
+    book_id = add_unavailable_book()
+    client = create_app().test_client()
+    response = client.post("/api/holds", json={"patron_id": "222222", "book_id": book_id})
+    assert response.status_code == 201
+    assert client.get("/api/holds/222222").get_json()["count"] == 1
+    assert client.delete("/api/holds", json={"patron_id": "222222", "book_id": book_id}).status_code == 200
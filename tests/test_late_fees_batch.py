@@ -0,0 +1,57 @@
+import pytest
+from datetime import datetime, timedelta
+from app import create_app
+from services.library_service import calculate_late_fees_batch, calculate_late_fee_for_book
+from database import insert_book, insert_borrow_record, get_book_by_isbn
+
+
+def add_loan(patron_id, isbn, days_overdue):
+    """Insert a book and an active loan that is `days_overdue` days late."""
+    insert_book("Batch Book " + isbn, "Batch Author", isbn, 1, 0)
+    book_id = get_book_by_isbn(isbn)["id"]
+    due_date = datetime.now() - timedelta(days=days_overdue)
+    insert_borrow_record(patron_id, book_id, due_date - timedelta(days=14), due_date)
+    return book_id
+
+
+def test_batch_pairs_match_single_calculation():
+    book_a = add_loan("123456", "9014567890001", 3)
+    book_b = add_loan("654321", "9014567890002", 20)
+    results = calculate_late_fees_batch(pairs=[("123456", book_a), ("654321", book_b)])
+    assert [r["fee_amount"] for r in results] == [
+        calculate_late_fee_for_book("123456", book_a)["fee_amount"],
+        calculate_late_fee_for_book("654321", book_b)["fee_amount"],
+    ]
+    assert results[1]["fee_amount"] == 15.00
+
+
+def test_batch_reports_missing_and_invalid_entries():
+    results = calculate_late_fees_batch(pairs=[("123456", 999), ("12AB56", 1)])
+    assert results[0]["status"] == "No active borrow record found"
+    assert results[1]["status"] == "Invalid patron ID"
+
+
+def test_batch_by_patron_lists_every_active_loan():
+    add_loan("123456", "9014567890003", 2)
+    add_loan("123456", "9014567890004", 0)
+    results = calculate_late_fees_batch(patron_ids=["123456", "123456"])
+    assert len(results) == 2
+    assert sum(r["fee_amount"] for r in results) == 1.00
+
+
+def test_batch_api_endpoint():
+    book_id = add_loan("123456", "9014567890005", 4)
+    client = create_app().test_client()
+    response = client.post("/api/late_fees", json={"items": [["123456", book_id]], "patron_ids": ["123456"]})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["count"] == 2
+    # The loan is listed twice but charged once
+    assert data["patron_totals"]["123456"] == 2.00
+    assert data["total_fee_amount"] == 2.00
+
+
+def test_batch_api_enforces_limit():
+    client = create_app({"LATE_FEE_BATCH_LIMIT": 2}).test_client()
+    response = client.post("/api/late_fees", json={"patron_ids": ["111111", "222222", "333333"]})
+    assert response.status_code == 400
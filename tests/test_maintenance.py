@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import threading
+import time
+import pytest
+from datetime import datetime
+from app import create_app
+from database import backup_database, optimize_database, get_scheduler_state
+from services.branch_service import add_branch
+from services.library_service import add_book_to_catalog
+from services.maintenance_scheduler import (
+    MaintenanceScheduler, run_backup, in_window, get_last_maintenance_report
+)
+
+
+def add_books(count, prefix="901456789"):
+    for i in range(count):
+        add_book_to_catalog("Maintenance Book " + str(i), "Author", prefix + str(1000 + i), 1)
+
+
+def count_books(path):
+    conn = sqlite3.connect(path)
+    count = conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_backup_copies_database_in_steps(tmp_path):
+    add_books(50)
+    dest = str(tmp_path / "copy.db")
+    report = backup_database(dest, pages=2, pause=0)
+    assert report["steps"] > 1
+    assert report["pages"] > 0
+    assert count_books(dest) == 50
+    assert not os.path.exists(dest + ".tmp")
+
+
+def test_backup_does_not_block_writers(tmp_path):
+    add_books(50)
+    errors = []
+    written = []
+
+    def write_books():
+        try:
+            for i in range(20):
+                assert add_book_to_catalog("Concurrent " + str(i), "Writer", "902456789" + str(1000 + i), 1)[0]
+                written.append(i)
+        except Exception as e:
+            errors.append(e)
+
+    writer = threading.Thread(target=write_books)
+    writer.start()
+    backup_database(str(tmp_path / "live.db"), pages=1, pause=0.001)
+    writer.join()
+    assert errors == [] and len(written) == 20
+    assert count_books(str(tmp_path / "live.db")) >= 50
+
+
+def test_backup_falls_back_to_one_step_when_writes_keep_restarting_it(tmp_path, mocker):
+    add_books(50)
+    sleep = time.sleep
+    writes = iter(range(10))
+
+    def write_between_steps(seconds):
+        i = next(writes, None)
+        if i is not None:
+            add_book_to_catalog("Restart " + str(i), "Writer", "902456789" + str(2000 + i), 1)
+        sleep(seconds)
+
+    mocker.patch("database.time.sleep", side_effect=write_between_steps)
+    report = backup_database(str(tmp_path / "busy.db"), pages=2, pause=0.001, max_restarts=1)
+    assert report["restarts"] == 2
+    assert report["single_step"] is True
+    assert count_books(str(tmp_path / "busy.db")) >= 51
+
+
+def test_failed_backup_removes_temporary_copy(tmp_path):
+    dest = tmp_path / "taken"
+    dest.mkdir()
+    with pytest.raises(OSError):
+        backup_database(str(dest), pause=0)
+    assert not os.path.exists(str(dest) + ".tmp")
+
+
+def test_optimize_reports_steps(tmp_path):
+    add_books(5)
+    report = optimize_database()
+    assert set(report["steps"]) == {"analyze", "optimize"}
+    assert report["page_count"] > 0
+    conn = sqlite3.connect(report["database"])
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0] > 0
+    conn.close()
+
+    add_branch("east", "East Branch", str(tmp_path / "east.db"))
+    branch_report = optimize_database(str(tmp_path / "east.db"), vacuum=True)
+    assert "vacuum" in branch_report["steps"]
+    assert branch_report["checkpoint"]["busy"] == 0
+
+
+def test_run_backup_includes_branches_and_prunes(tmp_path):
+    add_branch("east", "East Branch", str(tmp_path / "east.db"))
+    backup_dir = str(tmp_path / "backups")
+    for day in (1, 2, 3):
+        run_backup(backup_dir, keep=2, now=datetime(2026, 1, day, 3, 0))
+    names = sorted(os.listdir(backup_dir))
+    assert names == ["branch-east-20260102-030000.db", "branch-east-20260103-030000.db",
+                     "library-20260102-030000.db", "library-20260103-030000.db"]
+
+
+def test_in_window_wraps_midnight():
+    assert in_window(datetime(2026, 1, 1, 3), (2, 5))
+    assert not in_window(datetime(2026, 1, 1, 5), (2, 5))
+    assert in_window(datetime(2026, 1, 1, 23), (22, 4))
+    assert in_window(datetime(2026, 1, 1, 1), (22, 4))
+    assert in_window(datetime(2026, 1, 1, 12), None)
+
+
+def test_scheduler_runs_once_per_interval_inside_window(tmp_path):
+    scheduler = MaintenanceScheduler(backup_dir=str(tmp_path / "backups"), window=(2, 5))
+    assert scheduler.run_once(datetime(2026, 1, 1, 12)) == {"backups": [], "maintenance": []}
+
+    report = scheduler.run_once(datetime(2026, 1, 1, 3))
+    assert len(report["backups"]) == 1 and len(report["maintenance"]) == 1
+    assert get_scheduler_state("maintenance_last_backup") == "2026-01-01T03:00:00"
+    assert scheduler.run_once(datetime(2026, 1, 1, 4)) == {"backups": [], "maintenance": []}
+    assert len(scheduler.run_once(datetime(2026, 1, 2, 3))["backups"]) == 1
+
+    client = create_app({"TESTING": True, "RATE_LIMIT_ENABLED": False}).test_client()
+    last_run = client.get("/api/stats/maintenance").get_json()["last_run"]
+    assert last_run == get_last_maintenance_report()
+    assert last_run["ran_at"] == "2026-01-02T03:00:00"
@@ -0,0 +1,100 @@
+import pytest
+import time
+from datetime import datetime, timedelta
+from app import create_app
+from services.overdue_scheduler import OverdueScheduler, OutboxSink
+from services.library_service import return_book_by_patron
+from database import (
+    insert_book, insert_borrow_record, get_book_by_isbn, get_db_connection,
+    get_scheduler_state, set_scheduler_state
+)
+
+
+class ListSink:
+    def __init__(self):
+        self.batches = []
+
+    def emit(self, events):
+        self.batches.append(events)
+
+
+def add_loan(patron_id, isbn, due_in_days):
+    insert_book("Due Book " + isbn, "Author", isbn, 1, 0)
+    book_id = get_book_by_isbn(isbn)["id"]
+    due_date = datetime.now() + timedelta(days=due_in_days)
+    insert_borrow_record(patron_id, book_id, due_date - timedelta(days=14), due_date)
+    return book_id
+
+
+def test_emits_only_overdue_loans_in_batches():
+    for i in range(5):
+        add_loan("123456", "901456789040" + str(i), -5 + i)   # due -5..-1 days
+    add_loan("123456", "9014567890410", 3)
+    sink = ListSink()
+    assert OverdueScheduler(sink, batch_size=2).run_once() == 5
+    assert [len(batch) for batch in sink.batches] == [2, 2, 1]
+
+
+def test_does_not_emit_twice_across_restarts():
+    add_loan("123456", "9014567890400", -1)
+    assert OverdueScheduler(ListSink()).run_once() == 1
+    assert OverdueScheduler(ListSink()).run_once() == 0
+
+
+def test_returned_loans_are_skipped():
+    book_id = add_loan("123456", "9014567890400", -1)
+    return_book_by_patron("123456", book_id)
+    assert OverdueScheduler(ListSink()).run_once() == 0
+
+
+def test_emits_later_loans_when_they_fall_due():
+    add_loan("123456", "9014567890400", 2)
+    scheduler = OverdueScheduler(ListSink())
+    assert scheduler.run_once() == 0
+    assert 0 < scheduler.seconds_until_next() <= scheduler.max_sleep
+    assert scheduler.run_once(now=datetime.now() + timedelta(days=3)) == 1
+
+
+def test_loans_recorded_behind_the_cursor_are_still_emitted():
+    add_loan("123456", "9014567890400", -1)
+    scheduler = OverdueScheduler(ListSink())
+    assert scheduler.run_once() == 1
+    # Entered late: due before the loan the cursor already passed
+    add_loan("654321", "9014567890401", -10)
+    sink = ListSink()
+    assert OverdueScheduler(sink).run_once() == 1
+    assert sink.batches[0][0]["patron_id"] == "654321"
+    assert OverdueScheduler(ListSink()).run_once() == 0
+
+
+def test_cursor_stored_before_record_ids_does_not_resend():
+    add_loan("123456", "9014567890400", -2)
+    add_loan("123456", "9014567890401", -1)
+    assert OverdueScheduler(ListSink()).run_once() == 2
+    state = get_scheduler_state("overdue_cursor")
+    set_scheduler_state("overdue_cursor", state.rsplit("|", 1)[0])
+    assert OverdueScheduler(ListSink()).run_once() == 0
+
+
+def test_outbox_sink_writes_events():
+    add_loan("123456", "9014567890400", -2)
+    OverdueScheduler(OutboxSink()).run_once()
+    conn = get_db_connection()
+    rows = conn.execute("SELECT patron_id FROM overdue_events").fetchall()
+    conn.close()
+    assert [row["patron_id"] for row in rows] == ["123456"]
+
+
+def test_background_thread_started_from_app():
+    add_loan("123456", "9014567890400", -2)
+    app = create_app({"OVERDUE_SCHEDULER_ENABLED": True, "OVERDUE_SINK": "outbox"})
+    scheduler = app.extensions["overdue_scheduler"]
+    count = 0
+    deadline = time.time() + 5
+    while count == 0 and time.time() < deadline:
+        conn = get_db_connection()
+        count = conn.execute("SELECT COUNT(*) AS count FROM overdue_events").fetchone()["count"]
+        conn.close()
+        time.sleep(0.05)
+    scheduler.stop()
+    assert count == 1
@@ -0,0 +1,88 @@
+import pytest
+from datetime import datetime, timedelta
+from app import create_app
+from services.library_service import (
+    add_book_to_catalog, borrow_book_by_patron, return_book_by_patron, place_hold,
+    get_patron_status_report
+)
+from database import (
+    get_book_by_isbn, get_patron_summary, verify_patron_summary, insert_book,
+    insert_borrow_record, get_db_connection, init_database
+)
+
+
+def add_book(isbn, copies=1):
+    add_book_to_catalog("Summary Book " + isbn, "Author", isbn, copies)
+    return get_book_by_isbn(isbn)["id"]
+
+
+def test_summary_tracks_borrow_and_return():
+    first = add_book("9014567890500")
+    second = add_book("9014567890501")
+    borrow_book_by_patron("123456", first)
+    borrow_book_by_patron("123456", second)
+    return_book_by_patron("123456", first)
+    summary = get_patron_summary("123456")
+    assert summary["active_loans"] == 1
+    assert summary["lifetime_loans"] == 2
+    assert summary["earliest_due_date"] is not None
+    assert verify_patron_summary() == []
+
+
+def test_summary_tracks_holds():
+    book_id = add_book("9014567890500")
+    borrow_book_by_patron("111111", book_id)
+    place_hold("222222", book_id)
+    assert get_patron_summary("222222")["active_holds"] == 1
+    return_book_by_patron("111111", book_id)
+    summary = get_patron_summary("222222")
+    assert summary["active_holds"] == 0
+    assert summary["active_loans"] == 1
+    assert verify_patron_summary() == []
+
+
+def test_summary_records_late_fee_on_return():
+    insert_book("Late Book", "Author", "9014567890502", 1, 0)
+    book_id = get_book_by_isbn("9014567890502")["id"]
+    due_date = datetime.now() - timedelta(days=4)
+    insert_borrow_record("123456", book_id, due_date - timedelta(days=14), due_date)
+    return_book_by_patron("123456", book_id)
+    assert get_patron_summary("123456")["assessed_fees"] == 2.00
+    assert get_patron_status_report("123456")["assessed_fees"] == 2.00
+
+
+def test_old_outstanding_fees_column_is_renamed():
+    conn = get_db_connection()
+    conn.execute("ALTER TABLE patron_summary RENAME COLUMN assessed_fees TO outstanding_fees")
+    conn.commit()
+    conn.close()
+    init_database()
+
+    insert_book("Late Book", "Author", "9014567890503", 1, 0)
+    book_id = get_book_by_isbn("9014567890503")["id"]
+    due_date = datetime.now() - timedelta(days=2)
+    insert_borrow_record("123456", book_id, due_date - timedelta(days=14), due_date)
+    return_book_by_patron("123456", book_id)
+    assert get_patron_summary("123456")["assessed_fees"] == 1.00
+    assert verify_patron_summary() == []
+
+
+def test_unknown_patron_summary_is_empty():
+    assert get_patron_summary("999999")["active_loans"] == 0
+
+
+def test_verify_detects_and_repairs_drift():
+    borrow_book_by_patron("123456", add_book("9014567890500"))
+    conn = get_db_connection()
+    conn.execute("UPDATE patron_summary SET active_loans = 7 WHERE patron_id = '123456'")
+    conn.commit()
+    conn.close()
+    mismatches = verify_patron_summary(repair=True)
+    assert mismatches[0]["expected"]["active_loans"] == 1
+    assert verify_patron_summary() == []
+
+
+def test_check_command():
+    runner = create_app().test_cli_runner()
+    result = runner.invoke(args=["check-patron-summary"])
+    assert "consistent" in result.output
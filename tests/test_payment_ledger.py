@@ -0,0 +1,141 @@
+import pytest
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from app import create_app
+from services.library_service import pay_late_fees, refund_late_fee_payment
+from services.payment_service import PaymentGateway
+from services.reconciliation_service import reconcile_payments
+from database import insert_book, insert_borrow_record, get_book_by_isbn, get_patron_payments
+
+
+def add_overdue_loan(patron_id="123456", isbn="9014567890900", days_overdue=4):
+    insert_book("Ledger Book", "Author", isbn, 1, 0)
+    book_id = get_book_by_isbn(isbn)["id"]
+    due_date = datetime.now() - timedelta(days=days_overdue)
+    insert_borrow_record(patron_id, book_id, due_date - timedelta(days=14), due_date)
+    return book_id
+
+
+def gateway(success=True, txn="txn_123456_1"):
+    mock_gateway = Mock(spec=PaymentGateway)
+    mock_gateway.process_payment.return_value = (success, txn if success else None, "gateway says")
+    mock_gateway.refund_payment.return_value = (True, "refunded")
+    mock_gateway.verify_payment_status.return_value = {"status": "completed"}
+    return mock_gateway
+
+
+def test_successful_payment_is_recorded():
+    book_id = add_overdue_loan()
+    pay_late_fees("123456", book_id, gateway())
+    payments = get_patron_payments("123456")
+    assert len(payments) == 1
+    assert payments[0]["status"] == "completed"
+    assert payments[0]["transaction_id"] == "txn_123456_1"
+    assert payments[0]["amount"] == 2.00
+
+
+def test_declined_and_errored_payments_are_recorded():
+    book_id = add_overdue_loan()
+    pay_late_fees("123456", book_id, gateway(success=False))
+    broken = gateway()
+    broken.process_payment.side_effect = TimeoutError("gateway timeout")
+    pay_late_fees("123456", book_id, broken)
+    assert [p["status"] for p in get_patron_payments("123456")] == ["error", "failed"]
+
+
+def test_refunds_update_ledger_and_are_capped():
+    book_id = add_overdue_loan()
+    pay_late_fees("123456", book_id, gateway())
+    assert refund_late_fee_payment("txn_123456_1", 1.50, gateway())[0] is True
+    assert get_patron_payments("123456")[0]["status"] == "partially_refunded"
+    success, message = refund_late_fee_payment("txn_123456_1", 1.00, gateway())
+    assert success is False
+    assert "exceeds amount paid" in message
+    refund_late_fee_payment("txn_123456_1", 0.50, gateway())
+    assert get_patron_payments("123456")[0]["status"] == "refunded"
+
+
+def test_concurrent_refunds_cannot_exceed_payment():
+    book_id = add_overdue_loan()
+    pay_late_fees("123456", book_id, gateway())
+    slow = gateway()
+    slow.refund_payment.side_effect = lambda *args: time.sleep(0.2) or (True, "refunded")
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(lambda _: refund_late_fee_payment("txn_123456_1", 1.50, slow)[0], range(3)))
+    assert sorted(results) == [False, False, True]
+    assert slow.refund_payment.call_count == 1
+    assert get_patron_payments("123456")[0]["refunded_amount"] == 1.50
+
+
+def test_failed_refund_releases_reserved_amount():
+    book_id = add_overdue_loan()
+    pay_late_fees("123456", book_id, gateway())
+    declined = gateway()
+    declined.refund_payment.return_value = (False, "declined")
+    broken = gateway()
+    broken.refund_payment.side_effect = TimeoutError("gateway timeout")
+    assert refund_late_fee_payment("txn_123456_1", 2.00, declined)[0] is False
+    assert refund_late_fee_payment("txn_123456_1", 2.00, broken)[0] is False
+    payment = get_patron_payments("123456")[0]
+    assert (payment["status"], payment["refunded_amount"]) == ("completed", 0)
+    assert refund_late_fee_payment("txn_123456_1", 2.00, gateway())[0] is True
+
+
+def test_reconcile_checks_each_payment_once():
+    for i, patron in enumerate(("111111", "222222", "333333")):
+        book_id = add_overdue_loan(patron, "901456789090" + str(i))
+        pay_late_fees(patron, book_id, gateway(txn="txn_" + patron + "_1"))
+    checker = gateway()
+    assert reconcile_payments(checker, batch_size=2)["checked"] == 3
+    assert checker.verify_payment_status.call_count == 3
+    assert reconcile_payments(checker)["checked"] == 0
+
+
+def test_reconcile_runs_status_calls_concurrently():
+    for i in range(8):
+        patron = str(100000 + i)
+        pay_late_fees(patron, add_overdue_loan(patron, "90145678909" + str(10 + i)), gateway(txn="txn_" + patron))
+    slow = gateway()
+    slow.verify_payment_status.side_effect = lambda txn: time.sleep(0.2) or {"status": "completed"}
+    start = time.time()
+    reconcile_payments(slow, max_workers=8)
+    assert time.time() - start < 1.0
+
+
+def test_reconcile_flags_unknown_transactions():
+    pay_late_fees("123456", add_overdue_loan(), gateway())
+    checker = gateway()
+    checker.verify_payment_status.return_value = {"status": "not_found"}
+    assert reconcile_payments(checker)["updated"] == 1
+    assert get_patron_payments("123456")[0]["status"] == "disputed"
+
+
+def test_reconcile_settles_charges_with_unknown_outcome():
+    broken = gateway()
+    broken.process_payment.side_effect = TimeoutError("gateway timeout")
+    pay_late_fees("111111", add_overdue_loan("111111", "9014567890911"), broken)
+    pay_late_fees("222222", add_overdue_loan("222222", "9014567890922"), broken)
+    checker = gateway()
+    checker.find_payment.side_effect = lambda reference: (
+        {"status": "completed", "transaction_id": "txn_111111_9"} if reference == "libpay_1"
+        else {"status": "not_found"})
+    assert reconcile_payments(checker)["settled"] == 0
+    summary = reconcile_payments(checker, settle_after=0)
+    assert summary["settled"] == 2
+    assert [call.args for call in checker.find_payment.call_args_list] == [("libpay_1",), ("libpay_2",)]
+    settled = get_patron_payments("111111")[0]
+    assert (settled["status"], settled["transaction_id"]) == ("completed", "txn_111111_9")
+    assert get_patron_payments("222222")[0]["status"] == "failed"
+    assert reconcile_payments(checker, settle_after=0)["settled"] == 0
+    assert checker.verify_payment_status.call_count == 0
+
+
+def test_payments_api_served_from_ledger():
+    pay_late_fees("123456", add_overdue_loan(), gateway())
+    client = create_app().test_client()
+    data = client.get("/api/payments/123456").get_json()
+    assert data["count"] == 1
+    assert data["total_paid"] == 2.00
+    assert client.get("/api/payments/12").status_code == 400
@@ -26,7 +26,8 @@ def test_pay_late_fees_successful_payment(mocker):
     mock_gateway.process_payment.assert_called_once_with(
         patron_id="123456",
         amount=10.50,
-        description="Late fees for 'Test Book'"
+        description="Late fees for 'Test Book'",
+        reference="libpay_1"
     )
 
 
@@ -0,0 +1,126 @@
+import pytest
+import time
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from app import create_app
+from services.payment_queue import PaymentQueue
+from services.payment_service import PaymentGateway
+from database import (
+    insert_book, insert_borrow_record, get_book_by_isbn, get_payment_job,
+    insert_payment_job, claim_payment_job
+)
+
+
+def add_overdue_loan(patron_id="123456", isbn="9024567890900"):
+    insert_book("Queued Fee Book", "Author", isbn, 1, 0)
+    book_id = get_book_by_isbn(isbn)["id"]
+    due_date = datetime.now() - timedelta(days=3)
+    insert_borrow_record(patron_id, book_id, due_date - timedelta(days=14), due_date)
+    return book_id
+
+
+def gateway(delay=0.0):
+    mock_gateway = Mock(spec=PaymentGateway)
+    mock_gateway.process_payment.side_effect = lambda **kwargs: (
+        time.sleep(delay) or (True, "txn_" + kwargs["patron_id"] + "_1", "ok"))
+    mock_gateway.refund_payment.return_value = (False, "declined")
+    return mock_gateway
+
+
+def wait_for(job_ids, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        jobs = [get_payment_job(job_id) for job_id in job_ids]
+        if all(job["status"] not in ("queued", "running") for job in jobs):
+            return jobs
+        time.sleep(0.02)
+    raise AssertionError("jobs did not finish")
+
+
+def test_invalid_requests_are_not_queued():
+    queue = PaymentQueue(workers=0)
+    assert queue.submit_payment("12", 1) == (False, "Invalid patron ID. Must be exactly 6 digits.", None)
+    assert queue.submit_refund("abc", 1.0)[0] is False
+    assert queue.submit_refund("txn_1", -1)[0] is False
+    assert claim_payment_job() is None
+
+
+def test_run_once_processes_payment_and_refund():
+    book_id = add_overdue_loan()
+    queue = PaymentQueue(workers=0, payment_gateway=gateway())
+    _, _, payment_job = queue.submit_payment("123456", book_id)
+    _, _, refund_job = queue.submit_refund("txn_123456_1", 1.0)
+    assert queue.run_once() and queue.run_once()
+    assert queue.run_once() is False
+    payment = get_payment_job(payment_job)
+    assert payment["status"] == "succeeded"
+    assert payment["transaction_id"] == "txn_123456_1"
+    refund = get_payment_job(refund_job)
+    assert refund["status"] == "failed"
+    assert refund["message"] == "Refund failed: declined"
+
+
+def test_full_queue_refuses_new_jobs():
+    queue = PaymentQueue(workers=0, max_queued=1)
+    assert queue.submit_payment("123456", 1)[0] is True
+    accepted, message, job_id = queue.submit_payment("123456", 2)
+    assert accepted is False
+    assert "queue is full" in message
+
+
+def test_duplicate_payment_for_same_fee_is_refused():
+    book_id = add_overdue_loan()
+    queue = PaymentQueue(workers=0, payment_gateway=gateway())
+    _, _, job_id = queue.submit_payment("123456", book_id)
+    assert queue.submit_payment("123456", book_id) == (
+        False, "A payment for this late fee is already in progress.", job_id)
+    claim_payment_job()
+    assert queue.submit_payment("123456", book_id)[2] == job_id
+    assert queue.submit_payment("654321", book_id)[0] is True
+
+
+def test_workers_call_gateway_concurrently():
+    job_ids = []
+    queue = PaymentQueue(workers=4, payment_gateway=gateway(delay=0.3), poll_interval=0.05)
+    for i in range(4):
+        patron = str(200000 + i)
+        job_ids.append(queue.submit_payment(patron, add_overdue_loan(patron, "90245678909" + str(10 + i)))[2])
+    start = time.time()
+    try:
+        jobs = wait_for(job_ids)
+    finally:
+        queue.stop()
+    assert all(job["status"] == "succeeded" for job in jobs)
+    assert time.time() - start < 1.0
+
+
+def test_start_marks_only_expired_jobs_interrupted():
+    abandoned = insert_payment_job("payment", {"patron_id": "123456", "book_id": 1})
+    claim_payment_job("gone-host:1", lease_seconds=-1)
+    in_flight = insert_payment_job("payment", {"patron_id": "123456", "book_id": 2})
+    claim_payment_job("other-host:2", lease_seconds=300)
+    queue = PaymentQueue(workers=1, poll_interval=0.05)
+    queue.start()
+    queue.stop()
+    assert get_payment_job(abandoned)["status"] == "interrupted"
+    job = get_payment_job(in_flight)
+    assert (job["status"], job["owner"]) == ("running", "other-host:2")
+
+
+def test_payment_api_returns_202_and_status():
+    book_id = add_overdue_loan()
+    app = create_app({"PAYMENT_WORKERS": 0})
+    app.extensions["payment_queue"].payment_gateway = gateway()
+    client = app.test_client()
+    response = client.post("/api/payments", json={"patron_id": "123456", "book_id": book_id})
+    assert response.status_code == 202
+    status_url = response.get_json()["status_url"]
+    assert client.get(status_url).get_json()["status"] == "queued"
+    app.extensions["payment_queue"].run_once()
+    assert client.get(status_url).get_json()["status"] == "succeeded"
+    assert client.post("/api/payments", json={"patron_id": "123456", "book_id": book_id}).status_code == 202
+    duplicate = client.post("/api/payments", json={"patron_id": "123456", "book_id": book_id})
+    assert duplicate.status_code == 409
+    assert duplicate.get_json()["status_url"].endswith("/api/payment_jobs/2")
+    assert client.post("/api/payments", json={"patron_id": "1"}).status_code == 400
+    assert client.get("/api/payment_jobs/999").status_code == 404
@@ -0,0 +1,87 @@
+import pstats
+import threading
+import time
+import pytest
+from app import create_app
+from services.profiler import ProfileStore, Profile, StackSampler
+
+TOKEN = "s3cret"
+ADMIN = {"X-Profile-Token": TOKEN}
+
+
+def make_client(**config):
+    settings = {"TESTING": True, "RATE_LIMIT_ENABLED": False, "PROFILING_ENABLED": True,
+                "PROFILING_TOKEN": TOKEN}
+    settings.update(config)
+    return create_app(settings).test_client()
+
+
+def test_admin_profiles_require_token():
+    client = make_client()
+    assert client.get("/admin/profiles").status_code == 403
+    assert client.get("/admin/profiles", headers={"X-Profile-Token": "wrong"}).status_code == 403
+    assert client.get("/admin/profiles?token=" + TOKEN).status_code == 403
+    assert client.get("/admin/profiles", headers=ADMIN).get_json()["profiles"] == []
+
+
+def test_profile_header_needs_admin_token():
+    client = make_client()
+    response = client.get("/search?q=great&type=title", headers={"X-Profile": "cprofile"})
+    assert "X-Profile-Mode" not in response.headers
+    assert client.get("/admin/profiles", headers=ADMIN).get_json()["profiles"] == []
+
+
+def test_cprofile_capture_downloads_as_pstats(tmp_path):
+    client = make_client()
+    response = client.get("/search?q=great&type=title", headers=dict(ADMIN, **{"X-Profile": "cprofile"}))
+    assert response.headers["X-Profile-Mode"] == "cprofile"
+
+    profile = client.get("/admin/profiles", headers=ADMIN).get_json()["profiles"][0]
+    assert profile["endpoint"] == "search.search_books"
+    assert profile["mode"] == "cprofile"
+
+    path = tmp_path / "request.pstats"
+    path.write_bytes(client.get("/admin/profiles/" + str(profile["id"]) + ".pstats", headers=ADMIN).data)
+    stats = pstats.Stats(str(path))
+    assert any(name == "search_books_in_catalog" for _, _, name in stats.stats)
+
+
+def test_sampled_capture_downloads_collapsed_stacks():
+    client = make_client(PROFILING_SAMPLE_RATE=1.0, PROFILING_SAMPLE_INTERVAL=0.001)
+    client.get("/api/search?q=great&type=title")
+    profile = client.get("/admin/profiles", headers=ADMIN).get_json()["profiles"][0]
+    assert profile["mode"] == "sample"
+    assert profile["formats"] == ["collapsed"]
+
+    url = "/admin/profiles/" + str(profile["id"])
+    assert client.get(url + ".pstats", headers=ADMIN).status_code == 400
+    for line in client.get(url + ".collapsed", headers=ADMIN).data.decode().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0 and stack
+
+
+def test_stack_sampler_records_thread_stacks():
+    sampler = StackSampler(interval=0.001)
+    done = threading.Event()
+
+    def busy_wait_for_sampler():
+        while not done.is_set():
+            time.sleep(0.001)
+
+    worker = threading.Thread(target=busy_wait_for_sampler)
+    worker.start()
+    sampler.start_sampling(worker.ident)
+    time.sleep(0.05)
+    stacks = sampler.stop_sampling(worker.ident)
+    done.set()
+    worker.join()
+    assert sum(stacks.values()) > 0
+    assert any("busy_wait_for_sampler" in stack for stack in stacks)
+
+
+def test_profile_store_keeps_newest():
+    store = ProfileStore(max_profiles=2)
+    for _ in range(3):
+        store.add(Profile(store.next_id(), "sample", "GET", "/", None, 1.0, stacks={}))
+    assert [profile.id for profile in store.list()] == [3, 2]
+    assert store.get(1) is None
@@ -0,0 +1,78 @@
+import pytest
+from app import create_app
+from services.library_service import (
+    add_book_to_catalog, borrow_book_by_patron, return_book_by_patron, get_patron_status_report
+)
+from database import get_book_by_isbn, get_db_connection, count_queries
+
+
+def add_books(count):
+    book_ids = []
+    for i in range(count):
+        isbn = "90145678906" + str(10 + i)
+        add_book_to_catalog("Budget Book " + str(i), "Budget Author", isbn, 2)
+        book_ids.append(get_book_by_isbn(isbn)["id"])
+    return book_ids
+
+
+def test_count_queries_counts_statements_and_connections():
+    with count_queries() as outer:
+        get_book_by_isbn("0000000000000")
+        with count_queries() as inner:
+            get_book_by_isbn("0000000000000")
+    assert (outer.queries, outer.connections) == (2, 2)
+    assert (inner.queries, inner.connections) == (1, 1)
+    assert "isbn" in inner.statements[0]
+
+
+def test_each_statement_counted_once_whichever_way_it_runs():
+    with count_queries() as counter:
+        conn = get_db_connection()
+        conn.execute("SELECT 1")
+        conn.cursor().execute("SELECT 2")
+        conn.executemany("UPDATE books SET total_copies = total_copies WHERE id = ?", [(1,), (2,)])
+        conn.close()
+    assert counter.statements == ["SELECT 1", "SELECT 2",
+                                  "UPDATE books SET total_copies = total_copies WHERE id = ?"]
+
+
+def test_borrow_and_return_query_budget(query_budget):
+    book_id = add_books(1)[0]
+    with query_budget(5):
+        assert borrow_book_by_patron("123456", book_id)[0] is True
+    with query_budget(5, max_connections=3):
+        assert return_book_by_patron("123456", book_id)[0] is True
+
+
+def test_status_report_queries_do_not_grow_with_loans(query_budget):
+    book_ids = add_books(4)
+    borrow_book_by_patron("123456", book_ids[0])
+    with count_queries() as one_loan:
+        get_patron_status_report("123456")
+    for book_id in book_ids[1:]:
+        borrow_book_by_patron("123456", book_id)
+    with query_budget(one_loan.queries):
+        report = get_patron_status_report("123456")
+    assert len(report["borrowed_books"]) == 4
+
+
+@pytest.mark.parametrize("url", [
+    "/search?q=great&type=title",
+    "/search?q=orwell&type=author",
+    "/search?q=9780743273565&type=isbn",
+    "/api/search?q=great&type=title",
+    "/api/search?q=gatsy&type=fuzzy",
+])
+def test_search_routes_query_budget(query_budget, url):
+    app = create_app({'TESTING': True, 'RATE_LIMIT_ENABLED': False})
+    client = app.test_client()
+    # One of these reads the catalog version for the cache validators
+    with query_budget(3, max_connections=3):
+        assert client.get(url).status_code == 200
+
+
+def test_query_count_headers():
+    app = create_app({'TESTING': True, 'RATE_LIMIT_ENABLED': False, 'QUERY_COUNT_ENABLED': True})
+    response = app.test_client().get('/api/search?q=great&type=title')
+    assert int(response.headers['X-Query-Count']) >= 1
+    assert int(response.headers['X-DB-Connections']) >= 1
@@ -0,0 +1,86 @@
+import pytest
+import time
+from app import create_app
+from routes.rate_limit import TokenBucketLimiter
+
+
+def make_client(limits=None, **config):
+    settings = {"RATE_LIMIT_ENABLED": True, "RATE_LIMITS": dict({"default": (100.0, 100)}, **(limits or {}))}
+    settings.update(config)
+    return create_app(settings).test_client()
+
+
+def test_token_bucket_allows_burst_then_refills():
+    limiter = TokenBucketLimiter()
+    assert [limiter.acquire("rule", "key", 50.0, 3) for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = limiter.acquire("rule", "key", 50.0, 3)
+    assert 0 < wait <= 0.02
+    time.sleep(0.03)
+    assert limiter.acquire("rule", "key", 50.0, 3) == 0.0
+    assert limiter.acquire("rule", "other", 50.0, 3) == 0.0
+
+
+def test_token_bucket_keeps_recent_keys_only():
+    limiter = TokenBucketLimiter(max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.acquire("rule", key, 1.0, 1)
+    assert len(limiter) == 2
+    # "a" was evicted and starts with a full bucket again
+    assert limiter.acquire("rule", "a", 1.0, 1) == 0.0
+
+
+def test_api_endpoint_limited_per_ip():
+    client = make_client({"api.search_books_api": (0.1, 2)})
+    assert client.get("/api/search?q=a").status_code == 200
+    assert client.get("/api/search?q=a").status_code == 200
+    response = client.get("/api/search?q=a")
+    assert response.status_code == 429
+    assert response.get_json()["error"] == "Too many requests. Slow down."
+    assert int(response.headers["Retry-After"]) >= 1
+    other_ip = client.get("/api/search?q=a", environ_base={"REMOTE_ADDR": "10.0.0.9"})
+    assert other_ip.status_code == 200
+    stats = client.get("/api/stats/limits").get_json()
+    assert stats["rate_limited"] == 1
+    assert stats["rate_limited_by_endpoint"] == {"api.search_books_api": 1}
+
+
+def test_patron_limited_across_ips():
+    client = make_client({"borrowing.borrow_book": (0.1, 2)})
+    statuses = [client.post("/borrow", data={"patron_id": "123456", "book_id": "1"},
+                            environ_base={"REMOTE_ADDR": "10.0.0." + str(i)}).status_code
+                for i in range(3)]
+    assert statuses == [302, 302, 429]
+
+
+def test_refused_patron_does_not_use_up_ip_tokens():
+    limiter = TokenBucketLimiter()
+    assert limiter.acquire_all("rule", ["ip:a", "patron:1"], 0.1, 1) == 0.0
+    assert limiter.acquire_all("rule", ["ip:b", "patron:1"], 0.1, 1) > 0
+    # ip:b was not charged for the refused request
+    assert limiter.acquire("rule", "ip:b", 0.1, 1) == 0.0
+
+
+def test_off_by_default():
+    client = create_app({"RATE_LIMITS": {"default": (0.1, 1)}}).test_client()
+    assert all(client.get("/api/search?q=a").status_code == 200 for _ in range(3))
+
+
+def test_sheds_when_too_many_requests_in_flight():
+    client = make_client(MAX_IN_FLIGHT_REQUESTS=0)
+    response = client.get("/catalog")
+    assert response.status_code == 503
+    assert response.mimetype == "text/plain"
+    assert client.get("/api/stats/limits").get_json()["shed_in_flight"] == 1
+
+
+def test_sheds_writes_when_sqlite_write_queue_is_long(mocker):
+    mocker.patch("routes.rate_limit.get_write_waiters", return_value=8)
+    client = make_client()
+    assert client.post("/api/borrow/batch", json={"patron_id": "123456", "book_ids": [1]}).status_code == 503
+    assert client.get("/api/search?q=a").status_code == 200
+
+
+def test_disabled():
+    client = make_client({"default": (0.1, 1)}, RATE_LIMIT_ENABLED=False)
+    assert all(client.get("/api/search?q=a").status_code == 200 for _ in range(3))
+    assert client.get("/api/stats/limits").get_json() == {"enabled": False}
@@ -0,0 +1,78 @@
+import pytest
+from datetime import datetime, timedelta
+from app import create_app
+from services.library_service import add_book_to_catalog, borrow_book_by_patron
+from services import recommendation_service
+from services.recommendation_service import build_related_index, get_related_books
+from database import get_book_by_isbn, insert_borrow_record, iter_patron_histories
+
+
+def add_book(isbn, title):
+    add_book_to_catalog(title, "Author", isbn, 10)
+    return get_book_by_isbn(isbn)["id"]
+
+
+@pytest.fixture
+def books():
+    dune = add_book("9014567890700", "Dune")
+    messiah = add_book("9014567890701", "Dune Messiah")
+    cookbook = add_book("9014567890702", "Cookbook")
+    for patron in ("111111", "222222", "333333"):
+        borrow_book_by_patron(patron, dune)
+        borrow_book_by_patron(patron, messiah)
+    borrow_book_by_patron("444444", dune)
+    borrow_book_by_patron("444444", cookbook)
+    return dune, messiah, cookbook
+
+
+def test_related_books_ranked_by_co_borrowers(books):
+    dune, messiah, cookbook = books
+    result = build_related_index(top_k=5)
+    assert result["patrons"] == 4
+    related = get_related_books(dune)
+    assert [r["book_id"] for r in related] == [messiah, cookbook]
+    assert related[0]["co_borrowers"] == 3
+
+
+def test_top_k_is_respected(books):
+    dune, messiah, cookbook = books
+    build_related_index(top_k=1)
+    assert [r["book_id"] for r in get_related_books(dune, limit=5)] == [messiah]
+
+
+def test_book_without_history_has_no_related(books):
+    build_related_index()
+    assert get_related_books(9999) == []
+
+
+def test_related_api_and_search_page(books):
+    dune, messiah, cookbook = books
+    build_related_index()
+    client = create_app().test_client()
+    response = client.get("/api/books/" + str(dune) + "/related")
+    assert response.get_json()["related"][0]["title"] == "Dune Messiah"
+    assert client.get("/api/books/9999/related").status_code == 404
+    page = client.get("/search?q=cookbook").get_data(as_text=True)
+    assert "Patrons also borrowed" in page
+
+
+def test_catalog_page_shows_related_and_rebuild_invalidates_etag(books):
+    client = create_app().test_client()
+    etag = client.get("/catalog").headers["ETag"]
+    build_related_index()
+    response = client.get("/catalog", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "Patrons also borrowed" in response.get_data(as_text=True)
+    streamed = client.get("/catalog?stream=1").get_data(as_text=True)
+    assert "Patrons also borrowed" in streamed
+
+
+def test_long_histories_keep_most_recent_borrows(monkeypatch):
+    low_id, mid_id, high_id = (add_book("90145678907" + str(10 + i), "Book " + str(i)) for i in range(3))
+    now = datetime.now()
+    for book_id, days_ago in ((low_id, 1), (mid_id, 30), (high_id, 20)):
+        insert_borrow_record("555555", book_id, now - timedelta(days=days_ago), now)
+    assert list(iter_patron_histories()) == [("555555", [low_id, high_id, mid_id])]
+    monkeypatch.setattr(recommendation_service, "MAX_HISTORY_PER_PATRON", 2)
+    build_related_index()
+    assert [r["book_id"] for r in get_related_books(low_id)] == [high_id]
@@ -0,0 +1,71 @@
+import pytest
+import pickle
+from datetime import datetime, timedelta
+from app import create_app
+from records import Book, record_type
+from database import (
+    get_book_by_isbn, get_all_books, insert_book, insert_borrow_record, get_patron_borrowed_books
+)
+
+
+def sample_book():
+    return Book((7, "Dune", "Frank Herbert", "9780441013593", 2, 1))
+
+
+def test_mapping_and_attribute_access():
+    book = sample_book()
+    assert book["title"] == book.title == "Dune"
+    assert book[0] == 7
+    assert book.get("isbn") == "9780441013593"
+    assert book.get("missing", "default") == "default"
+    assert "author" in book and "missing" not in book
+    assert dict(book) == book.to_dict() == {
+        "id": 7, "title": "Dune", "author": "Frank Herbert",
+        "isbn": "9780441013593", "total_copies": 2, "available_copies": 1,
+    }
+    with pytest.raises(KeyError):
+        book["missing"]
+
+
+def test_records_are_compact_and_read_only():
+    book = sample_book()
+    assert not hasattr(book, "__dict__")
+    with pytest.raises(AttributeError):
+        book.title = "Other"
+    with pytest.raises(TypeError):
+        book["title"] = "Other"
+    with pytest.raises(TypeError):
+        Book((1, "too", "short"))
+
+
+def test_records_pickle():
+    book = sample_book()
+    assert pickle.loads(pickle.dumps(book)) == book
+
+
+def test_database_helpers_return_records():
+    insert_book("Record Book", "Author", "9044567890900", 2, 2)
+    book = get_book_by_isbn("9044567890900")
+    assert isinstance(book, Book)
+    assert book.available_copies == 2
+    assert all(isinstance(row, Book) for row in get_all_books())
+
+
+def test_borrowed_books_convert_dates():
+    insert_book("Loan Book", "Author", "9044567890901", 1, 0)
+    book_id = get_book_by_isbn("9044567890901")["id"]
+    due_date = datetime.now() - timedelta(days=1)
+    insert_borrow_record("123456", book_id, due_date - timedelta(days=14), due_date)
+    (loan,) = get_patron_borrowed_books("123456")
+    assert loan.book_id == book_id
+    assert loan["due_date"] == due_date
+    assert loan.is_overdue is True
+
+
+def test_jsonify_writes_records_as_objects():
+    app = create_app()
+    Pair = record_type("Pair", ("left", "right"))
+    with app.app_context():
+        data = app.json.loads(app.json.dumps({"books": [sample_book()], "pair": Pair((1, (2, 3)))}))
+    assert data["books"][0]["title"] == "Dune"
+    assert data["pair"] == {"left": 1, "right": [2, 3]}
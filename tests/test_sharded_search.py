@@ -0,0 +1,54 @@
+import pytest
+from database import add_sample_data, insert_book, get_book_by_isbn, update_book_availability, get_book_id_boundaries
+from services.library_service import search_books_in_catalog
+from services.fuzzy_search_service import build_fuzzy_index
+from services.sharded_search import ShardedSearch, enable_sharded_search, disable_sharded_search
+
+
+@pytest.fixture
+def shards():
+    backend = ShardedSearch(3)
+    yield backend
+    backend.close()
+
+
+def add_books():
+    add_sample_data()
+    for i in range(30):
+        insert_book("Shard Title " + str(i % 7), "Shard Author " + str(i), str(9064567890900 + i), 2, 2)
+    build_fuzzy_index()
+
+
+def test_boundaries_split_ids_evenly():
+    add_books()
+    assert get_book_id_boundaries(3) == [0, 12, 23]
+    assert get_book_id_boundaries(1) == [0]
+
+
+def test_sharded_results_match_single_process(shards):
+    add_books()
+    shards.start()
+    for term, search_type in (("shard title 3", "title"), ("author 1", "author"),
+                              ("the", "title"), ("gatsbi", "fuzzy"), ("shard tittle", "fuzzy")):
+        expected = search_books_in_catalog(term, search_type)
+        assert expected
+        assert shards.search(term, search_type) == expected
+
+
+def test_invalid_type_is_rejected(shards):
+    with pytest.raises(ValueError):
+        shards.search_ids("x", "isbn")
+
+
+def test_search_routes_through_shards_and_stays_current():
+    add_books()
+    enable_sharded_search(2)
+    try:
+        insert_book("Brand New Shard Book", "Late Author", "9064567890999", 1, 1)
+        results = search_books_in_catalog("brand new", "title")
+        assert [book.isbn for book in results] == ["9064567890999"]
+        update_book_availability(results[0].id, -1)
+        assert search_books_in_catalog("brand new", "title")[0].available_copies == 0
+        assert search_books_in_catalog("9064567890999", "isbn")[0].title == "Brand New Shard Book"
+    finally:
+        disable_sharded_search()
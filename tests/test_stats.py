@@ -0,0 +1,63 @@
+import pytest
+from datetime import datetime, timedelta
+from app import create_app
+from services.library_service import add_book_to_catalog, borrow_book_by_patron, return_book_by_patron
+from services.stats_service import get_popular_books, get_circulation_totals
+from database import get_book_by_isbn, insert_borrow_record, rebuild_circulation_stats, get_db_connection
+
+
+def add_book(isbn, copies=5):
+    add_book_to_catalog("Stats Book " + isbn, "Author", isbn, copies)
+    return get_book_by_isbn(isbn)["id"]
+
+
+def test_popular_books_ranked_by_loans():
+    quiet = add_book("9014567890600")
+    busy = add_book("9014567890601")
+    borrow_book_by_patron("111111", quiet)
+    for patron in ("111111", "222222", "333333"):
+        borrow_book_by_patron(patron, busy)
+    result = get_popular_books(7, 10)
+    assert [(r["book_id"], r["loans"]) for r in result] == [(busy, 3), (quiet, 1)]
+    assert result[0]["title"] == "Stats Book 9014567890601"
+
+
+def test_popular_books_respect_window():
+    old = add_book("9014567890600")
+    long_ago = datetime.now() - timedelta(days=60)
+    insert_borrow_record("111111", old, long_ago, long_ago + timedelta(days=14))
+    assert get_popular_books(30, 10) == []
+    assert get_popular_books(365, 10)[0]["book_id"] == old
+
+
+def test_circulation_totals_count_loans_and_returns():
+    book_id = add_book("9014567890600")
+    borrow_book_by_patron("111111", book_id)
+    borrow_book_by_patron("222222", book_id)
+    return_book_by_patron("111111", book_id)
+    totals = get_circulation_totals(7)
+    assert totals["total_loans"] == 2
+    assert totals["total_returns"] == 1
+    assert totals["daily"][0]["day"] == datetime.now().date().isoformat()
+
+
+def test_rebuild_matches_incremental_counters():
+    book_id = add_book("9014567890600")
+    borrow_book_by_patron("111111", book_id)
+    return_book_by_patron("111111", book_id)
+    before = (get_popular_books(7, 10), get_circulation_totals(7))
+    conn = get_db_connection()
+    conn.execute("DELETE FROM book_loan_buckets")
+    conn.commit()
+    conn.close()
+    rebuild_circulation_stats()
+    assert (get_popular_books(7, 10), get_circulation_totals(7)) == before
+
+
+def test_stats_api():
+    client = create_app().test_client()
+    response = client.get("/api/stats/popular?window=365&limit=5")
+    assert response.status_code == 200
+    assert response.get_json()["results"][0]["title"] == "1984"
+    assert client.get("/api/stats/popular?window=10").status_code == 400
+    assert client.get("/api/stats/circulation?days=30").get_json()["total_loans"] == 1
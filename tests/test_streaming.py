@@ -0,0 +1,62 @@
+import pytest
+from app import create_app
+from routes import catalog_routes, search_routes
+from database import iter_all_books, get_all_books
+from services.library_service import (
+    add_book_to_catalog, borrow_book_by_patron, iter_search_books_in_catalog, search_books_in_catalog
+)
+from services.recommendation_service import build_related_index
+
+
+def test_iter_all_books_matches_get_all_books():
+    for i in range(7):
+        add_book_to_catalog("Streamed " + str(i), "Author", "901456789010" + str(i), 1)
+    assert list(iter_all_books(batch_size=3)) == get_all_books()
+
+
+def test_iter_search_matches_list_search():
+    add_book_to_catalog("Stream Title", "Stream Author", "9014567890100", 1)
+    add_book_to_catalog("Other Title", "Stream Author", "9014567890101", 1)
+    for search_type, term in [("title", "stream"), ("author", "stream"), ("isbn", "9014567890101")]:
+        assert list(iter_search_books_in_catalog(term, search_type)) == search_books_in_catalog(term, search_type)
+
+
+def test_catalog_streamed_matches_rendered_page(mocker):
+    client = create_app().test_client()
+    stream_page = mocker.spy(catalog_routes, "stream_page")
+    rendered = client.get("/catalog")
+    assert stream_page.call_count == 0
+    streamed = client.get("/catalog?stream=1")
+    assert stream_page.call_count == 1
+    assert streamed.get_data() == rendered.get_data()
+
+
+def test_search_streamed_when_configured(mocker):
+    client = create_app({"STREAM_TEMPLATES": True}).test_client()
+    stream_page = mocker.spy(search_routes, "stream_page")
+    response = client.get("/search?q=gatsby")
+    assert stream_page.call_count == 1
+    assert b"The Great Gatsby" in response.get_data()
+
+
+def test_streamed_search_shows_related_books():
+    add_book_to_catalog("Stream Dune", "Herbert", "9014567890110", 3)
+    add_book_to_catalog("Stream Messiah", "Herbert", "9014567890111", 3)
+    dune, messiah = [search_books_in_catalog(isbn, "isbn")[0].id for isbn in ("9014567890110", "9014567890111")]
+    for patron_id in ("111111", "222222"):
+        borrow_book_by_patron(patron_id, dune)
+        borrow_book_by_patron(patron_id, messiah)
+    build_related_index()
+    client = create_app().test_client()
+    rendered = client.get("/search?q=herbert&type=author")
+    streamed = client.get("/search?q=herbert&type=author&stream=1")
+    assert rendered.get_data().count(b"Stream Messiah") == 2
+    assert streamed.get_data() == rendered.get_data()
+
+
+def test_search_without_results_is_not_streamed(mocker):
+    client = create_app({"STREAM_TEMPLATES": True}).test_client()
+    stream_page = mocker.spy(search_routes, "stream_page")
+    response = client.get("/search?q=nothing-matches")
+    assert stream_page.call_count == 0
+    assert b"No results found" in response.get_data()
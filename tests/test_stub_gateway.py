@@ -0,0 +1,70 @@
+import pytest
+import requests
+from services.payment_service import PaymentGateway
+from services.stub_gateway import StubGatewayServer
+
+
+@pytest.fixture
+def stub():
+    server = StubGatewayServer(seed=1).start()
+    yield server
+    server.stop()
+
+
+def test_charge_status_and_refund_round_trip(stub):
+    gateway = PaymentGateway(base_url=stub.url)
+    success, transaction_id, message = gateway.process_payment("123456", 4.5, "Late fees")
+    assert success is True
+    assert transaction_id.startswith("txn_123456_")
+    assert message == "Payment of $4.50 processed successfully"
+    assert gateway.verify_payment_status(transaction_id)["status"] == "completed"
+    assert gateway.refund_payment(transaction_id, 1.5)[0] is True
+    assert gateway.refund_payment(transaction_id, 5.0) == (False, "Refund exceeds charge amount")
+    assert gateway.verify_payment_status("txn_unknown")["status"] == "not_found"
+
+
+def test_declined_charge(stub):
+    gateway = PaymentGateway(base_url=stub.url)
+    assert gateway.process_payment("123456", 5000.0) == (False, "", "Payment declined: amount exceeds limit")
+
+
+def test_charge_reference_is_idempotent_and_searchable(stub):
+    gateway = PaymentGateway(base_url=stub.url)
+    first = gateway.process_payment("123456", 3.0, "Late fees", reference="libpay_7")
+    assert gateway.process_payment("123456", 3.0, "Late fees", reference="libpay_7") == first
+    assert len(stub.charges) == 1
+    found = gateway.find_payment("libpay_7")
+    assert (found["status"], found["transaction_id"]) == ("completed", first[1])
+    assert gateway.find_payment("libpay_8")["status"] == "not_found"
+
+
+def test_session_reuses_connections(stub):
+    gateway = PaymentGateway(base_url=stub.url)
+    for _ in range(5):
+        gateway.process_payment("123456", 1.0)
+    assert stub.request_count == 5
+    assert stub.connection_count == 1
+
+
+def test_server_errors_raise():
+    with StubGatewayServer(error_rate=1.0) as server:
+        gateway = PaymentGateway(base_url=server.url)
+        with pytest.raises(requests.HTTPError):
+            gateway.process_payment("123456", 1.0)
+
+
+def test_rate_limit_answers_429():
+    with StubGatewayServer(rate_limit=2.0) as server:
+        gateway = PaymentGateway(base_url=server.url)
+        gateway.process_payment("123456", 1.0)
+        gateway.process_payment("123456", 1.0)
+        with pytest.raises(requests.HTTPError) as error:
+            gateway.process_payment("123456", 1.0)
+        assert error.value.response.status_code == 429
+
+
+def test_slow_gateway_times_out():
+    with StubGatewayServer(latency_ms=500.0) as server:
+        gateway = PaymentGateway(base_url=server.url, timeout=0.1)
+        with pytest.raises(requests.Timeout):
+            gateway.process_payment("123456", 1.0)
@@ -0,0 +1,112 @@
+import json
+import pytest
+from datetime import datetime, timedelta
+from app import create_app
+from database import get_db_connection
+from services.library_service import add_book_to_catalog, pay_late_fees
+from services.payment_service import PaymentGateway
+from tracing import (
+    MemoryCollector, FileCollector, enable_tracing, disable_tracing, start_span, traced
+)
+
+
+@pytest.fixture(autouse=True)
+def tracing_off_afterwards():
+    yield
+    disable_tracing()
+
+
+def add_overdue_loan(patron_id="123456", days_overdue=10):
+    add_book_to_catalog("Traced Book", "Trace Author", "9014567890700", 1)
+    due_date = datetime.now() - timedelta(days=days_overdue)
+    conn = get_db_connection()
+    cursor = conn.execute("SELECT id FROM books WHERE isbn = '9014567890700'")
+    book_id = cursor.fetchone()["id"]
+    conn.execute("INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) VALUES (?, ?, ?, ?)",
+                 (patron_id, book_id, (due_date - timedelta(days=14)).isoformat(), due_date.isoformat()))
+    conn.commit()
+    conn.close()
+    return book_id
+
+
+def test_spans_nest_and_export_with_root():
+    collector = MemoryCollector()
+    enable_tracing(collector)
+
+    @traced()
+    def lookup():
+        with start_span("inner", answer=42):
+            pass
+
+    with start_span("root", "SERVER"):
+        lookup()
+        assert collector.get_spans() == []
+
+    spans = {span["name"]: span for span in collector.get_spans()}
+    root = spans["root"]
+    assert "parentId" not in root and root["kind"] == "SERVER"
+    assert spans[lookup.__qualname__]["parentId"] == root["id"]
+    assert spans["inner"]["parentId"] == spans[lookup.__qualname__]["id"]
+    assert spans["inner"]["tags"] == {"answer": "42"}
+    assert {span["traceId"] for span in spans.values()} == {root["traceId"]}
+
+
+def test_nothing_recorded_when_disabled():
+    with start_span("ignored") as span:
+        span.set_attribute("key", "value")
+    assert traced()(lambda: 7)() == 7
+    collector = MemoryCollector()
+    enable_tracing(collector)
+    assert collector.get_spans() == []
+
+
+def test_errors_are_tagged():
+    collector = MemoryCollector()
+    enable_tracing(collector)
+    with pytest.raises(ValueError):
+        with start_span("failing"):
+            raise ValueError("boom")
+    assert collector.get_spans()[0]["tags"]["error"] == "ValueError: boom"
+
+
+def test_request_trace_links_route_service_and_queries():
+    app = create_app({"TESTING": True, "RATE_LIMIT_ENABLED": False, "TRACING_ENABLED": True})
+    response = app.test_client().get("/api/search?q=great&type=title")
+    trace_id = response.headers["X-Trace-Id"]
+
+    spans = app.extensions["trace_collector"].get_spans(trace_id)
+    by_id = {span["id"]: span for span in spans}
+    root = next(span for span in spans if "parentId" not in span)
+    assert root["name"] == "GET /api/search"
+    assert root["tags"]["http.status_code"] == "200"
+    query = next(span for span in spans
+                 if span["name"] == "sqlite SELECT" and "FROM books" in span["tags"]["db.statement"])
+    assert by_id[query["parentId"]]["name"] == "search_books_in_catalog"
+
+
+def test_pay_late_fees_trace_separates_gateway_time(mocker):
+    mocker.patch("services.payment_service.time.sleep")
+    collector = MemoryCollector()
+    enable_tracing(collector)
+    book_id = add_overdue_loan()
+
+    with start_span("payment"):
+        assert pay_late_fees("123456", book_id, PaymentGateway())[0] is True
+
+    names = [span["name"] for span in collector.get_spans()]
+    assert "calculate_late_fee_for_book" in names
+    assert "PaymentGateway.process_payment" in names
+    gateway = next(span for span in collector.get_spans() if span["name"] == "PaymentGateway.process_payment")
+    assert gateway["kind"] == "CLIENT"
+
+
+def test_file_collector_writes_one_trace_per_line(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    enable_tracing(FileCollector(str(path)))
+    for name in ("first", "second"):
+        with start_span(name):
+            with start_span("child"):
+                pass
+    traces = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [len(trace) for trace in traces] == [2, 2]
+    assert traces[1][-1]["name"] == "second"
@@ -0,0 +1,205 @@
+"""
+Tracing - Spans linking requests, service calls, queries and gateway calls
+A span times one operation and records attributes about it. Spans opened
+while another is current become its children, so one HTTP request yields a
+tree: route -> service functions -> database queries / gateway calls.
+
+Finished traces are exported in the Zipkin v2 JSON format (a list of span
+objects), which Zipkin, Jaeger and most trace viewers can import. Nothing is
+recorded until a collector is installed with enable_tracing().
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+SERVICE_NAME = 'library'
+
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+_collector = None
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+class Span:
+    """One timed operation. Use as a context manager or call end()."""
+
+    __slots__ = ('name', 'kind', 'trace_id', 'span_id', 'parent', 'attributes',
+                 'start_us', '_start', 'duration_us', 'error', '_trace_spans', '_token')
+
+    def __init__(self, name: str, kind: Optional[str] = None, parent: Optional['Span'] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else _new_id(16)
+        self.span_id = _new_id(8)
+        self.attributes = dict(attributes or {})
+        self.start_us = int(time.time() * 1000000)
+        self._start = time.perf_counter()
+        self.duration_us = None
+        self.error = None
+        # Finished spans of the trace, shared by every span in it and exported with the root
+        self._trace_spans = parent._trace_spans if parent else []
+        self._token = _current_span.set(self)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.duration_us is not None:
+            return
+        self.duration_us = max(1, int((time.perf_counter() - self._start) * 1000000))
+        if error is not None:
+            self.error = type(error).__name__ + ': ' + str(error)
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Ended from another context (e.g. a request teardown); restore the parent there
+            _current_span.set(self.parent)
+        self._trace_spans.append(self)
+        if self.parent is None:
+            collector = _collector
+            if collector is not None:
+                collector.export([span.to_zipkin() for span in self._trace_spans])
+
+    def __enter__(self) -> 'Span':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end(exc)
+
+    def to_zipkin(self) -> Dict:
+        """The span as a Zipkin v2 JSON object."""
+        span = {
+            'traceId': self.trace_id,
+            'id': self.span_id,
+            'name': self.name,
+            'timestamp': self.start_us,
+            'duration': self.duration_us,
+            'localEndpoint': {'serviceName': SERVICE_NAME},
+            'tags': {key: str(value) for key, value in self.attributes.items()},
+        }
+        if self.parent is not None:
+            span['parentId'] = self.parent.span_id
+        if self.kind:
+            span['kind'] = self.kind
+        if self.error:
+            span['tags']['error'] = self.error
+        return span
+
+
+class _NoopSpan:
+    """Returned when tracing is off, so callers need no checks."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def start_span(name: str, kind: Optional[str] = None, **attributes):
+    """
+    Start a span as a child of the current one (or a new trace).
+
+    Args:
+        name: Operation name
+        kind: Zipkin kind: SERVER, CLIENT, PRODUCER or CONSUMER (None for local work)
+        attributes: Tags recorded on the span
+    """
+    if _collector is None:
+        return _NOOP_SPAN
+    return Span(name, kind, _current_span.get(), attributes)
+
+
+def start_child_span(name: str, kind: Optional[str] = None, **attributes):
+    """Like start_span, but only inside an existing trace (used for queries)."""
+    parent = _current_span.get()
+    if parent is None or _collector is None:
+        return _NOOP_SPAN
+    return Span(name, kind, parent, attributes)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get() if _collector is not None else None
+
+
+def traced(name: Optional[str] = None, kind: Optional[str] = None):
+    """Decorator: run the function inside a span named after it."""
+    def decorate(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _collector is None:
+                return func(*args, **kwargs)
+            with Span(span_name, kind, _current_span.get()):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class MemoryCollector:
+    """Keeps the most recent max_spans exported spans in memory."""
+
+    def __init__(self, max_spans: int = 10000):
+        self.spans: deque = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Dict]) -> None:
+        with self._lock:
+            self.spans.extend(spans)
+
+    def get_spans(self, trace_id: Optional[str] = None) -> List[Dict]:
+        with self._lock:
+            return [span for span in self.spans if trace_id is None or span['traceId'] == trace_id]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+
+class FileCollector:
+    """Appends each finished trace to a file as one line holding a Zipkin v2 JSON array."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Dict]) -> None:
+        line = json.dumps(spans, separators=(',', ':')) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+def enable_tracing(collector) -> None:
+    """Record spans and send finished traces to collector."""
+    global _collector
+    _collector = collector
+
+
+def disable_tracing() -> None:
+    global _collector
+    _collector = None
+
+
+def get_collector():
+    return _collector